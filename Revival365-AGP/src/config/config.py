@@ -56,6 +56,26 @@ class Config:
             'high_threshold': int(self.get('glucose_thresholds', 'high_threshold'))
             }
 
+    def get_agp_sketch_config(self):
+        """Retrieve settings for the incremental AGP sketch store."""
+        return {
+            'enabled': self.config.getboolean('agp_sketch', 'enabled', fallback=False),
+            'max_error': self.config.getfloat('agp_sketch', 'max_error', fallback=0.5),
+            'store_dir': self.config.get('agp_sketch', 'store_dir', fallback='/tmp/agp_sketches'),
+            'backfill_days': self.config.getint('agp_sketch', 'backfill_days', fallback=1)
+        }
+
+    def get_preprocessing_config(self):
+        """Retrieve resampling and outlier settings for the preprocessing step."""
+        max_gap = self.config.get('preprocessing', 'max_gap', fallback='30min').strip()
+        outlier_zscore = self.config.get('preprocessing', 'outlier_zscore', fallback='none').strip()
+        return {
+            'freq': self.config.get('preprocessing', 'freq', fallback='5min'),
+            'max_gap': max_gap if max_gap.lower() != 'none' else None,
+            'chunk_size': self.config.getint('preprocessing', 'chunk_size', fallback=10000),
+            'outlier_zscore': float(outlier_zscore) if outlier_zscore.lower() != 'none' else None
+        }
+
 
 
 # Define two colors for higher contrast background effect
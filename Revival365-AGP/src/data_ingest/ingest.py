@@ -96,6 +96,9 @@ if __name__ == "__main__":
 import pandas as pd
 from datetime import datetime, timedelta
 from data_ingest.read_glucose_readings import glucose_readings  # Import the glucose_readings function
+from db.GlucRead import fetch_glucose_readings_for_patients
+from db.UserDet import fetch_patient_ids_by_mobile_numbers
+from db.frames import compact_frame
 
 def ingest_data(mobile_number, days=90):
     """
@@ -127,8 +130,7 @@ def ingest_data(mobile_number, days=90):
     glucose_df.rename(columns={'value': 'glucose'}, inplace=True)
     
     # Ensure proper column types and handle any missing values
-    glucose_df['timestamp'] = pd.to_datetime(glucose_df['timestamp'])
-    glucose_df['glucose'] = pd.to_numeric(glucose_df['glucose'], errors='coerce')
+    glucose_df = compact_frame(glucose_df, value_column='glucose')
     
     # Drop rows with invalid data
     glucose_df = glucose_df.dropna(subset=['timestamp', 'glucose'])
@@ -136,6 +138,54 @@ def ingest_data(mobile_number, days=90):
     print(glucose_df)  # Print the data for inspection
     return glucose_df
 
+def ingest_data_batch(mobile_numbers, days=90, history_days=30, start_date=None, end_date=None):
+    """
+    Ingests glucose data for many patients with a handful of bulk queries.
+    Applies the same date window and cleaning as `ingest_data`; readings are
+    also limited to `history_days` before each patient's latest reading.
+    When `start_date`/`end_date` are given, exactly the calendar days from
+    `start_date` to `end_date` (inclusive) are read instead, whatever today is.
+    Returns a dict mapping each mobile number to its raw glucose DataFrame
+    (empty when the patient is unknown or has no readings).
+    """
+    explicit = start_date is not None or end_date is not None
+    if explicit:
+        end_date = pd.Timestamp(end_date if end_date is not None else datetime.now()).date()
+        start_date = pd.Timestamp(start_date).date() if start_date is not None else end_date - timedelta(days=days)
+    else:
+        end_date = datetime.now().date()
+        start_date = (datetime.now() - timedelta(days=days)).date()
+
+    user_ids, error = fetch_patient_ids_by_mobile_numbers(mobile_numbers)
+    if error:
+        print(f"Error: {error}")
+    if explicit:
+        readings = fetch_glucose_readings_for_patients(
+            list(user_ids.values()),
+            start=datetime.combine(start_date, datetime.min.time()),
+            end=datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+        )
+    else:
+        readings = fetch_glucose_readings_for_patients(list(user_ids.values()), days=history_days)
+
+    batch = {}
+    for mobile_number in mobile_numbers:
+        glucose_df = readings.get(user_ids.get(mobile_number))
+        if glucose_df is None or glucose_df.empty:
+            batch[mobile_number] = pd.DataFrame()
+            continue
+
+        reading_days = glucose_df['timestamp'].dt.normalize()
+        glucose_df = glucose_df[(reading_days >= pd.Timestamp(start_date)) & (reading_days <= pd.Timestamp(end_date))]
+
+        # Same shape as the single-patient JSON path (integer mg/dL readings)
+        glucose_df = glucose_df.rename(columns={'value': 'glucose'})
+        glucose_df['glucose'] = glucose_df['glucose'].astype(int)
+        glucose_df = compact_frame(glucose_df, value_column='glucose')
+        batch[mobile_number] = glucose_df.dropna(subset=['timestamp', 'glucose']).reset_index(drop=True)
+
+    return batch
+
 # Example call to test the ingest_data function
 if __name__ == "__main__":
     mobile_number = "+918521345464"
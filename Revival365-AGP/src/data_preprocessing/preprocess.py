@@ -22,29 +22,151 @@ def remove_outliers(df, column='glucose', z_thresh=3.0):
     clean_df = df[df['zscore'].abs() <= z_thresh].drop(columns=['zscore'])
     return clean_df
 
-def resample_data(df, freq='1min'):
+def iter_resampled_chunks(df, freq='1min', max_gap=None, chunk_size=10000, column='glucose'):
     """
-    Resample the dataframe to a specified frequency, filling missing values 
-    via interpolation (or forward fill).
+    Resample a reading series to a fixed frequency, one chunk at a time.
+
+    Readings are averaged into `freq` buckets (downsampling) and empty buckets
+    are filled by time interpolation (upsampling / gap-filling), which matches
+    `resample(freq).mean().interpolate(method='time')`. Empty buckets inside a
+    gap longer than `max_gap` are left out instead of being interpolated.
+
+    The input is walked `chunk_size` rows at a time, so only one chunk of
+    input plus the output for its time span is converted at once. The rows of
+    a chunk's last bucket are held back for the next chunk (more readings may
+    fall into it), and the last resampled bucket is carried forward as the
+    interpolation anchor across the chunk edge. Input that is not already in
+    timestamp order is sorted once first.
+
+    :param df: pd.DataFrame with columns ['timestamp', column]
+    :param freq: str, target frequency (e.g. '1min', '5min', '15min')
+    :param max_gap: str or None, longest gap to interpolate across (None = no limit)
+    :param chunk_size: int, number of input rows per chunk
+    :param column: str, name of the value column
+    :return: generator of pd.DataFrame chunks with columns ['timestamp', column]
+    """
+    if df.empty:
+        return
+
+    step = pd.Timedelta(freq).value
+    gap_limit = pd.Timedelta(max_gap).value if max_gap is not None else None
+
+    df = df[['timestamp', column]]
+    if not df['timestamp'].is_monotonic_increasing:
+        df = df.sort_values('timestamp', kind='stable')
+
+    origin = None
+    carry = None  # (bucket, mean) of the last bucket already resampled
+    held_buckets = np.zeros(0, dtype=np.int64)
+    held_values = np.zeros(0, dtype=np.float64)
+    for start in range(0, len(df), chunk_size):
+        piece = df.iloc[start:start + chunk_size].dropna()
+        times = pd.to_datetime(piece['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        if origin is None:
+            if len(times) == 0:
+                continue
+            origin = times[0] - times[0] % step
+        buckets = np.concatenate((held_buckets, (times - origin) // step))
+        values = np.concatenate((held_values, piece[column].to_numpy(dtype=np.float64)))
+
+        # Hold back the last bucket unless this is the final chunk
+        cut = len(buckets)
+        if start + chunk_size < len(df) and len(buckets):
+            cut = int(np.searchsorted(buckets, buckets[-1], side='left'))
+        held_buckets, held_values = buckets[cut:], values[cut:]
+        if cut == 0:
+            continue
+
+        grid, grid_values, carry = _resample_block(buckets[:cut], values[:cut], carry, step, gap_limit)
+        if len(grid):
+            yield _grid_frame(origin, grid, grid_values, step, column)
+
+    if len(held_buckets):
+        # Only reached when the final chunk held nothing but missing values
+        grid, grid_values, carry = _resample_block(held_buckets, held_values, carry, step, gap_limit)
+        if len(grid):
+            yield _grid_frame(origin, grid, grid_values, step, column)
+
+def _resample_block(buckets, values, carry, step, gap_limit):
+    """
+    Bucket means and interpolated fill for one run of sorted bucket numbers.
+
+    :param carry: (bucket, mean) of the previous run's last bucket, or None
+    :return: (grid buckets, grid values, new carry)
+    """
+    # Mean per occupied bucket (input is sorted, so buckets are contiguous)
+    bounds = np.flatnonzero(np.diff(buckets)) + 1
+    starts = np.concatenate(([0], bounds))
+    filled = buckets[starts]
+    means = np.add.reduceat(values, starts) / np.diff(np.append(starts, len(buckets)))
+
+    first_output = filled[0]
+    if carry is not None:
+        filled = np.concatenate(([carry[0]], filled))
+        means = np.concatenate(([carry[1]], means))
+        first_output = carry[0] + 1
+
+    grid = np.arange(first_output, filled[-1] + 1)
+    grid_values = np.interp(grid, filled, means)
+
+    if gap_limit is not None:
+        # Drop interpolated buckets whose surrounding readings are too far apart
+        right = np.searchsorted(filled, grid, side='left')
+        left = np.maximum(right - 1, 0)
+        exact = filled[np.minimum(right, len(filled) - 1)] == grid
+        too_wide = (filled[np.minimum(right, len(filled) - 1)] - filled[left]) * step > gap_limit
+        keep = exact | ~too_wide
+        grid, grid_values = grid[keep], grid_values[keep]
+
+    return grid, grid_values, (filled[-1], means[-1])
+
+def _grid_frame(origin, grid, grid_values, step, column):
+    return pd.DataFrame({
+        'timestamp': (origin + grid * step).astype('datetime64[ns]'),
+        column: grid_values.astype(np.float32),
+    })
+
+def resample_data(df, freq='1min', max_gap=None, chunk_size=10000):
+    """
+    Resample the dataframe to a specified frequency, filling missing values
+    via interpolation (bounded by `max_gap`).
 
     :param df: pd.DataFrame with columns ['timestamp', 'glucose']
     :param freq: str, desired frequency (e.g. '1min')
+    :param max_gap: str or None, longest gap to interpolate across
+    :param chunk_size: int, number of input rows processed at a time
     :return: resampled pd.DataFrame
     """
-    df = df.copy()
-    df.set_index('timestamp', inplace=True)
-    df = df.resample(freq).mean()
-    # Interpolate missing glucose values
-    df['glucose'] = df['glucose'].interpolate(method='time')
-    df = df.reset_index()
-    return df
+    chunks = list(iter_resampled_chunks(df, freq=freq, max_gap=max_gap, chunk_size=chunk_size))
+    if not chunks:
+        return pd.DataFrame(columns=['timestamp', 'glucose'])
+    return pd.concat(chunks, ignore_index=True)
+
+def iter_preprocessed_chunks(raw_df, freq='1min', max_gap=None, chunk_size=10000, outlier_zscore=None):
+    """
+    The preprocess_data pipeline as a generator of time-ordered chunks, for
+    consumers (e.g. process.process_data) that never need the whole series.
+
+    Outlier removal needs the mean and deviation of the whole input, so it
+    runs on `raw_df` before resampling starts.
+    """
+    if raw_df.empty:
+        return iter(())
+    if outlier_zscore is not None:
+        raw_df = remove_outliers(raw_df, column='glucose', z_thresh=outlier_zscore)
+    return iter_resampled_chunks(raw_df, freq=freq, max_gap=max_gap, chunk_size=chunk_size)
 
-def preprocess_data(raw_df):
+def preprocess_data(raw_df, freq='1min', max_gap=None, chunk_size=10000, outlier_zscore=None):
     """
     Full preprocessing pipeline:
-    1. Remove outliers
-    2. Resample to 1-min intervals
+    1. Remove outliers, only when `outlier_zscore` is set (a z-score cut
+       also drops genuine hypo/hyperglycaemic readings, so it is off by default)
+    2. Resample to `freq` intervals, interpolating gaps up to `max_gap`
     """
-    df_no_outliers = remove_outliers(raw_df, column='glucose')
-    df_resampled = resample_data(df_no_outliers, freq='1min')
-    return df_resampled
+    if raw_df.empty:
+        return raw_df
+    chunks = list(iter_preprocessed_chunks(raw_df, freq=freq, max_gap=max_gap, chunk_size=chunk_size,
+                                           outlier_zscore=outlier_zscore))
+    if not chunks:
+        return pd.DataFrame(columns=['timestamp', 'glucose'])
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,330 @@
+"""
+agp_sketch.py
+-----------
+Incremental, mergeable AGP percentile sketches.
+
+Each patient keeps one fixed-resolution glucose histogram per day and per
+2-hour time-of-day block, plus a watermark: the newest reading folded in.
+A request only bins the readings from the watermark's day onward (and
+`backfill_days` before it, so sensor backfill that lands a little late is
+still counted); those days are rebuilt and every older day is left as it
+is. The AGP for any date window is then answered by summing the daily
+histograms in that window instead of sorting the raw rows.
+
+Every percentile is reported at the centre of the histogram bin holding the
+matching order statistic, so the absolute error against the exact
+`compute_agp` result is at most `max_error` mg/dL (bin width = 2 * max_error)
+for readings inside [GLUCOSE_MIN, GLUCOSE_MAX).
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Same 2-hour blocks as process.compute_agp
+AGP_BLOCKS = ["00:00", "02:00", "04:00", "06:00", "08:00", "10:00",
+              "12:00", "14:00", "16:00", "18:00", "20:00", "22:00"]
+BLOCK_HOURS = 2
+PERCENTILES = {'p10': 0.10, 'p25': 0.25, 'p50': 0.50, 'p75': 0.75, 'p90': 0.90}
+
+# Histogram range (mg/dL). Values outside are clamped into the edge bins.
+GLUCOSE_MIN = 0.0
+GLUCOSE_MAX = 600.0
+
+DAY_NS = 86_400 * 10**9
+HOUR_NS = 3_600 * 10**9
+
+# Stores loaded by this process: path -> (file mtime, store); see open_patient_sketches
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class AgpSketchStore:
+    """
+    Per-patient store of daily AGP histograms.
+
+    :param max_error: float, maximum absolute percentile error in mg/dL
+    """
+
+    def __init__(self, max_error=0.5):
+        if max_error <= 0:
+            raise ValueError("max_error must be positive")
+        self.max_error = float(max_error)
+        self.bin_width = 2 * self.max_error
+        self.n_bins = int(np.ceil((GLUCOSE_MAX - GLUCOSE_MIN) / self.bin_width))
+        self.days = {}  # day ordinal (days since epoch) -> (blocks, bins) counts
+        self.watermark = None  # ns timestamp of the newest reading folded in
+
+    def add_readings(self, df, backfill_days=1):
+        """
+        Fold a frame of readings in one step (see SketchFold).
+
+        :param df: pd.DataFrame with columns ['timestamp', 'glucose']
+        :return: int, number of days whose histograms changed
+        """
+        fold = SketchFold(self, backfill_days=backfill_days)
+        fold.add(df)
+        return fold.commit()
+
+    def bin_readings(self, timestamps, values):
+        """
+        Histogram readings per day in one pass.
+
+        :param timestamps: np.ndarray of int64 ns timestamps
+        :param values: np.ndarray of float64 glucose values (no NaN)
+        :return: (day ordinals, counts of shape (days, blocks, bins))
+        """
+        days, day_index = np.unique(timestamps // DAY_NS, return_inverse=True)
+        block = (timestamps % DAY_NS) // (BLOCK_HOURS * HOUR_NS)
+        bins = np.clip(((values - GLUCOSE_MIN) // self.bin_width).astype(np.int64), 0, self.n_bins - 1)
+        flat = (day_index * len(AGP_BLOCKS) + block) * self.n_bins + bins
+        counts = np.bincount(flat, minlength=len(days) * len(AGP_BLOCKS) * self.n_bins)
+        return days, counts.reshape(len(days), len(AGP_BLOCKS), self.n_bins).astype(np.uint32)
+
+    def merge(self, start_date=None, end_date=None):
+        """
+        Sum the daily histograms in an inclusive date window.
+
+        :return: np.ndarray of shape (blocks, bins)
+        """
+        start = _day_ordinal(start_date) if start_date is not None else None
+        end = _day_ordinal(end_date) if end_date is not None else None
+
+        merged = np.zeros((len(AGP_BLOCKS), self.n_bins), dtype=np.uint64)
+        for day_value, counts in self.days.items():
+            if start is not None and day_value < start:
+                continue
+            if end is not None and day_value > end:
+                continue
+            merged += counts
+        return merged
+
+    def compute_agp(self, start_date=None, end_date=None):
+        """
+        Compute AGP percentiles for a date window from the stored sketches.
+        Output matches the structure of process.compute_agp.
+        """
+        merged = self.merge(start_date, end_date)
+        if merged.sum() == 0:
+            return {"time_blocks": []}
+
+        centres = GLUCOSE_MIN + (np.arange(self.n_bins) + 0.5) * self.bin_width
+        block_data = []
+        for i, label in enumerate(AGP_BLOCKS):
+            percentiles = _histogram_percentiles(merged[i], centres)
+            block_data.append({
+                "time_of_day": label,
+                "percentiles": {k: round(v, 2) if v is not None else v for k, v in percentiles.items()}
+            })
+        return {"time_blocks": block_data}
+
+    def save(self, path):
+        """Persist the store to a compressed .npz file."""
+        ordinals = np.array(sorted(self.days), dtype=np.int64)
+        if len(ordinals):
+            counts = np.stack([self.days[d] for d in ordinals])
+        else:
+            counts = np.zeros((0, len(AGP_BLOCKS), self.n_bins), dtype=np.uint32)
+        watermark = self.watermark if self.watermark is not None else -1
+
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # A unique temp file per writer, so concurrent saves never share one
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.tmp.npz', delete=False) as tmp:
+            try:
+                np.savez_compressed(tmp, days=ordinals, counts=counts, watermark=np.int64(watermark),
+                                    max_error=np.float64(self.max_error))
+            except Exception:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, path)
+
+    @classmethod
+    def load(cls, path, max_error=0.5):
+        """
+        Load a store from disk. A missing file, or one written with a
+        different error bound, yields an empty store.
+        """
+        store = cls(max_error=max_error)
+        if not os.path.exists(path):
+            return store
+        try:
+            with np.load(path) as data:
+                if float(data['max_error']) != store.max_error:
+                    print(f"Discarding AGP sketches at {path}: resolution changed")
+                    return store
+                for day_value, counts in zip(data['days'], data['counts']):
+                    store.days[int(day_value)] = counts.astype(np.uint32)
+                if 'watermark' in data and int(data['watermark']) >= 0:
+                    store.watermark = int(data['watermark'])
+        except Exception as e:
+            print(f"Could not read AGP sketches at {path}: {e}")
+            return cls(max_error=max_error)
+        return store
+
+
+class SketchFold:
+    """
+    One update of a store: the readings of time-ordered chunks, from the
+    store's watermark day minus `backfill_days` onward, binned as the chunks
+    stream past and written into the store by commit().
+
+    Each touched day is rebuilt from the readings seen for it, replacing the
+    stored histogram, so passing overlapping frames twice counts nothing
+    twice. The first touched day may be cut short by the fetch window, so it
+    only replaces a stored day holding fewer readings.
+    """
+
+    def __init__(self, store, backfill_days=1):
+        self.store = store
+        self.since = None
+        if store.watermark is not None:
+            self.since = (store.watermark // DAY_NS - backfill_days) * DAY_NS
+        self.pending = {}  # day ordinal -> counts being rebuilt
+        self.newest = None
+        self.first_seen = self.last_seen = None  # span of every reading passed in
+
+    def add(self, df):
+        """Bin the readings of one chunk that fall on or after the fold's start."""
+        if df.empty:
+            return
+        timestamps = df['timestamp']
+        if self.first_seen is None:
+            self.first_seen = timestamps.iloc[0]
+        self.last_seen = timestamps.iloc[-1]
+        if self.since is not None and timestamps.iloc[-1].value < self.since:
+            return  # the whole chunk is older than the days being rebuilt
+
+        times = pd.to_datetime(timestamps).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        values = df['glucose'].to_numpy(dtype=np.float64)
+        keep = ~np.isnan(values)
+        if self.since is not None:
+            keep &= times >= self.since
+        times, values = times[keep], values[keep]
+        if len(times) == 0:
+            return
+
+        for day_value, counts in zip(*self.store.bin_readings(times, values)):
+            day_value = int(day_value)
+            if day_value in self.pending:
+                self.pending[day_value] += counts
+            else:
+                self.pending[day_value] = counts
+        newest = int(times.max())
+        self.newest = newest if self.newest is None else max(self.newest, newest)
+
+    def tap(self, chunks):
+        """Yield `chunks` unchanged, folding each one on the way through."""
+        for chunk in chunks:
+            self.add(chunk)
+            yield chunk
+
+    def commit(self):
+        """
+        Write the rebuilt days into the store and advance its watermark.
+
+        :return: int, number of days whose histograms changed
+        """
+        store = self.store
+        changed = 0
+        first_day = min(self.pending) if self.pending else None
+        for day_value, counts in self.pending.items():
+            stored = store.days.get(day_value)
+            if stored is not None:
+                if day_value == first_day and counts.sum() < stored.sum():
+                    continue
+                if np.array_equal(stored, counts):
+                    continue
+            store.days[day_value] = counts
+            changed += 1
+        if self.newest is not None and (store.watermark is None or self.newest > store.watermark):
+            store.watermark = self.newest
+        self.pending = {}
+        return changed
+
+
+class PatientSketches:
+    """A patient's stored sketches, updated from the chunks of one request."""
+
+    def __init__(self, path, store, backfill_days=1):
+        self.path = path
+        self.store = store
+        self.fold = SketchFold(store, backfill_days=backfill_days)
+
+    def tap(self, chunks):
+        return self.fold.tap(chunks)
+
+    def agp(self):
+        """
+        Commit the fold (saving the store if a day changed) and return the
+        AGP over the span of the readings that were passed through tap().
+        """
+        # The store object is shared with concurrent requests for the same patient
+        with _stores_lock:
+            changed = self.fold.commit()
+            if changed:
+                self.store.save(self.path)
+                _stores[self.path] = (os.stat(self.path).st_mtime_ns, self.store)
+            print(f"AGP sketches: re-folded {changed} days, {len(self.store.days)} days stored")
+            if self.fold.first_seen is None:
+                return {"time_blocks": []}
+            return self.store.compute_agp(self.fold.first_seen, self.fold.last_seen)
+
+
+def _day_ordinal(value):
+    """Convert a date-like value to days since the Unix epoch."""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+def _histogram_percentiles(counts, centres):
+    """
+    Percentiles of one histogram using the same linear interpolation between
+    order statistics as pandas' Series.quantile.
+    """
+    total = int(counts.sum())
+    if total == 0:
+        return {k: None for k in PERCENTILES}
+
+    cumulative = np.cumsum(counts)
+    result = {}
+    for key, q in PERCENTILES.items():
+        position = (total - 1) * q
+        lower_rank = int(np.floor(position))
+        upper_rank = int(np.ceil(position))
+        lower = centres[np.searchsorted(cumulative, lower_rank, side='right')]
+        upper = centres[np.searchsorted(cumulative, upper_rank, side='right')]
+        result[key] = float(lower + (position - lower_rank) * (upper - lower))
+    return result
+
+
+def sketch_path(store_dir, patient_key):
+    """File path of a patient's sketch store; the key is hashed to keep PII out of file names."""
+    digest = hashlib.sha256(str(patient_key).encode('utf-8')).hexdigest()[:24]
+    return os.path.join(store_dir, f"{digest}.npz")
+
+
+def open_patient_sketches(patient_key, store_dir, max_error=0.5, backfill_days=1):
+    """
+    A patient's sketch store, ready to fold the readings of one request.
+
+    Stores are kept in memory between requests and only re-read when the
+    file on disk has changed (another process saved it).
+
+    :param patient_key: str, stable patient identifier (e.g. mobile number)
+    :return: PatientSketches; pass the chunks through .tap(), then call .agp()
+    """
+    path = sketch_path(store_dir, patient_key)
+    with _stores_lock:
+        mtime = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        cached = _stores.get(path)
+        if cached is not None and cached[0] == mtime and cached[1].max_error == float(max_error):
+            store = cached[1]
+        else:
+            store = AgpSketchStore.load(path, max_error=max_error)
+            _stores[path] = (mtime, store)
+    return PatientSketches(path, store, backfill_days=backfill_days)
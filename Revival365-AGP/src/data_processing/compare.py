@@ -0,0 +1,111 @@
+"""
+compare.py
+-----------
+Period-over-period AGP comparison ("last N days vs the N days before").
+
+Both periods are cut from one preprocessed frame, run through the same
+process_data path, and returned together with the numeric deltas
+(current - previous).
+"""
+
+import pandas as pd
+
+from data_processing.process import process_data, compute_summary_values
+
+
+def split_periods(df, period_days=14, end_date=None):
+    """
+    Split readings into the current and previous period.
+
+    The current period is the `period_days` calendar days ending on
+    `end_date` (inclusive, default: today); the previous period is the
+    `period_days` days before that.
+
+    :param df: pd.DataFrame with columns ['timestamp', 'glucose']
+    :return: (current_df, previous_df, bounds) where bounds holds the dates
+    """
+    end = pd.Timestamp(end_date).normalize() if end_date is not None else pd.Timestamp.now().normalize()
+    current_start = end - pd.Timedelta(days=period_days - 1)
+    previous_start = current_start - pd.Timedelta(days=period_days)
+    next_day = end + pd.Timedelta(days=1)
+
+    if df.empty:
+        current, previous = df, df
+    else:
+        timestamps = df['timestamp']
+        current = df[(timestamps >= current_start) & (timestamps < next_day)].reset_index(drop=True)
+        previous = df[(timestamps >= previous_start) & (timestamps < current_start)].reset_index(drop=True)
+
+    bounds = {
+        "current": {"start_date": current_start.strftime('%Y-%m-%d'), "end_date": end.strftime('%Y-%m-%d')},
+        "previous": {
+            "start_date": previous_start.strftime('%Y-%m-%d'),
+            "end_date": (current_start - pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
+        },
+    }
+    return current, previous, bounds
+
+
+def _delta(current, previous, digits=2):
+    """Difference of two optional numbers, or None if either is missing."""
+    if current is None or previous is None or pd.isna(current) or pd.isna(previous):
+        return None
+    return round(float(current) - float(previous), digits)
+
+
+def compute_deltas(current_df, previous_df, current, previous):
+    """
+    Numeric change from the previous to the current period for the summary
+    values, each TIR band and each AGP percentile.
+
+    :param current_df, previous_df: the period frames
+    :param current, previous: process_data results for the periods
+    :return: dict of deltas (None where a period has no data)
+    """
+    deltas = {"summary": {}, "tir": {}, "agp": []}
+
+    if not current_df.empty and not previous_df.empty:
+        current_values = compute_summary_values(current_df)
+        previous_values = compute_summary_values(previous_df)
+        for key in ("mean_glucose", "estimated_hba1c", "cv"):
+            deltas["summary"][key] = _delta(current_values[key], previous_values[key])
+    else:
+        deltas["summary"] = {"mean_glucose": None, "estimated_hba1c": None, "cv": None}
+
+    has_both = not current_df.empty and not previous_df.empty
+    for label, now, before in zip(current["tir"]["labels"], current["tir"]["data"], previous["tir"]["data"]):
+        deltas["tir"][label] = round(now - before, 1) if has_both else None
+
+    previous_blocks = {block["time_of_day"]: block for block in previous["agp"]["time_blocks"]}
+    for block in current["agp"]["time_blocks"]:
+        before = previous_blocks.get(block["time_of_day"])
+        deltas["agp"].append({
+            "time_of_day": block["time_of_day"],
+            "percentiles": {
+                key: _delta(value, before["percentiles"].get(key) if before else None)
+                for key, value in block["percentiles"].items()
+            },
+        })
+
+    return deltas
+
+
+def compare_periods(df, period_days=14, end_date=None):
+    """
+    Compute the full AGP profile for the current and previous period from a
+    single frame, plus deltas between them.
+
+    :param df: preprocessed pd.DataFrame with columns ['timestamp', 'glucose']
+    :return: dict with 'periods', 'current', 'previous' and 'deltas'
+    """
+    current_df, previous_df, bounds = split_periods(df, period_days=period_days, end_date=end_date)
+
+    current = process_data(current_df)
+    previous = process_data(previous_df)
+
+    return {
+        "periods": bounds,
+        "current": current,
+        "previous": previous,
+        "deltas": compute_deltas(current_df, previous_df, current, previous),
+    }
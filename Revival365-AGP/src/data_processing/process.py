@@ -7,26 +7,40 @@ summary statistics, TIR, AGP, daily metrics, etc.
 
 import pandas as pd
 import numpy as np
+from db.frames import add_day_key
 #from scipy.signal import find_peaks
 
-def compute_summary_metrics(df):
+# 2-hour AGP blocks
+AGP_BLOCKS = ["00:00", "02:00", "04:00", "06:00", "08:00", "10:00", "12:00", "14:00", "16:00", "18:00", "20:00", "22:00", "00:00"]
+AGP_RANGES = [
+    (0, 2),   # 00:00 - 02:00
+    (2, 4),   # 02:00 - 04:00
+    (4, 6),   # 04:00 - 06:00
+    (6, 8),   # 06:00 - 08:00
+    (8, 10),  # 08:00 - 10:00
+    (10, 12), # 10:00 - 12:00
+    (12, 14), # 12:00 - 14:00
+    (14, 16), # 14:00 - 16:00
+    (16, 18), # 16:00 - 18:00
+    (18, 20), # 18:00 - 20:00
+    (20, 22), # 20:00 - 22:00
+    (22, 24), # 22:00 - 00:00
+]
+
+def compute_summary_values(df):
     """
-    Compute summary metrics such as:
-     - Monitoring period
-     - Estimated HbA1c
-     - Mean blood glucose
-     - Coefficient of Variation
+    Numeric summary values behind compute_summary_metrics:
+    start/end timestamps, total days, mean glucose, estimated HbA1c and CV.
     """
-    if df.empty:
-        return []
-
     # Example: Use min/max timestamps as 'monitoring period'
     start_date = df['timestamp'].min()
     end_date = df['timestamp'].max()
     total_days = (end_date - start_date).days + 1
 
-    mean_glucose = df['glucose'].mean()
-    std_glucose = df['glucose'].std()
+    # Readings are stored as float32; reduce in float64
+    glucose = df['glucose'].astype(np.float64)
+    mean_glucose = glucose.mean()
+    std_glucose = glucose.std()
     # Simple approximation for eHbA1c: 
     # (this is not an official formula)
     estimated_hba1c = 0.0348* mean_glucose + 1.626
@@ -36,6 +50,32 @@ def compute_summary_metrics(df):
     else:
         cv = 0
 
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "total_days": total_days,
+        "mean_glucose": mean_glucose,
+        "estimated_hba1c": estimated_hba1c,
+        "cv": cv
+    }
+
+def compute_summary_metrics(df):
+    """
+    Compute summary metrics such as:
+     - Monitoring period
+     - Estimated HbA1c
+     - Mean blood glucose
+     - Coefficient of Variation
+    """
+    if df.empty:
+        return []
+    return format_summary_metrics(compute_summary_values(df))
+
+def format_summary_metrics(values):
+    """Format compute_summary_values output as the summary section of the report."""
+    start_date, end_date, total_days = values["start_date"], values["end_date"], values["total_days"]
+    mean_glucose, estimated_hba1c, cv = values["mean_glucose"], values["estimated_hba1c"], values["cv"]
+
     summary = {
     "Monitoring period": {
         "Results": f"{start_date.strftime('%d-%m-%Y')} - {end_date.strftime('%d-%m-%Y')} ({total_days} days)",
@@ -71,7 +111,26 @@ def compute_tir(df):
     :param df: pd.DataFrame
     :return: dict with 'labels' and 'data' lists
     """
+    return tir_from_counts(count_tir(df))
+
+def count_tir(df):
+    """Reading counts behind compute_tir: [total, normal, low, very low, high, very high]."""
     if df.empty:
+        return np.zeros(6, dtype=np.int64)
+    glucose = df['glucose']
+    return np.array([
+        len(df),
+        ((glucose >= 70) & (glucose <= 180)).sum(),
+        (glucose < 70).sum(),
+        (glucose < 54).sum(),
+        (glucose > 180).sum(),
+        (glucose > 250).sum(),
+    ], dtype=np.int64)
+
+def tir_from_counts(counts):
+    """Build the compute_tir result from count_tir counts (which can be summed across chunks)."""
+    total_count, normal, low, very_low, high, very_high = (int(c) for c in counts)
+    if total_count == 0:
         return {
             "labels": [
                 "Normal (70-180 mg/dL)",
@@ -83,23 +142,14 @@ def compute_tir(df):
             "data": [0, 0, 0, 0, 0]
         }
 
-    total_count = len(df)
-
-    low = df[df['glucose'] < 70]
-    very_low = df[df['glucose'] < 54]
-    high = df[df['glucose'] > 180]
-    very_high = df[df['glucose'] > 250]
-
-    normal = df[(df['glucose'] >= 70) & (df['glucose'] <= 180)]
-
     # Make sure Very Low subset is included in Low subset
     # similarly for Very High included in High. We'll compute carefully:
     # Actually for TIR we just use total_count approach
-    perc_normal = (len(normal) / total_count) * 100 if total_count else 0
-    perc_low = (len(low) / total_count) * 100 if total_count else 0
-    perc_very_low = (len(very_low) / total_count) * 100 if total_count else 0
-    perc_high = (len(high) / total_count) * 100 if total_count else 0
-    perc_very_high = (len(very_high) / total_count) * 100 if total_count else 0
+    perc_normal = (normal / total_count) * 100
+    perc_low = (low / total_count) * 100
+    perc_very_low = (very_low / total_count) * 100
+    perc_high = (high / total_count) * 100
+    perc_very_high = (very_high / total_count) * 100
 
     tir_result = {
         "labels": [
@@ -187,36 +237,19 @@ def compute_agp(df):
     if df.empty:
         return {"time_blocks": []}
 
-    # Convert timestamp to time only
-    df = df.copy()
-    df['time'] = df['timestamp'].dt.strftime('%H:%M')
+    hours = df['timestamp'].dt.hour
+    glucose = df['glucose'].astype(np.float64)
+    return agp_from_blocks([glucose[(hours >= start_hour) & (hours < end_hour)] for start_hour, end_hour in AGP_RANGES])
 
-    # Define 2-hour blocks
-    blocks = ["00:00", "02:00", "04:00", "06:00", "08:00", "10:00", "12:00", "14:00", "16:00", "18:00", "20:00", "22:00", "00:00"]
-    
+def agp_from_blocks(block_values):
+    """
+    AGP percentiles from the float64 glucose values of each 2-hour block
+    (a pd.Series per entry of AGP_RANGES).
+    """
     block_data = []
 
-    # Define 2-hour ranges
-    ranges = [
-        (0, 2),   # 00:00 - 02:00
-        (2, 4),   # 02:00 - 04:00
-        (4, 6),   # 04:00 - 06:00
-        (6, 8),   # 06:00 - 08:00
-        (8, 10),  # 08:00 - 10:00
-        (10, 12), # 10:00 - 12:00
-        (12, 14), # 12:00 - 14:00
-        (14, 16), # 14:00 - 16:00
-        (16, 18), # 16:00 - 18:00
-        (18, 20), # 18:00 - 20:00
-        (20, 22), # 20:00 - 22:00
-        (22, 24), # 22:00 - 00:00
-    ]
-
-    for i, (start_hour, end_hour) in enumerate(ranges):
-        # Filter for the hours in the block
-        block_df = df[(df['timestamp'].dt.hour >= start_hour) & 
-                      (df['timestamp'].dt.hour < end_hour)]
-        if block_df.empty:
+    for i, block_glucose in enumerate(block_values):
+        if block_glucose.empty:
             percentiles = {
                 'p10': None,
                 'p25': None,
@@ -226,15 +259,15 @@ def compute_agp(df):
             }
         else:
             percentiles = {
-                'p10': block_df['glucose'].quantile(0.10),
-                'p25': block_df['glucose'].quantile(0.25),
-                'p50': block_df['glucose'].quantile(0.50),
-                'p75': block_df['glucose'].quantile(0.75),
-                'p90': block_df['glucose'].quantile(0.90),
+                'p10': block_glucose.quantile(0.10),
+                'p25': block_glucose.quantile(0.25),
+                'p50': block_glucose.quantile(0.50),
+                'p75': block_glucose.quantile(0.75),
+                'p90': block_glucose.quantile(0.90),
             }
 
         block_data.append({
-            "time_of_day": blocks[i],
+            "time_of_day": AGP_BLOCKS[i],
             "percentiles": {k: round(v, 2) if v is not None else v for k, v in percentiles.items()}
         })
 
@@ -263,8 +296,8 @@ def compute_daily_metrics(df):
     if df.empty:
         return []
 
-    df = df.copy()
-    df['date'] = df['timestamp'].dt.date
+    df = add_day_key(df.copy())
+    df['glucose'] = df['glucose'].astype(np.float64)
 
     daily_metrics_list = []
 
@@ -332,17 +365,28 @@ def compute_daily_metrics(df):
 
     return daily_metrics_list
 
-def process_data(preprocessed_df):
+def process_data(preprocessed_df, agp=None):
     """
     Orchestrate the data processing:
     1. Summary metrics
     2. TIR
-    3. AGP
+    3. AGP (skipped when a precomputed `agp`, e.g. from sketches, is passed)
     4. Daily metrics
+
+    `preprocessed_df` is either a DataFrame or an iterable of time-ordered
+    chunks (e.g. preprocess.iter_preprocessed_chunks); chunks are consumed
+    one at a time without concatenating them. `agp` may also be a callable,
+    called once every chunk has been consumed.
     """
+    if not isinstance(preprocessed_df, pd.DataFrame):
+        return process_chunks(preprocessed_df, agp=agp)
+
     summary = compute_summary_metrics(preprocessed_df)
     tir = compute_tir(preprocessed_df)
-    agp = compute_agp(preprocessed_df)
+    if callable(agp):
+        agp = agp()
+    if agp is None:
+        agp = compute_agp(preprocessed_df)
     daily_metrics = compute_daily_metrics(preprocessed_df)
 
     result = {
@@ -351,4 +395,82 @@ def process_data(preprocessed_df):
         "agp": agp,
         "daily_metrics": daily_metrics
     }
-    return result
\ No newline at end of file
+    return result
+
+def process_chunks(chunks, agp=None):
+    """
+    process_data over time-ordered chunks of preprocessed readings.
+
+    Summary and TIR are kept as running totals (count, mean and sum of
+    squared deviations, merged per chunk) and daily metrics are computed as
+    each day completes, so only the current chunk and the readings of the
+    day in progress are held. Exact AGP percentiles need every value, so
+    unless `agp` is supplied the glucose column alone is kept per 2-hour
+    block.
+    """
+    start_date = end_date = None
+    count, mean, squares = 0, 0.0, 0.0
+    tir_counts = np.zeros(6, dtype=np.int64)
+    block_values = [[] for _ in AGP_RANGES] if agp is None else None
+    daily_metrics = []
+    open_day = None  # readings of the last, possibly incomplete, day
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        timestamps = chunk['timestamp']
+        glucose = chunk['glucose'].to_numpy(dtype=np.float64)
+
+        start_date = timestamps.iloc[0] if start_date is None else start_date
+        end_date = timestamps.iloc[-1]
+
+        # Chan et al. merge of the running mean / squared deviations
+        chunk_mean = glucose.mean()
+        chunk_squares = ((glucose - chunk_mean) ** 2).sum()
+        total = count + len(glucose)
+        delta = chunk_mean - mean
+        mean += delta * len(glucose) / total
+        squares += chunk_squares + delta ** 2 * count * len(glucose) / total
+        count = total
+
+        tir_counts += count_tir(chunk)
+        if block_values is not None:
+            hours = timestamps.dt.hour.to_numpy()
+            for values, (start_hour, end_hour) in zip(block_values, AGP_RANGES):
+                values.append(glucose[(hours >= start_hour) & (hours < end_hour)])
+
+        if open_day is not None:
+            chunk = pd.concat([open_day, chunk], ignore_index=True)
+        last_day = chunk['timestamp'].iloc[-1].normalize()
+        complete = chunk['timestamp'] < last_day
+        if complete.any():
+            daily_metrics += compute_daily_metrics(chunk[complete])
+        open_day = chunk[~complete]
+
+    if count == 0:
+        return process_data(pd.DataFrame(columns=['timestamp', 'glucose']), agp=agp)
+    if open_day is not None and not open_day.empty:
+        daily_metrics += compute_daily_metrics(open_day)
+
+    std = np.sqrt(squares / (count - 1)) if count > 1 else np.nan
+    summary = format_summary_metrics({
+        "start_date": start_date,
+        "end_date": end_date,
+        "total_days": (end_date - start_date).days + 1,
+        "mean_glucose": mean,
+        "estimated_hba1c": 0.0348 * mean + 1.626,
+        "cv": (std / mean) * 100 if mean != 0 else 0,
+    })
+
+    if callable(agp):
+        agp = agp()
+    if agp is None:
+        agp = agp_from_blocks([pd.Series(np.concatenate(values) if values else np.zeros(0))
+                               for values in block_values])
+
+    return {
+        "summary": summary,
+        "tir": tir_from_counts(tir_counts),
+        "agp": agp,
+        "daily_metrics": daily_metrics
+    }
@@ -1,5 +1,6 @@
 from db.db_connection import Session, GlucoseReadings, GlucoseDailySummary  
 from db.UserDet import fetch_patient_details  # Existing function name
+from db.frames import compact_frame, readings_frame
 import pandas as pd
 import random
 from sqlalchemy import func
@@ -26,7 +27,7 @@ def fetch_glucose_readings_by_patient_id(user_id):
 
             # Fetch only readings in the last 30 days from latest reading
             readings = (
-                session.query(GlucoseReadings)
+                session.query(GlucoseReadings.timestamp, GlucoseReadings.value)
                 .filter(GlucoseReadings.patient_id == user_id)
                 .filter(GlucoseReadings.timestamp >= cutoff)
                 .order_by(GlucoseReadings.timestamp)
@@ -35,12 +36,8 @@ def fetch_glucose_readings_by_patient_id(user_id):
 
             if readings:
                 print(f"Found {len(readings)} readings for user_id: {user_id}")
-                df = pd.DataFrame(
-                    [{'timestamp': r.timestamp, 'value': r.value} for r in readings]
-                )
-
-                # Ensure the 'value' column is numeric
-                df['value'] = pd.to_numeric(df['value'], errors='coerce')
+                # datetime64 timestamps, float32 values (non-numeric values become NaN)
+                df = readings_frame(readings)
                 df = df[df['value'] >= 30]  # keep only valid glucose values
                 return df
 
@@ -52,6 +49,72 @@ def fetch_glucose_readings_by_patient_id(user_id):
             return pd.DataFrame()
 
 
+def fetch_glucose_readings_for_patients(user_ids, days=30, chunk_size=200, start=None, end=None):
+    """
+    Bulk-fetch glucose readings for many patients.
+
+    Applies the same window as fetch_glucose_readings_by_patient_id (the last
+    `days` days relative to each patient's own latest reading) but needs one
+    aggregate query plus one query per `chunk_size` patients instead of two
+    queries per patient. When `start` is given, every patient's readings from
+    `start` up to (not including) `end` are fetched instead.
+
+    Returns:
+        dict: user_id -> pd.DataFrame with columns ['timestamp', 'value'];
+        patients without readings are left out.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+
+    print(f"Fetching glucose readings for {len(user_ids)} patients")
+    results = {}
+    with Session() as session:
+        try:
+            for i in range(0, len(user_ids), chunk_size):
+                chunk = user_ids[i:i + chunk_size]
+
+                if start is not None:
+                    cutoffs = dict.fromkeys(chunk, start)
+                else:
+                    # Latest reading per patient in one grouped query
+                    latest_rows = (
+                        session.query(GlucoseReadings.patient_id, func.max(GlucoseReadings.timestamp))
+                        .filter(GlucoseReadings.patient_id.in_(chunk))
+                        .group_by(GlucoseReadings.patient_id)
+                        .all()
+                    )
+                    cutoffs = {pid: latest - timedelta(days=days) for pid, latest in latest_rows if latest}
+                if not cutoffs:
+                    continue
+
+                # One range query for the chunk, trimmed per patient below
+                query = (
+                    session.query(GlucoseReadings.patient_id, GlucoseReadings.timestamp, GlucoseReadings.value)
+                    .filter(GlucoseReadings.patient_id.in_(list(cutoffs)))
+                    .filter(GlucoseReadings.timestamp >= min(cutoffs.values()))
+                )
+                if end is not None:
+                    query = query.filter(GlucoseReadings.timestamp < end)
+                rows = query.order_by(GlucoseReadings.patient_id, GlucoseReadings.timestamp).all()
+                if not rows:
+                    continue
+
+                df = compact_frame(pd.DataFrame(rows, columns=['patient_id', 'timestamp', 'value']))
+                df = df[df['value'] >= 30]  # keep only valid glucose values
+                df = df[df['timestamp'] >= df['patient_id'].map(cutoffs)]
+
+                for pid, group in df.groupby('patient_id', sort=False):
+                    results[pid] = group[['timestamp', 'value']].reset_index(drop=True)
+
+            print(f"Found readings for {len(results)} of {len(user_ids)} patients")
+            return results
+
+        except Exception as e:
+            print(f"An error occurred while fetching glucose readings for {len(user_ids)} patients: {e}")
+            return results
+
+
 def fetch_glucose_readings(user_id):
     return fetch_glucose_readings_by_patient_id(user_id)
 
@@ -102,3 +102,32 @@ def fetch_medication_details(patient_id):
         return [], str(e)  # Return empty list and the error message
     finally:
         session.close()
+
+
+def fetch_patient_ids_by_mobile_numbers(mobile_numbers):
+    """
+    Resolve many mobile numbers to user IDs with a single query.
+
+    Args:
+        mobile_numbers (list): Mobile numbers to resolve.
+
+    Returns:
+        tuple: A dict mapping mobile number to user ID (unknown numbers are
+        left out) and an error message (or None if no error).
+    """
+    if not mobile_numbers:
+        return {}, None
+
+    session = Session()
+    try:
+        rows = (
+            session.query(User.mobile_number, User.id)
+            .filter(User.mobile_number.in_(list(mobile_numbers)))
+            .all()
+        )
+        return {mobile_number: user_id for mobile_number, user_id in rows}, None
+    except Exception as e:
+        print(f"An error occurred while fetching user details: {e}")
+        return {}, "Error fetching user details"
+    finally:
+        session.close()
@@ -5,7 +5,8 @@ load_dotenv()
 
 import json
 import logging
-from main import get_glucose_data  # Import the function we created earlier
+import time
+from main import get_glucose_data, get_glucose_data_batch, get_glucose_data_comparison  # Import the function we created earlier
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -30,6 +31,7 @@ def lambda_handler(event: dict, context) -> dict:
     mobile_number = query_params.get('mobile_number', None)
     start_date = query_params.get('start_date', None)
     end_date = query_params.get('end_date', None)
+    period_days = query_params.get('period_days', 14)
 
     # If the body is provided and contains relevant data, use it
     if body:
@@ -37,6 +39,11 @@ def lambda_handler(event: dict, context) -> dict:
         mobile_number = body_data.get('mobile_number', mobile_number)
         start_date = body_data.get('start_date', start_date)
         end_date = body_data.get('end_date', end_date)
+        period_days = body_data.get('period_days', period_days)
+
+    # Batch mode: AGP reports for a whole panel of patients in one call
+    if path == '/agp_profile_batch':
+        return handle_agp_batch(query_params or {}, body)
 
     # Validate the required parameters
     if not mobile_number:
@@ -51,6 +58,20 @@ def lambda_handler(event: dict, context) -> dict:
             # Return the data as a response
             return build_response(200, json.loads(glucose_json))
 
+        elif path == '/agp_compare':
+            # Current vs previous period from one fetch
+            try:
+                period_days = int(period_days)
+            except (TypeError, ValueError):
+                return build_response(400, {'error': 'period_days must be an integer number of days'})
+            if period_days < 1:
+                return build_response(400, {'error': 'period_days must be at least 1'})
+
+            comparison_json = get_glucose_data_comparison(
+                mobile_number=mobile_number, period_days=period_days, end_date=end_date
+            )
+            return build_response(200, json.loads(comparison_json))
+
         else:
             logger.error(f"Invalid path requested: {path}")
             return build_response(404, {'error': 'Not Found'})
@@ -60,6 +81,41 @@ def lambda_handler(event: dict, context) -> dict:
         return build_response(500, {'error': 'An internal error occurred', 'details': str(e)})
 
 
+def handle_agp_batch(query_params: dict, body) -> dict:
+    """
+    Build AGP reports for a list of mobile numbers.
+    Accepts `mobile_numbers` as a JSON list in the body or a comma-separated
+    query parameter, plus an optional `window` in days.
+    """
+    body_data = json.loads(body) if body else {}
+    mobile_numbers = body_data.get('mobile_numbers')
+    if mobile_numbers is None and query_params.get('mobile_numbers'):
+        mobile_numbers = [m.strip() for m in query_params['mobile_numbers'].split(',') if m.strip()]
+    window = body_data.get('window', query_params.get('window', 90))
+
+    if not mobile_numbers or not isinstance(mobile_numbers, list):
+        return build_response(400, {'error': 'mobile_numbers must be a non-empty list'})
+    try:
+        window = int(window)
+    except (TypeError, ValueError):
+        return build_response(400, {'error': 'window must be an integer number of days'})
+
+    try:
+        started = time.perf_counter()
+        results = list(get_glucose_data_batch(mobile_numbers, window=window))
+        elapsed = time.perf_counter() - started
+        logger.info(f"AGP batch finished: {len(results)} patients in {elapsed:.1f}s")
+        return build_response(200, {
+            'results': results,
+            'patients': len(results),
+            'elapsed_seconds': round(elapsed, 2),
+            'patients_per_minute': round(len(results) / elapsed * 60, 1) if elapsed > 0 else None,
+        })
+    except Exception as e:
+        logger.error(f"Error in AGP batch: {e}")
+        return build_response(500, {'error': 'An internal error occurred', 'details': str(e)})
+
+
 def build_response(status_code: int, body: dict) -> dict:
     """
     Helper function to build API Gateway compatible responses.
@@ -1,8 +1,15 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
-from data_ingest.ingest import ingest_data
-from data_preprocessing.preprocess import preprocess_data
+from data_ingest.ingest import ingest_data, ingest_data_batch
+from data_preprocessing.preprocess import iter_preprocessed_chunks, preprocess_data
 from data_processing.process import process_data
 from data_formatting.format_to_json import format_to_json
+from data_processing.agp_sketch import open_patient_sketches
+from data_processing.compare import compare_periods
+from config.config import config
 
 def get_glucose_data(mobile_number=None, start_date=None, end_date=None):
     """
@@ -23,17 +30,131 @@ def get_glucose_data(mobile_number=None, start_date=None, end_date=None):
     # 1. Ingest data
     raw_df = ingest_data(mobile_number=mobile_number)
 
-    # 2. Preprocess data
-    #cleaned_df = preprocess_data(raw_df)
+    return build_agp_report(raw_df, mobile_number)
 
-    # 3. Process data
-    processed = process_data(raw_df)
+def build_agp_report(raw_df, mobile_number=None):
+    """
+    Run steps 2-4 of the AGP pipeline (preprocess, process, format) on
+    already-ingested readings.
+
+    Args:
+        raw_df (pd.DataFrame): Raw readings with columns ['timestamp', 'glucose'].
+        mobile_number (str, optional): Patient key for the AGP sketch store.
+
+    Returns:
+        str: Processed glucose data in JSON format.
+    """
+    # 2. Preprocess data (bounded-gap resampling; outlier removal only when configured),
+    #    produced chunk by chunk as step 3 consumes it
+    chunks = iter_preprocessed_chunks(raw_df, **config.get_preprocessing_config())
+
+    # 3. Process data (AGP percentiles come from the persisted sketches when enabled,
+    #    fed the same cleaned readings as every other metric)
+    agp = None
+    sketch_config = config.get_agp_sketch_config()
+    if sketch_config['enabled'] and not raw_df.empty:
+        sketches = open_patient_sketches(
+            mobile_number,
+            store_dir=sketch_config['store_dir'],
+            max_error=sketch_config['max_error'],
+            backfill_days=sketch_config['backfill_days'],
+        )
+        chunks = sketches.tap(chunks)
+        agp = sketches.agp
+    processed = process_data(chunks, agp=agp)
 
     # 4. Format to JSON
     json_str = format_to_json(processed)
 
     return json_str
 
+def get_glucose_data_comparison(mobile_number, period_days=14, end_date=None):
+    """
+    Compare the AGP profile of the last `period_days` days with the
+    `period_days` days before, from a single fetch of both periods.
+
+    Args:
+        mobile_number (str): Patient mobile number.
+        period_days (int, optional): Length of each period in days.
+        end_date (str, optional): Last day of the current period (default: today).
+
+    Returns:
+        str: Both profiles and their deltas in JSON format.
+    """
+    print(f"Arguments received: mobile_number={mobile_number}, period_days={period_days}, end_date={end_date}")
+
+    # 1. Ingest the union of both periods once, anchored at end_date
+    end = pd.Timestamp(end_date).normalize() if end_date is not None else pd.Timestamp.now().normalize()
+    start = end - pd.Timedelta(days=2 * period_days - 1)
+    raw_df = ingest_data_batch([mobile_number], start_date=start, end_date=end)[mobile_number]
+
+    # 2. Preprocess once, then split in memory
+    cleaned_df = preprocess_data(raw_df, **config.get_preprocessing_config())
+
+    # 3. Process both periods and their deltas
+    comparison = compare_periods(cleaned_df, period_days=period_days, end_date=end_date)
+
+    # 4. Format to JSON
+    return format_to_json(comparison)
+
+def _build_patient_report(mobile_number, raw_df):
+    """Process-pool worker: build one patient's AGP report."""
+    if raw_df.empty:
+        return {"mobile_number": mobile_number, "error": "No data found"}
+    try:
+        return {"mobile_number": mobile_number, "agp_profile": json.loads(build_agp_report(raw_df, mobile_number))}
+    except Exception as e:
+        return {"mobile_number": mobile_number, "error": str(e)}
+
+def get_glucose_data_batch(patient_ids, window=90, max_workers=None):
+    """
+    Build AGP reports for a whole panel of patients.
+
+    Readings for all patients are bulk-fetched up front, then the per-patient
+    processing is spread over a process pool sized to the available cores.
+    Results are yielded as soon as each patient finishes, so callers can
+    stream them out; the order is not the input order.
+
+    Args:
+        patient_ids (list): Patient mobile numbers.
+        window (int, optional): Days of history to include (same as ingest_data).
+        max_workers (int, optional): Pool size; defaults to os.cpu_count().
+
+    Yields:
+        dict: {"mobile_number": ..., "agp_profile": {...}} or {"mobile_number": ..., "error": ...}
+    """
+    patient_ids = list(dict.fromkeys(patient_ids))
+    if not patient_ids:
+        return
+
+    started = time.perf_counter()
+    raw_frames = ingest_data_batch(patient_ids, days=window)
+    max_workers = max_workers or os.cpu_count() or 1
+
+    pool = None
+    if max_workers > 1 and len(patient_ids) > 1:
+        try:
+            pool = ProcessPoolExecutor(max_workers=min(max_workers, len(patient_ids)))
+        except OSError as e:
+            # No usable multiprocessing primitives (e.g. no /dev/shm on AWS Lambda)
+            print(f"Process pool unavailable ({e}), processing serially")
+
+    completed = 0
+    if pool is None:
+        for mobile_number in patient_ids:
+            completed += 1
+            yield _build_patient_report(mobile_number, raw_frames[mobile_number])
+    else:
+        with pool:
+            futures = [pool.submit(_build_patient_report, m, raw_frames[m]) for m in patient_ids]
+            for future in as_completed(futures):
+                completed += 1
+                yield future.result()
+
+    elapsed = time.perf_counter() - started
+    rate = completed / elapsed * 60 if elapsed > 0 else float('inf')
+    print(f"AGP batch: {completed} patients in {elapsed:.1f}s ({rate:.1f} patients/minute)")
+
 if __name__ == "__main__":
     """
     Main function for testing the get_glucose_data function.
@@ -0,0 +1,62 @@
+"""
+Run AGP reports for a panel of patients from the command line.
+
+Results are written as JSON lines to stdout as each patient completes;
+progress and throughput go to stderr. The pipeline's own diagnostic prints
+(including those of the pool workers) are sent to stderr too, so stdout
+carries nothing but the JSON records:
+
+    python run_batch.py --file mobile_numbers.txt > reports.jsonl
+
+Usage:
+    python run_batch.py +918521345464 +919898653214 --window 30
+    python run_batch.py --file mobile_numbers.txt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch AGP reports")
+    parser.add_argument('mobile_numbers', nargs='*', help="Patient mobile numbers")
+    parser.add_argument('--file', help="File with one mobile number per line")
+    parser.add_argument('--window', type=int, default=90, help="Days of history (default 90)")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    mobile_numbers = list(args.mobile_numbers)
+    if args.file:
+        with open(args.file) as f:
+            mobile_numbers += [line.strip() for line in f if line.strip()]
+    mobile_numbers = list(dict.fromkeys(mobile_numbers))
+    if not mobile_numbers:
+        parser.error("no mobile numbers given")
+
+    # Keep the real stdout for the records and point file descriptor 1 at
+    # stderr; forked pool workers inherit the redirect. The pipeline is
+    # imported afterwards because loading its config already prints.
+    sys.stdout.flush()
+    records = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    from main import get_glucose_data_batch
+
+    started = time.perf_counter()
+    count = 0
+    for result in get_glucose_data_batch(mobile_numbers, window=args.window, max_workers=args.workers):
+        count += 1
+        records.write(json.dumps(result) + "\n")
+        records.flush()
+        status = "error" if "error" in result else "ok"
+        print(f"[{count}/{len(mobile_numbers)}] {result['mobile_number']}: {status}", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed * 60 if elapsed > 0 else float('inf')
+    print(f"{count} patients in {elapsed:.1f}s ({rate:.1f} patients/minute)", file=sys.stderr)
+    records.close()
+
+
+if __name__ == "__main__":
+    main()
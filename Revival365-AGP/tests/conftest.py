@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The AGP modules import each other as top-level packages from src/, as on Lambda
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
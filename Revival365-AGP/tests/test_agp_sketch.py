@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_processing.agp_sketch import PERCENTILES, AgpSketchStore, open_patient_sketches
+from data_processing.process import compute_agp
+
+
+def synthetic_readings(days=90, seed=7):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.date_range("2025-01-01", periods=days * 288, freq="5min")
+    minutes = timestamps.hour * 60 + timestamps.minute
+    glucose = 120 + 40 * np.sin(minutes / 1440 * 2 * np.pi) + rng.normal(0, 25, len(timestamps))
+    return pd.DataFrame({'timestamp': timestamps, 'glucose': np.round(np.clip(glucose, 40, 400), 2)})
+
+
+def worst_deviation(approx, exact):
+    return max(
+        abs(a['percentiles'][k] - e['percentiles'][k])
+        for a, e in zip(approx['time_blocks'], exact['time_blocks'])
+        for k in PERCENTILES
+    )
+
+
+@pytest.mark.parametrize("max_error", [0.5, 2.0, 5.0])
+def test_percentiles_within_error_bound(max_error):
+    df = synthetic_readings()
+    store = AgpSketchStore(max_error=max_error)
+    store.add_readings(df)
+    assert worst_deviation(store.compute_agp(), compute_agp(df)) <= max_error + 0.01
+
+
+@pytest.mark.parametrize("max_error", [0.5, 2.0])
+def test_window_matches_exact_agp_of_the_window(max_error):
+    df = synthetic_readings()
+    store = AgpSketchStore(max_error=max_error)
+    store.add_readings(df)
+    window = df[(df['timestamp'] >= "2025-02-01") & (df['timestamp'] < "2025-02-15")]
+    approx = store.compute_agp("2025-02-01", "2025-02-14")
+    assert worst_deviation(approx, compute_agp(window)) <= max_error + 0.01
+
+
+def test_incremental_folds_only_recent_days():
+    df = synthetic_readings(days=20)
+    once = AgpSketchStore()
+    once.add_readings(df)
+
+    store = AgpSketchStore()
+    store.add_readings(df.iloc[: 10 * 288 + 100])  # ends part-way through day 11
+    changed = store.add_readings(df, backfill_days=1)
+    assert changed == 10  # day 11 completed and days 12-20 added; day 10 is rebuilt unchanged
+    assert store.watermark == df['timestamp'].iloc[-1].value
+    assert sorted(store.days) == sorted(once.days)
+    assert all(np.array_equal(store.days[d], once.days[d]) for d in once.days)
+
+    # The same frame again changes nothing
+    assert store.add_readings(df) == 0
+
+
+def test_backfilled_readings_inside_backfill_window_are_counted():
+    df = synthetic_readings(days=10)
+    gap = (df['timestamp'] >= "2025-01-09 08:00") & (df['timestamp'] < "2025-01-09 10:00")
+    store = AgpSketchStore()
+    store.add_readings(df[~gap])
+    assert store.add_readings(df, backfill_days=1) == 1
+
+    exact = AgpSketchStore()
+    exact.add_readings(df)
+    assert np.array_equal(store.days[max(store.days) - 1], exact.days[max(exact.days) - 1])
+
+
+def test_patient_sketches_persist_through_tapped_chunks(tmp_path):
+    df = synthetic_readings(days=14)
+    chunks = [df.iloc[i:i + 500] for i in range(0, len(df), 500)]
+
+    sketches = open_patient_sketches("+910000000000", store_dir=str(tmp_path))
+    assert sum(len(chunk) for chunk in sketches.tap(chunks)) == len(df)
+    agp = sketches.agp()
+    assert worst_deviation(agp, compute_agp(df)) <= 0.51
+
+    reloaded = AgpSketchStore.load(sketches.path)
+    assert reloaded.watermark == df['timestamp'].iloc[-1].value
+    assert sorted(reloaded.days) == sorted(sketches.store.days)
+    assert reloaded.compute_agp(df['timestamp'].iloc[0], df['timestamp'].iloc[-1]) == agp
@@ -0,0 +1,92 @@
+"""
+chart_config.py
+-----------
+Per-request glucose chart configuration.
+
+A patient's thresholds and time windows are loaded once per request into an
+immutable ChartConfig and passed explicitly to every calculator, so
+concurrent requests for different patients never share mutable state.
+"""
+
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
+
+
+@dataclass(frozen=True)
+class ChartConfig:
+    """
+    A patient's glucose monitoring configuration.
+
+    Times are 'HH:MM:SS' strings as stored in
+    patient_glucose_monitor_config_settings; thresholds are mg/dL.
+    """
+    fasting_end_time: Optional[str] = None
+    breakfast_start: Optional[str] = None
+    breakfast_end: Optional[str] = None
+    lunch_start: Optional[str] = None
+    lunch_end: Optional[str] = None
+    dinner_start: Optional[str] = None
+    dinner_end: Optional[str] = None
+    day_start: Optional[str] = None
+    day_end: Optional[str] = None
+    night_start: Optional[str] = None
+    night_end: Optional[str] = None
+    time_after_spike_day: Optional[str] = None
+    dip_threshold_day: Optional[float] = None
+    dip_threshold_night: Optional[float] = None
+    spike_threshold_day: Optional[float] = None
+    spike_threshold_night: Optional[float] = None
+    spike_threshold_breakfast: Optional[float] = None
+    spike_threshold_lunch: Optional[float] = None
+    spike_threshold_dinner: Optional[float] = None
+    spike_threshold_snack: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, config_dict):
+        """Build a config from a fetch_glucose_configuration record; unknown keys are ignored."""
+        names = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in config_dict.items() if key in names})
+
+    @property
+    def meal_spike_thresholds(self):
+        """Spike threshold per meal period (a new dict on every access)."""
+        return {
+            'breakfast': self.spike_threshold_breakfast,
+            'lunch': self.spike_threshold_lunch,
+            'dinner': self.spike_threshold_dinner,
+            'snack': self.spike_threshold_snack,
+        }
+
+
+def load_chart_config(mobile_no):
+    """
+    Fetch the latest glucose configuration for a patient by mobile number.
+
+    Args:
+        mobile_no (str): The patient's mobile number.
+
+    Returns:
+        tuple: (ChartConfig, None) on success, or (None, error message).
+    """
+    patient_id, error = fetch_patient_details(mobile_no)
+    if error or not patient_id:
+        return None, f"Patient not found for mobile: {mobile_no}"
+    return load_patient_chart_config(patient_id)
+
+
+def load_patient_chart_config(patient_id):
+    """
+    load_chart_config for an already resolved patient id.
+
+    Returns:
+        tuple: (ChartConfig, None) on success, or (None, error message).
+    """
+    config_data, config_error = fetch_glucose_configuration(patient_id)
+    if config_error:
+        return None, config_error
+    if config_data.empty:
+        return None, f"No glucose configuration found for patient_id: {patient_id}"
+
+    return ChartConfig.from_dict(config_data.to_dict(orient='records')[0]), None
@@ -0,0 +1,143 @@
+"""
+columnar.py
+-----------
+Compact columnar encoding of the weekly DHA trend charts (format=columnar).
+
+The default chart JSON repeats the chart's metadata block on every response
+and emits each day as a dict. The columnar form instead references the
+metadata by a content-hashed id (served once by /chart_metadata and cacheable
+forever) and emits weeks and days as parallel arrays built straight from the
+computed frames:
+
+    {
+      "format": "columnar",
+      "metadata_id": "tir-1-3f2a9c0b1d4e",
+      "weeks": {"week_label": [...], "week_start_day": [...], "week_end_day": [...], "time_in_range": [...]},
+      "days":  {"date": [...], "week_index": [...], "time_in_range": [...]}
+    }
+
+days.week_index points into the weeks arrays. Day names and the constant
+per-day description strings are left to the client.
+"""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+COLUMNAR = 'columnar'
+
+
+def metadata_id(chart, metadata):
+    """Versioned, content-addressed id of a chart's metadata block."""
+    digest = hashlib.sha256(json.dumps(metadata, sort_keys=True).encode()).hexdigest()[:12]
+    return f"{chart}-{FORMAT_VERSION}-{digest}"
+
+
+def chart_of(metadata_id_value):
+    """Chart name encoded in a metadata id (None if it is malformed)."""
+    parts = str(metadata_id_value).rsplit('-', 2)
+    return parts[0] if len(parts) == 3 else None
+
+
+def iso_week_start(years, weeks):
+    """Mondays (datetime64[D]) of the given ISO (year, week) pairs."""
+    years = np.asarray(years, dtype=np.int64)
+    weeks = np.asarray(weeks, dtype=np.int64)
+    # ISO week 1 is the week containing January 4th
+    jan4 = (years - 1970).astype('datetime64[Y]').astype('datetime64[D]') + np.timedelta64(3, 'D')
+    weekday = (jan4.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday; Monday == 0
+    return jan4 - weekday.astype('timedelta64[D]') + ((weeks - 1) * 7).astype('timedelta64[D]')
+
+
+def date_strings(dates):
+    """'YYYY-MM-DD' strings for datetime64 values."""
+    return np.datetime_as_string(np.asarray(dates, dtype='datetime64[D]'), unit='D').tolist()
+
+
+def int_values(values, divisor=1):
+    """int() of every value (truncation toward zero), as the dict charts do."""
+    values = np.asarray(values, dtype=np.float64)
+    if divisor != 1:
+        values = values / divisor
+    return np.trunc(values).astype(np.int64)
+
+
+def iso_keys(dates):
+    """ISO (year, week) arrays of datetime64 dates."""
+    iso = pd.DatetimeIndex(dates).isocalendar()
+    return iso['year'].to_numpy(dtype=np.int64), iso['week'].to_numpy(dtype=np.int64)
+
+
+def week_keys(dates):
+    """
+    ISO year * 100 + week of each date.
+
+    Both response formats match days to their week by this key, so a week
+    number that recurs in another year never pulls in that year's days.
+    """
+    years, weeks = iso_keys(dates)
+    return years * 100 + weeks
+
+
+def build_payload(chart, metadata, weekly, daily, columns, week_date_column=None, drop_empty_weeks=False):
+    """
+    Assemble a columnar chart response from a chart's weekly and daily frames.
+
+    :param chart: str, chart name used in the metadata id
+    :param metadata: dict, the chart's construct_metadata() block
+    :param weekly: pd.DataFrame of summary rows in output order, with ISO 'year'
+                   and 'week_number' columns (or see week_date_column)
+    :param daily: pd.DataFrame of daily rows with a datetime64 'date' column
+    :param columns: dict of output name -> (source column, divisor); values are
+                    emitted as int(value / divisor) for both weeks and days
+    :param week_date_column: derive the weeks' ISO year/week from this date column instead
+    :param drop_empty_weeks: omit weeks without any daily rows
+    :return: dict
+    """
+    payload = {
+        "format": COLUMNAR,
+        "metadata_id": metadata_id(chart, metadata),
+        "weeks": {"week_label": [], "week_start_day": [], "week_end_day": [], **{name: [] for name in columns}},
+        "days": {"date": [], "week_index": [], **{name: [] for name in columns}},
+    }
+    if weekly.empty or daily.empty:
+        return payload
+
+    if week_date_column:
+        week_years, week_numbers = iso_keys(weekly[week_date_column])
+    else:
+        week_years = weekly['year'].to_numpy(dtype=np.int64)
+        week_numbers = weekly['week_number'].to_numpy(dtype=np.int64)
+    day_dates = daily['date'].to_numpy(dtype='datetime64[ns]')
+
+    # Position of each day's week among the summary rows (-1 when absent)
+    week_index = pd.Index(week_years * 100 + week_numbers).get_indexer(week_keys(day_dates))
+
+    # Days grouped under their week, in summary order, then by date
+    order = np.lexsort((day_dates, week_index))
+    order = order[week_index[order] >= 0]
+    week_index = week_index[order]
+
+    keep_weeks = np.arange(len(week_years))
+    if drop_empty_weeks:
+        keep_weeks = np.flatnonzero(np.bincount(week_index, minlength=len(week_years)) > 0)
+        week_index = np.searchsorted(keep_weeks, week_index)
+
+    starts = iso_week_start(week_years[keep_weeks], week_numbers[keep_weeks])
+    weeks = payload['weeks']
+    weeks['week_label'] = week_numbers[keep_weeks].astype(str).tolist()
+    weeks['week_start_day'] = date_strings(starts)
+    weeks['week_end_day'] = date_strings(starts + np.timedelta64(6, 'D'))
+
+    days = payload['days']
+    days['date'] = date_strings(day_dates[order])
+    days['week_index'] = week_index.tolist()
+
+    for name, (source, divisor) in columns.items():
+        weeks[name] = int_values(weekly[source].to_numpy()[keep_weeks], divisor).tolist()
+        days[name] = int_values(daily[source].to_numpy()[order], divisor).tolist()
+
+    return payload
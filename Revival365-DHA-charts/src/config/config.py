@@ -49,6 +49,13 @@ class Config:
         }
     
 
+    def get_snapshot_config(self):
+        """Retrieve the chart snapshot store settings (DHA_SNAPSHOT_DB overrides the path)."""
+        return {
+            'enabled': self.config.getboolean('snapshots', 'enabled', fallback=False),
+            'path': os.getenv('DHA_SNAPSHOT_DB') or self.config.get('snapshots', 'path', fallback='/tmp/dha_snapshots.sqlite')
+        }
+
     def get_glucose_thresholds(self):
         """Retrieve glucose thresholds for shading."""
         return {
@@ -1,5 +1,7 @@
 from db.db_connection import Session, GlucoseReadings, GlucoseDailySummary  
 from db.UserDet import fetch_patient_details  # Existing function name
+from db.frames import readings_frame
+from sqlalchemy import func
 import pandas as pd
 import random
 
@@ -9,25 +11,29 @@ def interpolate_data(df, freq='5min'):
     df = df.set_index('timestamp').resample(freq).mean().interpolate()  # Resample to given frequency and interpolate
     return df.reset_index()
 
-def fetch_glucose_readings_by_patient_id(user_id):  # Function name unchanged
-    """Fetch glucose readings for a given user ID (passed as patient_id in queries)."""
+def fetch_glucose_readings_by_patient_id(user_id, start=None, end=None):  # Function name unchanged
+    """
+    Fetch glucose readings for a given user ID (passed as patient_id in queries).
+    Optional start (inclusive) / end (exclusive) timestamps limit the query window.
+    """
     print(f"Fetching glucose readings for user_id: {user_id}")
     with Session() as session:
         try:
-            readings = (
-                session.query(GlucoseReadings)
-                
+            # Only the two needed columns, not full ORM objects
+            query = (
+                session.query(GlucoseReadings.timestamp, GlucoseReadings.value)
                 .filter(GlucoseReadings.patient_id == user_id)  
-                .order_by(GlucoseReadings.timestamp)
-                .all()
             )
+            if start is not None:
+                query = query.filter(GlucoseReadings.timestamp >= start)
+            if end is not None:
+                query = query.filter(GlucoseReadings.timestamp < end)
+            readings = query.order_by(GlucoseReadings.timestamp).all()
 
             if readings:
                 print(f"Found {len(readings)} readings for user_id: {user_id}")
-                df = pd.DataFrame([{'timestamp': r.timestamp, 'value': r.value} for r in readings])
-                
-                # Ensure the 'value' column is numeric
-                df['value'] = pd.to_numeric(df['value'], errors='coerce')
+                # datetime64 timestamps, float32 values (non-numeric values become NaN)
+                df = readings_frame(readings)
                 df = df[df['value'] >= 30]
                 #df = interpolate_data(df)  # Call to the interpolation function
                 return df
@@ -38,14 +44,92 @@ def fetch_glucose_readings_by_patient_id(user_id):  # Function name unchanged
             print(f"An error occurred while fetching glucose readings for user_id {user_id}: {e}")
             return pd.DataFrame()  # Return an empty DataFrame on error
 
-def fetch_glucose_readings(user_id):  # Function name unchanged
-    return fetch_glucose_readings_by_patient_id(user_id)
+def fetch_first_reading_time(user_id):
+    """Timestamp of the earliest valid glucose reading for a user, or None."""
+    with Session() as session:
+        try:
+            return (
+                session.query(func.min(GlucoseReadings.timestamp))
+                .filter(GlucoseReadings.patient_id == user_id, GlucoseReadings.value >= 30)
+                .scalar()
+            )
+        except Exception as e:
+            print(f"An error occurred while fetching the first glucose reading for user_id {user_id}: {e}")
+            return None
+
+def fetch_reading_signature(user_id, up_to_id=None):
+    """
+    Change signature of a user's glucose readings: (count, largest id, sum of
+    values, earliest and latest timestamp), as a list of strings so it can be
+    stored and compared. Appends, deletes and edits of a value or timestamp
+    all change it. `up_to_id` limits it to readings with id <= up_to_id.
+    None if the query fails.
+    """
+    with Session() as session:
+        try:
+            query = session.query(
+                func.count(GlucoseReadings.id), func.max(GlucoseReadings.id), func.sum(GlucoseReadings.value),
+                func.min(GlucoseReadings.timestamp), func.max(GlucoseReadings.timestamp)
+            ).filter(GlucoseReadings.patient_id == user_id)
+            if up_to_id is not None:
+                query = query.filter(GlucoseReadings.id <= up_to_id)
+            count, max_id, total, first, last = query.one()
+            # Rounded so the float sum does not depend on the order it was added in
+            total = None if total is None else round(float(total), 2)
+            return [str(part) for part in (count, max_id, total, first, last)]
+        except Exception as e:
+            print(f"An error occurred while fetching the reading signature for user_id {user_id}: {e}")
+            return None
+
+def fetch_reading_span(user_id):
+    """(earliest, latest) timestamp of a user's valid glucose readings, or (None, None)."""
+    with Session() as session:
+        try:
+            return (
+                session.query(func.min(GlucoseReadings.timestamp), func.max(GlucoseReadings.timestamp))
+                .filter(GlucoseReadings.patient_id == user_id, GlucoseReadings.value >= 30)
+                .one()
+            )
+        except Exception as e:
+            print(f"An error occurred while fetching the reading span for user_id {user_id}: {e}")
+            return None, None
+
+def fetch_reading_times_since(user_id, high_water):
+    """Timestamps of a user's readings with id above `high_water` (newly ingested rows)."""
+    with Session() as session:
+        try:
+            rows = (
+                session.query(GlucoseReadings.timestamp)
+                .filter(GlucoseReadings.patient_id == user_id, GlucoseReadings.id > high_water)
+                .all()
+            )
+            return [row[0] for row in rows if row[0] is not None]
+        except Exception as e:
+            print(f"An error occurred while fetching new readings for user_id {user_id}: {e}")
+            return None
+
+def fetch_glucose_readings(user_id, start=None, end=None):  # Function name unchanged
+    return fetch_glucose_readings_by_patient_id(user_id, start, end)
     
-def get_glucose_readings_by_mobile_number(mobile_number):  # Function name unchanged
+def get_glucose_readings_by_mobile_number(mobile_number, window=None):  # Function name unchanged
+    """
+    Fetch a patient's glucose readings by mobile number.
+    window: optional paging.WeekWindow; only readings in [window.start, window.end) are read.
+    """
     user_id, error = fetch_patient_details(mobile_number)  # `fetch_patient_details` now returns user ID
     print(user_id)
     if user_id is not None:  # Check if a valid user ID is returned
-        df = fetch_glucose_readings(user_id)  # Fetch using the retrieved user ID
+        if window is not None:
+            df = fetch_glucose_readings(user_id, window.start.to_pydatetime(), window.end.to_pydatetime())
+        else:
+            df = fetch_glucose_readings(user_id)  # Fetch using the retrieved user ID
         return df, None  # Return the DataFrame and no error
     else:
         return None, error  # Return no data and an error message
+
+def get_first_reading_time_by_mobile_number(mobile_number):
+    """(earliest reading timestamp or None, error) for a patient's mobile number."""
+    user_id, error = fetch_patient_details(mobile_number)
+    if user_id is None:
+        return None, error
+    return fetch_first_reading_time(user_id), None
@@ -0,0 +1,75 @@
+"""
+Shared construction of glucose reading frames.
+
+All reading frames follow one compact dtype policy:
+ - timestamp: datetime64[ns]
+ - value:     float32 (CGM readings carry at most 2 decimals)
+ - date:      datetime64[ns] normalized to midnight, used as the day key
+
+Aggregations that accumulate many readings (sums, areas) should upcast to
+float64 at the reduction, not in the stored frame.
+
+This module is mirrored in Revival365-AGP/src/db/frames.py: each Lambda
+deploys only its own src/ directory, so the two trees cannot import one
+copy. Keep both copies identical apart from this paragraph.
+"""
+
+import numpy as np
+import pandas as pd
+
+VALUE_DTYPE = np.float32
+VALUE_DECIMALS = 2  # glucose_readings.value is Float(6, 2)
+
+
+def readings_frame(rows, value_column='value'):
+    """
+    Build a compact reading frame from (timestamp, value) rows, e.g. the
+    result of a column query.
+
+    :param rows: iterable of (timestamp, value) tuples
+    :param value_column: str, name of the value column
+    :return: pd.DataFrame with columns ['timestamp', value_column]
+    """
+    df = pd.DataFrame(list(rows), columns=['timestamp', value_column])
+    return compact_frame(df, value_column=value_column)
+
+
+def compact_frame(df, value_column='value'):
+    """
+    Coerce an existing reading frame to the compact dtypes. Unparseable
+    timestamps and values become NaT/NaN.
+
+    :param df: pd.DataFrame with columns ['timestamp', value_column]
+    :return: pd.DataFrame (a copy) with compact dtypes
+    """
+    df = df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce').astype('datetime64[ns]')
+    df[value_column] = pd.to_numeric(df[value_column], errors='coerce').astype(VALUE_DTYPE)
+    return df
+
+
+def add_day_key(df, column='date'):
+    """
+    Add the day of each reading as a datetime64 column (midnight of the
+    timestamp's day). Grouping on it avoids Python `datetime.date` objects.
+    """
+    df[column] = df['timestamp'].dt.normalize()
+    return df
+
+
+def float64_values(values):
+    """
+    float64 copy of float32 readings, rounded back to the stored decimals so
+    values that are printed (e.g. in episode descriptions) match the database
+    exactly.
+    """
+    return values.astype(np.float64).round(VALUE_DECIMALS)
+
+
+def day_ordinals(timestamps):
+    """
+    Integer day numbers (days since 1970-01-01) for an array-like of
+    timestamps; cheap keys for np.bincount / np.unique style grouping.
+    """
+    values = pd.to_datetime(timestamps).to_numpy(dtype='datetime64[ns]')
+    return values.astype('datetime64[D]').astype(np.int64)
@@ -0,0 +1,140 @@
+"""
+downsample.py
+-----------
+Reduce a day of sensor readings to a chart-sized series before serialization.
+
+Uses Largest-Triangle-Three-Buckets (LTTB), which keeps the points that
+shape the curve, and then forces each value column's global minimum and
+maximum into the result so clinically relevant spikes and dips survive.
+"""
+
+import numpy as np
+import pandas as pd
+
+MIN_POINTS = 3  # LTTB always keeps the first and last point plus one per bucket
+
+
+def parse_max_points(value):
+    """
+    Validate a max_points query parameter.
+
+    :param value: None, int or numeric str
+    :return: (max_points or None, error message or None)
+    """
+    if value is None or value == '':
+        return None, None
+    try:
+        max_points = int(value)
+    except (TypeError, ValueError):
+        return None, 'max_points must be an integer'
+    if max_points < MIN_POINTS:
+        return None, f'max_points must be at least {MIN_POINTS}'
+    return max_points, None
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Positions of the points chosen by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept. The remaining points are
+    split into n_out - 2 buckets; from each bucket the point forming the
+    largest triangle with the previously chosen point and the mean of the
+    next bucket is kept. Buckets depend on the previous choice, so they are
+    visited in order, but each bucket is evaluated as one array expression.
+
+    :param x: np.ndarray of float positions (e.g. seconds), ascending
+    :param y: np.ndarray of float values
+    :param n_out: int, number of points to keep
+    :return: np.ndarray of int positions, ascending
+    """
+    n = len(y)
+    if n_out >= n or n_out < MIN_POINTS:
+        return np.arange(n)
+
+    # n_out - 1 edges delimit n_out - 2 non-empty buckets over positions [1, n - 1)
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean()
+        next_y = y[stop:next_stop].mean()
+
+        area = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def keep_extremes(selected, columns):
+    """
+    Make sure the global minimum and maximum of every column are among the
+    selected positions, without growing the selection: each missing extreme
+    replaces the nearest selected point that is not an endpoint or another
+    extreme. With a very small selection only the extremes that fit are kept.
+
+    :param selected: np.ndarray of int positions, ascending
+    :param columns: list of np.ndarray value columns
+    :return: np.ndarray of int positions, ascending
+    """
+    selected = selected.copy()
+    protected = {int(selected[0]), int(selected[-1])}
+
+    for values in columns:
+        if np.isnan(values).all():
+            continue
+        for extreme in (int(np.nanargmin(values)), int(np.nanargmax(values))):
+            if extreme not in protected and extreme not in selected:
+                candidates = [i for i, position in enumerate(selected) if int(position) not in protected]
+                if not candidates:
+                    continue
+                nearest = min(candidates, key=lambda i: abs(int(selected[i]) - extreme))
+                selected[nearest] = extreme
+            protected.add(extreme)
+
+    return np.sort(selected)
+
+
+def downsample_readings(df, max_points, value_columns=('value',), time_column='timestamp'):
+    """
+    Downsample a reading frame to at most max_points rows.
+
+    LTTB runs on the first value column; the extremes of every value column
+    (e.g. systolic and diastolic) are then kept. Frames that already fit are
+    returned unchanged.
+
+    :param df: pd.DataFrame with a datetime time column and numeric value columns
+    :param max_points: int or None (None disables downsampling)
+    :param value_columns: sequence of value column names
+    :return: pd.DataFrame sorted by time with at most max_points rows
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+
+    df = df.sort_values(time_column, kind='stable')
+    times = pd.to_datetime(df[time_column]).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    x = (times - times[0]) / 1e9
+    columns = [df[column].to_numpy(dtype=np.float64) for column in value_columns]
+
+    selected = lttb_indices(x, np.nan_to_num(columns[0], nan=np.nanmean(columns[0])), max_points)
+    selected = keep_extremes(selected, columns)
+    return df.iloc[selected]
+
+
+if __name__ == "__main__":
+    timestamps = pd.date_range('2025-01-06', periods=1440, freq='1min')
+    values = 120 + 30 * np.sin(np.linspace(0, 6 * np.pi, 1440))
+    values[700] = 310  # isolated spike
+    readings = pd.DataFrame({'timestamp': timestamps, 'value': values})
+
+    reduced = downsample_readings(readings, 150)
+    print(f"{len(readings)} -> {len(reduced)} points, max kept: {reduced['value'].max()}")
@@ -0,0 +1,174 @@
+"""
+episodes.py
+-----------
+Vectorized run-length detection of glucose episodes.
+
+An episode is a run of consecutive readings inside one group (a day, or a
+day's night period) that lie beyond the group's mean glucose by a
+threshold. Each episode is reported by a single reading: the highest one
+for spikes, the lowest one for dips. Ties go to the earliest reading, as
+with Python's max()/min().
+
+All groups are handled in one pass over numpy arrays instead of one
+iterrows() scan per group. Time-of-day windows are evaluated on integer
+minutes since midnight, so windows that cross midnight (e.g. a night of
+22:00-06:00) work without string comparisons.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _grouped_arrays(df, keys):
+    """
+    Group codes, row order and float64 values with each group's rows made
+    contiguous while keeping their order within the group.
+    """
+    codes = df.groupby(keys, sort=True).ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    values = df['value'].to_numpy(dtype=np.float64)[order]
+    return codes[order], order, values
+
+
+def find_episodes(df, keys, means, threshold, kind='spike', closed_only=False):
+    """
+    Locate spike or dip episodes in every group at once.
+
+    Rows are visited in the order they appear in `df` within each group,
+    exactly as a per-group loop over `df[group_mask].iterrows()` would.
+
+    :param df: pd.DataFrame of readings with a 'value' column and the `keys` columns
+    :param keys: list of str, grouping columns (same as for the per-group means)
+    :param means: array-like, mean glucose per group in `df.groupby(keys)` order
+    :param threshold: float, or array-like with one value per row of `df`;
+                      distance from the mean that starts an episode
+    :param kind: 'spike' (above mean + threshold, keep the highest reading)
+                 or 'dip' (below mean - threshold, keep the lowest reading)
+    :param closed_only: bool, drop an episode still running at the group's
+                        last reading (it was never ended by a normal reading)
+    :return: list with one entry per group, each a list of row positions
+             (into `df`) of that group's episode extremes, in episode order
+    """
+    if kind not in ('spike', 'dip'):
+        raise ValueError(f"Unknown episode kind: {kind}")
+
+    means = np.asarray(means, dtype=np.float64)
+    episodes = [[] for _ in range(len(means))]
+    if df.empty:
+        return episodes
+
+    codes, order, values = _grouped_arrays(df, keys)
+    if np.ndim(threshold):
+        threshold = np.asarray(threshold, dtype=np.float64)[order]
+    if kind == 'spike':
+        mask = values > means[codes] + threshold
+    else:
+        mask = values < means[codes] - threshold
+
+    positions = np.flatnonzero(mask)
+    if len(positions) == 0:
+        return episodes
+
+    # A run starts wherever the previous flagged row is not adjacent or belongs to another group
+    starts = np.ones(len(positions), dtype=bool)
+    starts[1:] = (np.diff(positions) != 1) | (codes[positions[1:]] != codes[positions[:-1]])
+    run_ids = np.cumsum(starts) - 1
+
+    if closed_only:
+        # A run is closed when the row after its last row is in the same group
+        last = positions[np.r_[starts[1:], True]]
+        following = np.minimum(last + 1, len(codes) - 1)
+        closed = (last + 1 < len(codes)) & (codes[following] == codes[last])
+        keep = closed[run_ids]
+        positions, run_ids = positions[keep], run_ids[keep]
+        if len(positions) == 0:
+            return episodes
+        starts = np.r_[True, run_ids[1:] != run_ids[:-1]]
+        run_ids = np.cumsum(starts) - 1
+
+    # Extreme of each run; the earliest row wins ties
+    run_values = values[positions]
+    reduce = np.maximum if kind == 'spike' else np.minimum
+    extremes = reduce.reduceat(run_values, np.flatnonzero(starts))
+    is_extreme = run_values == extremes[run_ids]
+    _, first = np.unique(run_ids[is_extreme], return_index=True)
+    best = positions[is_extreme][first]
+
+    for code, row in zip(codes[best], order[best]):
+        episodes[code].append(int(row))
+    return episodes
+
+
+def find_dips_after_spikes(df, keys, means, spike_threshold, dip_threshold, window):
+    """
+    Locate dips that follow a spike within `window`, in every group at once.
+
+    Within a group, each spike reading (above mean + spike_threshold) opens
+    a new spike epoch. The first reading of the epoch that is below
+    mean - dip_threshold and no later than `window` after that spike is
+    reported, which closes the epoch (at most one dip per spike).
+
+    :param window: str or pd.Timedelta, e.g. '02:00:00'
+    :return: list with one entry per group of row positions (into `df`)
+    """
+    means = np.asarray(means, dtype=np.float64)
+    dips = [[] for _ in range(len(means))]
+    if df.empty:
+        return dips
+
+    codes, order, values = _grouped_arrays(df, keys)
+    times = df['timestamp'].to_numpy(dtype='datetime64[ns]')[order]
+
+    is_spike = values > means[codes] + spike_threshold
+    epochs = np.cumsum(is_spike)
+
+    # Spikes seen before each group's first row do not count for that group
+    group_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    base = (epochs - is_spike)[group_starts]
+    spikes_in_group = epochs - np.repeat(base, np.diff(np.r_[group_starts, len(codes)]))
+
+    spike_times = times[is_spike]
+    after_spike = spikes_in_group > 0
+    elapsed = np.full(len(times), np.timedelta64(0, 'ns'))
+    elapsed[after_spike] = times[after_spike] - spike_times[epochs[after_spike] - 1]
+
+    qualifies = (
+        after_spike
+        & (values < means[codes] - dip_threshold)
+        & (elapsed <= pd.Timedelta(window).to_timedelta64())
+    )
+    candidates = np.flatnonzero(qualifies)
+    _, first = np.unique(epochs[candidates], return_index=True)
+    best = np.sort(candidates[first])
+
+    for code, row in zip(codes[best], order[best]):
+        dips[code].append(int(row))
+    return dips
+
+
+def parse_minutes(value):
+    """Minute of the day for a configured 'HH:MM' or 'HH:MM:SS' time."""
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def minutes_since_midnight(timestamps):
+    """Minute of the day (0-1439) of each timestamp in a datetime Series."""
+    return (timestamps.dt.hour * 60 + timestamps.dt.minute).to_numpy()
+
+
+# Every minute of the day as 'HH:MM', the form the night charts compare
+CLOCK_MINUTES = np.array([f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(1440)])
+
+
+def label_time_segments(timestamps, start, end, inside, outside):
+    """
+    Label each timestamp `inside` if start <= 'HH:MM' < end, else `outside`.
+
+    This is the string test the night charts have always grouped by, kept
+    exactly: the configured times are compared as strings (so 'HH:MM:SS'
+    bounds shift the window by a minute) and the window never wraps past
+    midnight. It is evaluated once per minute of the day, then looked up.
+    """
+    labelled = (CLOCK_MINUTES >= str(start)) & (CLOCK_MINUTES < str(end))
+    return np.where(labelled[minutes_since_midnight(timestamps)], inside, outside)
@@ -3,61 +3,27 @@ import json
 from dateutil.tz import gettz
 
 from db.GlucRead import get_glucose_readings_by_mobile_number
-from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
+from db.frames import add_day_key, compact_frame
+from chart_config import load_chart_config
+from columnar import COLUMNAR, build_payload
 
 # Define IST timezone
 IST = gettz("Asia/Kolkata")
 
-# Global variable for fasting end time
-FASTING_END_TIME = None
-
-def get_glucose_config_by_mobile_number(mobile_no):
-    global FASTING_END_TIME
-    
-    print("here")  # Debugging print
-    
-    # Fetch the patient's ID based on mobile number
-    patient_id, error = fetch_patient_details(mobile_no)
-    if error or not patient_id:
-        return {"error": f"Patient not found for mobile: {mobile_no}"}
-    
-    # Fetch glucose configuration
-    config_data, config_error = fetch_glucose_configuration(patient_id)
-    if config_error:
-        return {"error": config_error}
-    
-    if not config_data.empty:
-        config_dict = config_data.to_dict(orient='records')[0]
-        fasting_end_str = config_dict.get("fasting_end_time")  # Expecting 'HH:MM:SS'
-        
-        if fasting_end_str:  # Ensure it's not None or empty
-            FASTING_END_TIME = pd.to_datetime(fasting_end_str, format='%H:%M:%S').time()
-
-    print(f"\n[DEBUG] FASTING_END_TIME (IST): {FASTING_END_TIME} (Type: {type(FASTING_END_TIME)})")  # Debugging
-    
-    return {
-        "mobile_no": mobile_no,
-        "glucose_configuration": config_data.to_dict(orient='records') if not config_data.empty else None
-    }
-
-
-
-
-def calculate_fbg(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-    global FASTING_END_TIME  # Ensure we use the global variable
-    
+def calculate_fbg(df: pd.DataFrame, config) -> tuple[pd.DataFrame, pd.DataFrame]:
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
-    # Convert timestamp to datetime and assign IST timezone
-    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize(None).dt.tz_localize(IST)
-    df['date'] = df['timestamp'].dt.date  # Extract date without timezone
+    # datetime64 timestamps, float32 values and a (timezone-free) datetime64 day key
+    df = add_day_key(compact_frame(df))
 
-    if isinstance(FASTING_END_TIME, str):  
-        FASTING_END_TIME = pd.to_datetime(FASTING_END_TIME, format='%H:%M:%S').time()
-    
-    # Convert FASTING_END_TIME to a datetime object in IST
-    df['fasting_end_datetime'] = df['timestamp'].dt.normalize() + pd.to_timedelta(FASTING_END_TIME.strftime('%H:%M:%S'))
+    # Assign IST timezone
+    df['timestamp'] = df['timestamp'].dt.tz_localize(None).dt.tz_localize(IST)
+
+    fasting_end_time = pd.to_datetime(config.fasting_end_time, format='%H:%M:%S').time()
+
+    # Convert the fasting end time to a datetime object in IST
+    df['fasting_end_datetime'] = df['timestamp'].dt.normalize() + pd.to_timedelta(fasting_end_time.strftime('%H:%M:%S'))
     
     # Compute time difference and select the closest value to fasting end time
     df['time_diff'] = (df['fasting_end_datetime'] - df['timestamp']).dt.total_seconds().abs()
@@ -65,7 +31,6 @@ def calculate_fbg(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
     fbg_df = fbg_df[['date', 'value']].rename(columns={'value': 'fbg'})
 
     # Add week and year for weekly aggregation
-    fbg_df['date'] = pd.to_datetime(fbg_df['date'])
     fbg_df['week_number'] = fbg_df['date'].dt.isocalendar().week
     fbg_df['year'] = fbg_df['date'].dt.isocalendar().year
 
@@ -146,6 +111,10 @@ def construct_json(daily_data: pd.DataFrame, weekly_summary: pd.DataFrame) -> di
     }
     return json_output
 
+def construct_columnar(daily_data: pd.DataFrame, weekly_summary: pd.DataFrame) -> dict:
+    """format=columnar variant of construct_json (see columnar.py)."""
+    return build_payload('fbs', construct_metadata(), weekly_summary, daily_data, {'fbg': ('fbg', 1)})
+
 def get_weekly_data_for_date(df: pd.DataFrame, date: str) -> pd.DataFrame:
     """
     Get the FBG data for the week that contains the specified date.
@@ -169,17 +138,18 @@ def get_weekly_data_for_date(df: pd.DataFrame, date: str) -> pd.DataFrame:
 
     return weekly_data[['date', 'fbg', 'week_number', 'year']]  # Return relevant columns
 
-def fbg_trends(mobile_no: str, specific_date: str = None) -> dict:
+def fbg_trends(mobile_no: str, specific_date: str = None, window=None, output_format: str = None) -> dict:
 
 
-    config = get_glucose_config_by_mobile_number(mobile_no)
-    if "error" in config:
-        return {"error": f"Could not fetch glucose configuration: {config['error']}"}
+    config, config_error = load_chart_config(mobile_no)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
         
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
+    build_output = construct_columnar if output_format == COLUMNAR else construct_json
     
     if df is not None and not df.empty:
-        daily_data, weekly_summary = calculate_fbg(df)
+        daily_data, weekly_summary = calculate_fbg(df, config)
         
         # If a specific date is provided, get the data for that week
         if specific_date:
@@ -190,7 +160,7 @@ def fbg_trends(mobile_no: str, specific_date: str = None) -> dict:
             ]
             
             if not weekly_data.empty:
-                output_json = construct_json(weekly_data, specific_week_summary)  # Pass only specific week data
+                output_json = build_output(weekly_data, specific_week_summary)  # Pass only specific week data
                 print(json.dumps(output_json, indent=4))
                 return output_json
             else:
@@ -202,7 +172,7 @@ def fbg_trends(mobile_no: str, specific_date: str = None) -> dict:
                 return error_output
         
         # In case no specific date is provided, return the full data
-        output_json = construct_json(daily_data, weekly_summary)
+        output_json = build_output(daily_data, weekly_summary)
         print(json.dumps(output_json, indent=4))
         return output_json
     else:
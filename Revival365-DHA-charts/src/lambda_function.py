@@ -6,10 +6,14 @@ load_dotenv()
 import json
 import logging
 from tir import tir_Trends  # Import the tir_Trends function
+from tir import construct_metadata as tir_metadata
 from fbg import fbg_trends
+from fbg import construct_metadata as fbg_metadata
 from mean_gluc import glucose_trends
+from mean_gluc import construct_metadata as mean_gluc_metadata
 from meal_spike import analyze_glucose_spikes
 from nAUC import nAUC_Trends
+from nAUC import construct_metadata as nauc_metadata
 from no_of_dips_day import analyze_glucose_dips_day
 from no_of_dips_night import analyze_glucose_dips_night
 from no_of_Spikes_day import analyze_glucose_spikes_day
@@ -21,12 +25,27 @@ from read_body_temperature import get_body_temperature_data_as_json
 from read_bp import get_blood_pressure_data_as_json
 from read_hr import get_heart_rate_data_as_json
 from read_spo2 import get_spo2_data_as_json
+from downsample import parse_max_points
+from paging import parse_window
+from columnar import COLUMNAR, chart_of, metadata_id
+from snapshots import refresh_patient, serve_snapshot, snapshots_enabled
+from db.GlucRead import get_first_reading_time_by_mobile_number
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+# Charts available as format=columnar, keyed by the name used in their metadata ids
+COLUMNAR_CHARTS = {'tir': tir_metadata, 'fbs': fbg_metadata, 'mean_gluc': mean_gluc_metadata, 'nauc': nauc_metadata}
+
+# Routes that do not take a mobile number
+PUBLIC_ROUTES = {'/master_glucose_config', '/chart_metadata'}
+
+# Weekly trend routes that accept start/end or weeks/cursor paging
+PAGED_ROUTES = {'/tir', '/fbs', '/mean_gluc', '/meal_spikes', '/nauc',
+                '/dips_day', '/dips_night', '/spikes_day', '/spikes_night'}
+
 def lambda_handler(event: dict, context) -> dict:
     
     logger.info("Lambda function started.")
@@ -34,7 +53,7 @@ def lambda_handler(event: dict, context) -> dict:
     
     path = event.get('rawPath', '')
     
-    if path != '/master_glucose_config':
+    if path not in PUBLIC_ROUTES:
     # Extract the mobile number from the query string parameters
         mobile_number = event.get('queryStringParameters', {}).get('mobile_number')
         specific_date = event.get('queryStringParameters', {}).get('date')
@@ -51,43 +70,76 @@ def lambda_handler(event: dict, context) -> dict:
         elif not (mobile_number.startswith('+') and mobile_number[1:].isdigit()) and not mobile_number.isdigit():
             logger.error("Invalid mobile number format.")
             return build_response(400, {'error': 'Invalid mobile_number format'})
+
+        # Optional point budget for the reading series routes
+        max_points, max_points_error = parse_max_points(event.get('queryStringParameters', {}).get('max_points'))
+        if max_points_error:
+            logger.error(max_points_error)
+            return build_response(400, {'error': max_points_error})
+
+        # Optional week window for the trend routes
+        window, window_error = parse_window(event.get('queryStringParameters', {}))
+        if window_error:
+            logger.error(window_error)
+            return build_response(400, {'error': window_error})
+        if window is not None and specific_date:
+            logger.error("date combined with a paging window.")
+            return build_response(400, {'error': 'date cannot be combined with start/end or weeks/cursor'})
+
+        # Optional compact response format (see columnar.py)
+        output_format = event.get('queryStringParameters', {}).get('format') or None
+        if output_format not in (None, 'json', COLUMNAR):
+            return build_response(400, {'error': f'Unsupported format: {output_format}'})
+        if output_format == COLUMNAR and path.lstrip('/') not in COLUMNAR_CHARTS:
+            return build_response(400, {'error': f'format=columnar is not available for {path}'})
  
 
 
   
 
     try:
+        # Trend charts come from the snapshot store when it is current (see snapshots.py)
+        trend_data = None
+        if path in PAGED_ROUTES and output_format != COLUMNAR and snapshots_enabled():
+            trend_data = serve_snapshot(path, mobile_number, specific_date, window)
+
         # Handle different paths for function calls
-        if path == '/tir':
-             trend_data = tir_Trends(mobile_number,specific_date)
+        if trend_data is not None:
+            logger.info(f"Served {path} from snapshot.")
+        elif path == '/tir':
+             trend_data = tir_Trends(mobile_number,specific_date,window,output_format)
         elif path == '/fbs':
-             trend_data = fbg_trends(mobile_number,specific_date)
+             trend_data = fbg_trends(mobile_number,specific_date,window,output_format)
         elif path == '/mean_gluc':
-             trend_data = glucose_trends(mobile_number,specific_date)
+             trend_data = glucose_trends(mobile_number,specific_date,window,output_format)
         elif path == '/meal_spikes':
-             trend_data = analyze_glucose_spikes(mobile_number,specific_date)
+             trend_data = analyze_glucose_spikes(mobile_number,specific_date,window)
         elif path == '/nauc':
-             trend_data = nAUC_Trends(mobile_number,specific_date)
+             trend_data = nAUC_Trends(mobile_number,specific_date,window,output_format)
         elif path == '/dips_day':
-             trend_data = analyze_glucose_dips_day(mobile_number,specific_date)
+             trend_data = analyze_glucose_dips_day(mobile_number,specific_date,window)
         elif path == '/dips_night':
-             trend_data = analyze_glucose_dips_night(mobile_number,specific_date)
+             trend_data = analyze_glucose_dips_night(mobile_number,specific_date,window)
         elif path == '/spikes_day':
-             trend_data = analyze_glucose_spikes_day(mobile_number,specific_date)
+             trend_data = analyze_glucose_spikes_day(mobile_number,specific_date,window)
         elif path == '/spikes_night':
-             trend_data = analyze_glucose_spikes_night(mobile_number,specific_date)  
+             trend_data = analyze_glucose_spikes_night(mobile_number,specific_date,window)  
         elif path == '/hr_readings':
-             trend_data = get_heart_rate_data_as_json(mobile_number,specific_date) 
+             trend_data = get_heart_rate_data_as_json(mobile_number,specific_date,max_points) 
         elif path == '/spo2_readings':
-             trend_data = get_spo2_data_as_json(mobile_number,specific_date) 
+             trend_data = get_spo2_data_as_json(mobile_number,specific_date,max_points) 
         elif path == '/bt_readings':
-             trend_data = get_body_temperature_data_as_json(mobile_number,specific_date) 
+             trend_data = get_body_temperature_data_as_json(mobile_number,specific_date,max_points) 
         elif path == '/bp_readings':
-             trend_data = get_blood_pressure_data_as_json(mobile_number,specific_date) 
+             trend_data = get_blood_pressure_data_as_json(mobile_number,specific_date,max_points) 
         elif path == '/glucose-readings':
-             trend_data = glucose_readings(mobile_number,specific_date) 
+             trend_data = glucose_readings(mobile_number,specific_date,max_points) 
+        elif path == '/refresh_snapshots':
+             trend_data = refresh_patient(mobile_number)
         elif path == '/master_glucose_config':  # New route for glucose master configuration
             trend_data = get_glucose_master_configuration_as_json()
+        elif path == '/chart_metadata':
+            return get_chart_metadata(event.get('queryStringParameters') or {})
         else:
             logger.error(f"Invalid path requested: {path}")
             return build_response(404, {'error': 'Not Found'})
@@ -97,13 +149,36 @@ def lambda_handler(event: dict, context) -> dict:
             logger.warning("No data found for the given mobile number.")
             return build_response(404, {'error': 'No data found for the given mobile number'})
 
+        # Paged responses say which weeks they hold and where the previous page starts
+        if path in PAGED_ROUTES and window is not None and isinstance(trend_data, dict):
+            first_reading, _ = get_first_reading_time_by_mobile_number(mobile_number)
+            trend_data['paging'] = window.describe(window.next_cursor(first_reading))
+
         return build_response(200, trend_data)
 
     except Exception as e:
         logger.error(f"Error in lambda_handler: {e}")
         return build_response(500, {'error': 'An internal error occurred', 'details': str(e)})
 
-def build_response(status_code: int, body: dict) -> dict:
+def get_chart_metadata(params: dict) -> dict:
+    """
+    Serve the metadata block referenced by a columnar response.
+    `id` returns that exact version (immutable, cacheable); `chart` returns the current one.
+    """
+    requested_id = params.get('id')
+    chart = chart_of(requested_id) if requested_id else params.get('chart')
+    if chart not in COLUMNAR_CHARTS:
+        return build_response(404, {'error': 'Unknown chart'})
+
+    metadata = COLUMNAR_CHARTS[chart]()
+    current_id = metadata_id(chart, metadata)
+    if requested_id and requested_id != current_id:
+        return build_response(404, {'error': 'Unknown metadata version', 'current_id': current_id})
+
+    headers = {'Cache-Control': 'public, max-age=31536000, immutable'} if requested_id else None
+    return build_response(200, {'metadata_id': current_id, 'metadata': metadata}, headers)
+
+def build_response(status_code: int, body: dict, headers: dict = None) -> dict:
     return {
         'statusCode': status_code,
         'body': json.dumps(body),
@@ -111,6 +186,7 @@ def build_response(status_code: int, body: dict) -> dict:
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, POST',
+            **(headers or {}),
         }
     }
      
\ No newline at end of file
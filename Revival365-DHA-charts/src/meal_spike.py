@@ -1,100 +1,31 @@
+import numpy as np
 import pandas as pd
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, float64_values
+from episodes import find_episodes, parse_minutes
 import json
-from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
-from datetime import datetime, timedelta
-# Configuration
-BREAKFAST_START = ''
-BREAKFAST_END = ' '
-LUNCH_START = ' '
-LUNCH_END = ' '
-DINNER_START = ' '
-DINNER_END = ' '
+from chart_config import load_chart_config
 
-SPIKE_THRESHOLDS = {
-    'breakfast': 0,
-    'lunch': 0,
-    'dinner': 0,
-    'snack': 0
-}
+MEAL_PERIODS = ['breakfast', 'lunch', 'dinner', 'snack']
+NS_PER_MINUTE = 60 * 10**9
 
 
-
-
-def get_glucose_config_by_mobile_number(mobile_no):
-
-    print("here")
-    """
-    Fetch glucose configuration for a patient using their mobile number.
-    
-    Args:
-        mobile_no (str): The patient's mobile number.
-    
-    Returns:
-        dict: Glucose configuration details or an error message.
-    """
-    global BREAKFAST_START, BREAKFAST_END, LUNCH_START, LUNCH_END, DINNER_START, DINNER_END, SPIKE_THRESHOLDS
-    
-    
-     # Fetch the patient's ID based on mobile number
-    patient_id, error = fetch_patient_details(mobile_no)
-    if error or not patient_id:
-        return {"error": f"Patient not found for mobile: {mobile_no}"}
-    
-    # Fetch glucose configuration
-    config_data, config_error = fetch_glucose_configuration(patient_id)
-    if config_error:
-        return {"error": config_error}
-    
-    if not config_data.empty:
-        config_dict = config_data.to_dict(orient='records')[0]
-        
-        # Update global variables
-        BREAKFAST_START = config_dict.get("breakfast_start")
-        BREAKFAST_END = config_dict.get("breakfast_end")
-        LUNCH_START = config_dict.get("lunch_start")
-        LUNCH_END = config_dict.get("lunch_end")
-        DINNER_START = config_dict.get("dinner_start")
-        DINNER_END = config_dict.get("dinner_end")
-
-        
-        
-        
-        
-        SPIKE_THRESHOLDS = {
-            'breakfast': config_dict.get("spike_threshold_breakfast"),
-            'lunch': config_dict.get("spike_threshold_lunch"),
-            'dinner': config_dict.get("spike_threshold_dinner"),
-            'snack': config_dict.get("spike_threshold_snack")
-        }
-        
-        print("Updated Configurations:")
-        print(f"BREAKFAST_START: {BREAKFAST_START}, BREAKFAST_END: {BREAKFAST_END}")
-        print(f"LUNCH_START: {LUNCH_START}, LUNCH_END: {LUNCH_END}")
-        print(f"DINNER_START: {DINNER_START}, DINNER_END: {DINNER_END}")
-        print("SPIKE_THRESHOLDS:", SPIKE_THRESHOLDS)
-    
-    return {
-        "mobile_no": mobile_no,
-        "glucose_configuration": config_data.to_dict(orient='records') if not config_data.empty else None
-    }
-
-def calculate_spikes_and_averages(df):
+def calculate_spikes_and_averages(df, config):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    df['date'] = pd.to_datetime(df['date'])
+    df = add_day_key(df)
+    # Descriptions print the raw reading; keep float64 so the text is unchanged
+    df['value'] = float64_values(df['value'])
 
     df = df.set_index('timestamp').between_time('00:00', '23:59').reset_index()
 
     # Aggregate daily data
     daily_data = df.groupby('date').agg(mean_glucose=('value', 'mean')).reset_index()
-    daily_data['spike_details'] = daily_data.apply(
-        lambda row: identify_spikes(df[df['date'] == row['date']], row['mean_glucose']), axis=1)
-    
-    for period in SPIKE_THRESHOLDS.keys():
+    daily_data['spike_details'] = identify_spikes(df, daily_data, config)
+
+    for period in config.meal_spike_thresholds.keys():
         daily_data[f'{period}_spikes'] = daily_data['spike_details'].apply(lambda x: len(x[period]))
 
     # Weekly summary
@@ -110,83 +41,97 @@ def calculate_spikes_and_averages(df):
 
     return daily_data, weekly_data
 
-def identify_spikes(df, mean_glucose):
-    spikes = {'breakfast': [], 'lunch': [], 'dinner': [], 'snack': []}
-    active_spike = {period: False for period in SPIKE_THRESHOLDS.keys()}  
-    current_spike = {period: None for period in SPIKE_THRESHOLDS.keys()}  
-
-    for _, row in df.iterrows():
-        current_time = row['timestamp']
-        current_value = row['value']
-
-        # Determine the period (passing next meal start time to prevent overlap)
-        if is_within_time_range(current_time, BREAKFAST_START, BREAKFAST_END, LUNCH_START):
-            period = 'breakfast'
-        elif is_within_time_range(current_time, LUNCH_START, LUNCH_END, DINNER_START):
-            period = 'lunch'
-        elif is_within_time_range(current_time, DINNER_START, DINNER_END):
-            period = 'dinner'
-        else:
-            period = 'snack'
-
-        threshold = SPIKE_THRESHOLDS[period]
-
-        if current_value > mean_glucose + threshold:
-            if not active_spike[period]:  
-                current_spike[period] = {
-                    'time': current_time.strftime('%H:%M'),
-                    'value': current_value,
-                    'above_mean': current_value - mean_glucose
-                }
-                active_spike[period] = True  
-            else:
-                if current_value > current_spike[period]['value']:
-                    current_spike[period] = {
-                        'time': current_time.strftime('%H:%M'),
-                        'value': current_value,
-                        'above_mean': current_value - mean_glucose
-                    }
-
-        else:
-            if active_spike[period]:  
-                spike_details = {
-                    'time': current_spike[period]['time'],
-                    'value': current_spike[period]['value'],
-                    'above_mean': current_spike[period]['above_mean'],
-                    'description': f"{period.capitalize()} spike to {current_spike[period]['value']} mg/dL ({current_spike[period]['above_mean']} mg/dL above mean) at {current_spike[period]['time']}"
-                }
-                spikes[period].append(spike_details)
-                current_spike[period] = None  
-                active_spike[period] = False  
-
-    return spikes
-
-
-
-def is_within_time_range(time, start, end, next_start=None):
- 
-
-    # Convert "HH:MM:SS" → "HH:MM" by slicing the first 5 characters
-    start = start[:5]
-    end = end[:5]
-    if next_start:
-        next_start = next_start[:5]
-
-    # Convert to time objects
-    start_time = datetime.strptime(start, "%H:%M").time()
-    end_time = datetime.strptime(end, "%H:%M").time()
-
-    # Extend end time by 1 hour
-    extended_end_time = (datetime.combine(datetime.today(), end_time) + timedelta(hours=1)).time()
-
-    if next_start:
-        next_start_time = datetime.strptime(next_start, "%H:%M").time()
-        extended_end_time = min(extended_end_time, next_start_time)
-
-    return start_time <= time.time() <= extended_end_time  # Ensure boundary cases are included
-
-
- 
+def meal_breakpoints(config):
+    """
+    Turn the configured meal windows into time-of-day breakpoints.
+
+    A meal window runs from its start to one hour after its end, capped at
+    the next meal's start, and includes both bounds. Windows are checked in
+    breakfast, lunch, dinner order, so a reading on a shared boundary goes
+    to the earlier meal; readings outside every window are snacks.
+
+    Returns:
+        tuple: (breaks, periods) where `breaks` are sorted nanoseconds since
+        midnight and periods[i] is the MEAL_PERIODS index for times in
+        [breaks[i], breaks[i + 1]).
+    """
+    meals = [
+        (config.breakfast_start, config.breakfast_end, config.lunch_start),
+        (config.lunch_start, config.lunch_end, config.dinner_start),
+        (config.dinner_start, config.dinner_end, None),
+    ]
+    windows = []
+    for start, end, next_start in meals:
+        start_minute = parse_minutes(start)
+        end_minute = (parse_minutes(end) + 60) % 1440  # Extend end time by 1 hour
+        if next_start:
+            end_minute = min(end_minute, parse_minutes(next_start))
+        # Inclusive bounds -> half-open [start, end + 1ns)
+        windows.append((start_minute * NS_PER_MINUTE, end_minute * NS_PER_MINUTE + 1))
+
+    breaks = np.unique([0] + [bound for window in windows for bound in window])
+    periods = np.full(len(breaks), MEAL_PERIODS.index('snack'))
+    for i, point in enumerate(breaks):
+        for period, (start, stop) in enumerate(windows):
+            if start <= point < stop:
+                periods[i] = period
+                break
+    return breaks, periods
+
+
+def classify_meal_periods(timestamps, config):
+    """MEAL_PERIODS index of every reading, from its time of day."""
+    breaks, periods = meal_breakpoints(config)
+    time_of_day = (timestamps - timestamps.dt.normalize()).to_numpy(dtype='timedelta64[ns]').astype(np.int64)
+    return periods[np.searchsorted(breaks, time_of_day, side='right') - 1]
+
+
+def identify_spikes(df, daily_data, config):
+    """
+    Meal spikes for every day in `daily_data`.
+
+    Each meal period is scanned on its own: a run of readings above the
+    day's mean plus the period's threshold is one spike, reported at its
+    highest reading, once a reading of the same period falls back below the
+    threshold. A spike still running at the end of the day is not reported.
+
+    Returns:
+        list: one {'breakfast': [...], 'lunch': [...], 'dinner': [...], 'snack': [...]}
+        dict per row of `daily_data`.
+    """
+    spike_thresholds = config.meal_spike_thresholds
+    df = df.assign(meal_period=classify_meal_periods(df['timestamp'], config))
+
+    keys = df.groupby(['date', 'meal_period'], sort=True).size().index
+    day_means = daily_data.set_index('date')['mean_glucose']
+    means = day_means.reindex(keys.get_level_values('date')).to_numpy()
+    thresholds = np.array([spike_thresholds[period] for period in MEAL_PERIODS], dtype=np.float64)
+
+    episodes = find_episodes(df, ['date', 'meal_period'], means,
+                             thresholds[df['meal_period'].to_numpy()], closed_only=True)
+
+    # Gather every peak reading in one take instead of one lookup per group
+    group_ids = np.repeat(np.arange(len(episodes)), [len(positions) for positions in episodes])
+    rows = np.array([row for positions in episodes for row in positions], dtype=np.int64)
+    peak_times = df['timestamp'].iloc[rows]
+    times = [f"{hour:02d}:{minute:02d}" for hour, minute in zip(peak_times.dt.hour.tolist(), peak_times.dt.minute.tolist())]
+    peaks = df['value'].to_numpy()[rows]
+    above = peaks - means[group_ids]
+
+    group_keys = keys.tolist()
+    spikes = {day: {period: [] for period in MEAL_PERIODS} for day in daily_data['date']}
+    for group_id, time, value, above_mean in zip(group_ids.tolist(), times, peaks.tolist(), above.tolist()):
+        day, period_index = group_keys[group_id]
+        period = MEAL_PERIODS[period_index]
+        spikes[day][period].append({
+            'time': time,
+            'value': value,
+            'above_mean': above_mean,
+            'description': f"{period.capitalize()} spike to {value} mg/dL ({above_mean} mg/dL above mean) at {time}"
+        })
+
+    return [spikes[day] for day in daily_data['date']]
+
 
 def get_weekly_data_for_date(df, date):
     """
@@ -320,18 +265,18 @@ def construct_metadata():
     }
     return metadata
 
-def analyze_glucose_spikes(mobile_no, specific_date=None):
-    config = get_glucose_config_by_mobile_number(mobile_no)
-    if "error" in config:
-        return {"error": f"Could not fetch glucose configuration: {config['error']}"}
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+def analyze_glucose_spikes(mobile_no, specific_date=None, window=None):
+    config, config_error = load_chart_config(mobile_no)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
     if df is None or df.empty:
         return {
             "error": "No glucose data found for the given mobile number.",
             "mobile_no": mobile_no
         }
 
-    daily_data, weekly_data = calculate_spikes_and_averages(df)
+    daily_data, weekly_data = calculate_spikes_and_averages(df, config)
     
     if specific_date:
         weekly_data_filtered = get_weekly_data_for_date(daily_data, specific_date)
@@ -1,6 +1,9 @@
 import pandas as pd
 import json  # Importing the json library
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, compact_frame
+from weekly import days_by_week
+from columnar import COLUMNAR, build_payload
 
 import pandas as pd
 
@@ -56,7 +59,8 @@ def calculate_glucose_metrics(df: pd.DataFrame, specific_date=None):
     if df is None or df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
-    df = df.copy()
+    # --- Datetime / dtype normalization (invalid rows become NaT/NaN) ---
+    df = compact_frame(df)
 
     # Remove invalid rows early
     df = df.dropna(subset=['timestamp', 'value'])
@@ -64,11 +68,7 @@ def calculate_glucose_metrics(df: pd.DataFrame, specific_date=None):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
-    # --- Datetime normalization ---
-    df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-    df = df.dropna(subset=['timestamp'])
-
-    df['date'] = df['timestamp'].dt.normalize()
+    df = add_day_key(df)
 
     # --- Daily aggregation ---
     daily_metrics = (
@@ -158,8 +158,9 @@ def construct_metadata():
 def construct_json(daily_data, weekly_summary):
     metadata = construct_metadata()
     data_list = []
+    days = days_by_week(daily_data)
 
-    for index, week in weekly_summary.iterrows():
+    for week in weekly_summary.to_dict('records'):
         week_number, year = week['week_number'], week['year']
         
         week_start_day = pd.to_datetime(f'{year}-W{week_number}-1', format='%G-W%V-%u').date()  # Monday
@@ -174,8 +175,7 @@ def construct_json(daily_data, weekly_summary):
             },
             "daily_data": []
         }
-        week_dates = daily_data[(daily_data['week_number'] == week_number) & (daily_data['year'] == year)]
-        for _, day in week_dates.iterrows():
+        for day in days.get((int(year), int(week_number)), []):
             day_data = {
                 "day": day['date'].strftime("%A"),
                 "date": day['date'].strftime("%Y-%m-%d"),
@@ -193,9 +193,15 @@ def construct_json(daily_data, weekly_summary):
     return json_output
 
 
-def glucose_trends(mobile_no, specific_date=None):
+def construct_columnar(daily_data, weekly_summary):
+    """format=columnar variant of construct_json (see columnar.py)."""
+    columns = {name: (name, 1) for name in ('mean_glucose', 'glycemic_variability')}
+    return build_payload('mean_gluc', construct_metadata(), weekly_summary, daily_data, columns)
+
+
+def glucose_trends(mobile_no, specific_date=None, window=None, output_format=None):
     """Fetch glucose trends based on mobile number and optional specific date."""
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
     if df is None or df.empty:
         return {
             "error": "No glucose data found for the given mobile number.",
@@ -204,6 +210,8 @@ def glucose_trends(mobile_no, specific_date=None):
 
     # Calculate metrics (weekly or for specific week)
     daily_data, weekly_summary = calculate_glucose_metrics(df, specific_date)
+    if output_format == COLUMNAR:
+        return construct_columnar(daily_data, weekly_summary)
     
     # Construct JSON output
     output_json = construct_json(daily_data, weekly_summary)
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from sqlalchemy.orm import Session
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, compact_frame, float64_values
+from columnar import COLUMNAR, build_payload, week_keys
 import json
 
 
@@ -38,19 +40,32 @@ import numpy as np
 
 #     return daily_data.reset_index(), weekly_summary
 
-def calculate_auc(df: pd.DataFrame, dx: int = 5) -> float:
+def calculate_daily_auc(df: pd.DataFrame) -> np.ndarray:
     """
-    Calculate Area Under the Curve (AUC) using the trapezoidal rule.
-    - Compatible with NumPy 2.x (np.trapezoid)
-    - Safe against NaN / empty input
+    Area Under the Curve (mg/dL x minutes) of every day at once, using the
+    trapezoidal rule over the real time between consecutive readings.
+
+    On regular 5-minute data this equals np.trapezoid(values, dx=5) per day;
+    irregular sampling and gaps are weighted by their actual duration.
+    Days with fewer than two readings have an AUC of 0.
+
+    :param df: pd.DataFrame sorted by timestamp with 'timestamp', 'value'
+               and a 'date' day key
+    :return: np.ndarray of AUC per day, in date order
     """
-    values = df['value'].dropna()
+    days = df['date'].to_numpy()
+    day_starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+
+    # Values are stored as float32; integrate in float64
+    values = float64_values(df['value']).to_numpy()
+    minutes = df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) / 60e9
 
-    # AUC requires at least two data points
-    if len(values) < 2:
-        return 0.0
+    # One trapezoid per pair of consecutive readings; pairs spanning midnight count for neither day
+    areas = np.zeros(len(values))
+    areas[:-1] = (values[:-1] + values[1:]) / 2 * np.diff(minutes)
+    areas[:-1][days[1:] != days[:-1]] = 0.0
 
-    return float(np.trapezoid(values, dx=dx))
+    return np.add.reduceat(areas, day_starts)
 
 
 def calculate_metrics(df: pd.DataFrame):
@@ -64,36 +79,30 @@ def calculate_metrics(df: pd.DataFrame):
     """
 
     # --- Input sanitation ---
-    df = df.copy()
+    df = compact_frame(df)
     df = df.dropna(subset=['timestamp', 'value'])
 
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
-    # Ensure proper datetime handling
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
+    # datetime64 day key for grouping; one sort makes every day a contiguous segment
+    df = add_day_key(df).sort_values('timestamp', kind='stable')
 
     # --- Daily aggregation ---
     daily_data = (
-        df.groupby('date', as_index=False)
-        .apply(lambda x: pd.Series({
-            'mean': float(x['value'].mean()) if not x['value'].empty else 0.0,
-            'AUC': calculate_auc(x)
-        }))
+        df.assign(value64=float64_values(df['value']))
+        .groupby('date', as_index=False)
+        .agg(mean=('value64', 'mean'))
     )
-
-    # Convert back to datetime for resampling
-    daily_data['date'] = pd.to_datetime(daily_data['date'])
+    daily_data['AUC'] = calculate_daily_auc(df)
 
     # --- Defensive normalization ---
     daily_data['mean'] = daily_data['mean'].fillna(0.0)
     daily_data['AUC'] = daily_data['AUC'].fillna(0.0)
 
-    daily_data['nAUC'] = daily_data.apply(
-        lambda row: float(row['AUC'] / row['mean']) if row['mean'] > 0 else 0.0,
-        axis=1
-    )
+    mean = daily_data['mean'].to_numpy()
+    auc = daily_data['AUC'].to_numpy()
+    daily_data['nAUC'] = np.divide(auc, mean, out=np.zeros_like(auc), where=mean > 0)
 
     # --- Weekly aggregation ---
     daily_data.set_index('date', inplace=True)
@@ -163,12 +172,11 @@ def construct_json(daily_data, weekly_summary, display_weeks=4):
     """Construct the required JSON output with data and metadata."""
     metadata = construct_metadata()
     data_list = []
-    
+    day_weeks = week_keys(daily_data['date']) if not daily_data.empty else np.array([], dtype=np.int64)
+
     for _, week in weekly_summary.iterrows():
         year, week_number, _ = week['date'].isocalendar()
-
-        week_number = week['date'].isocalendar()[1]  # Access the week number from the isocalendar tuple
-        week_start_day = pd.to_datetime(f'{week["date"].year}-W{week_number}-1', format='%G-W%V-%u').date()
+        week_start_day = pd.to_datetime(f'{year}-W{week_number}-1', format='%G-W%V-%u').date()
 
         week_end_day = week_start_day + pd.Timedelta(days=6)  # Sunday
         week_data = {
@@ -183,8 +191,8 @@ def construct_json(daily_data, weekly_summary, display_weeks=4):
             "daily_data": []
         }
         
-        # Get the ISO week number for the dates in daily_data and match with the current week in the loop
-        week_dates = daily_data[daily_data['date'].dt.isocalendar().week == week_number]
+        # Days of this ISO week (same key as the columnar format)
+        week_dates = daily_data[day_weeks == year * 100 + week_number]
         
         for _, day in week_dates.iterrows():
             day_data = {
@@ -208,9 +216,16 @@ def construct_json(daily_data, weekly_summary, display_weeks=4):
     return json_output
 
 
-def nAUC_Trends(mobile_no, specific_date=None):
+def construct_columnar(daily_data, weekly_summary):
+    """format=columnar variant of construct_json (see columnar.py); nAUC is /10 and AUC /1000."""
+    columns = {'nAUC': ('nAUC', 10), 'mean': ('mean', 1), 'AUC': ('AUC', 1000)}
+    return build_payload('nauc', construct_metadata(), weekly_summary, daily_data, columns,
+                         week_date_column='date', drop_empty_weeks=True)
+
+
+def nAUC_Trends(mobile_no, specific_date=None, window=None, output_format=None):
     """Main function to orchestrate the fetching and processing of glucose data."""
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
     
     if df is None or df.empty:
         return {
@@ -230,6 +245,8 @@ def nAUC_Trends(mobile_no, specific_date=None):
                 (pd.to_datetime(df['timestamp']).dt.date <= end_of_week.date())]
 
     daily_data, weekly_summary = calculate_metrics(df)
+    if output_format == COLUMNAR:
+        return construct_columnar(daily_data, weekly_summary)
     output_json = construct_json(daily_data, weekly_summary)
     return output_json
 
@@ -1,69 +1,27 @@
 import pandas as pd
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, float64_values
+from episodes import find_episodes
 import json
-from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
-# Configuration
-SPIKE_THRESHOLD = ''  # Glucose value increase that counts as a spike
-DAY_START = ''  # Start of day in HH:MM format
-DAY_END = ''  # End of day in HH:MM format
+from chart_config import load_chart_config
 
-def get_glucose_config_by_mobile_number(mobile_no):
 
-    print("here")
-     
-    global SPIKE_THRESHOLD,DAY_START, DAY_END
-    
-    
-     # Fetch the patient's ID based on mobile number
-    patient_id, error = fetch_patient_details(mobile_no)
-    if error or not patient_id:
-        return {"error": f"Patient not found for mobile: {mobile_no}"}
-    
-    # Fetch glucose configuration
-    config_data, config_error = fetch_glucose_configuration(patient_id)
-    if config_error:
-        return {"error": config_error}
-    
-    if not config_data.empty:
-        config_dict = config_data.to_dict(orient='records')[0]
-        
-        # Update global variables
-        SPIKE_THRESHOLD = config_dict.get("spike_threshold_day")
-     
-        DAY_START = config_dict.get("day_start")
-        DAY_END = config_dict.get("day_end")
-        
-        
-        
-        
-         
-        print("Updated Configurations:")
-        print(f"SPIKE_THRESHOLD: {SPIKE_THRESHOLD}")
- 
-        print(f"DAY_START: {DAY_START}, DAY_END: {DAY_END}")
- 
-    
-    return {
-        "mobile_no": mobile_no,
-        "glucose_configuration": config_data.to_dict(orient='records') if not config_data.empty else None
-    }
-
-
-
-def calculate_spikes_and_averages(df):
+def calculate_spikes_and_averages(df, config):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    df['date'] = pd.to_datetime(df['date'])  # Ensure 'date' is datetime type
+    df = add_day_key(df)
+    # Descriptions print the raw reading; keep float64 so the text is unchanged
+    df['value'] = float64_values(df['value'])
 
     # Filter data within the configured daily start and end times
-    df = df.set_index('timestamp').between_time(DAY_START, DAY_END).reset_index()
+    df = df.set_index('timestamp').between_time(config.day_start, config.day_end).reset_index()
 
     # Calculate daily mean glucose and identify spikes
     daily_data = df.groupby('date').agg(mean_glucose=('value', 'mean')).reset_index()
-    daily_data['spike_details'] = daily_data.apply(lambda row: identify_spikes(df[df['date'] == row['date']], row['mean_glucose']), axis=1)
+    episodes = find_episodes(df, ['date'], daily_data['mean_glucose'], config.spike_threshold_day)
+    daily_data['spike_details'] = [describe_spikes(df, positions) for positions in episodes]
 
     # Aggregate weekly spikes and calculate daily average
     weekly_data = daily_data.groupby(daily_data['date'].dt.isocalendar().week).agg(
@@ -74,36 +32,15 @@ def calculate_spikes_and_averages(df):
 
     return daily_data, weekly_data
 
-def identify_spikes(df, mean_glucose):
+def describe_spikes(df, positions):
+    """Build the spike entries for the peak readings at `positions` in `df`."""
     spikes = []
-    in_spike = False
-    spike_group = []
-
-    for _, row in df.iterrows():
-        if row['value'] > mean_glucose + SPIKE_THRESHOLD:
-            in_spike = True
-            spike_group.append(row)
-        else:
-            if in_spike:
-                # When exiting a spike group, record the highest reading in that group
-                max_spike = max(spike_group, key=lambda x: x['value'])
-                spikes.append({
-                    'time': max_spike['timestamp'].strftime('%H:%M'),
-                    'value': int(max_spike['value']),
-                    'description': f"Glucose level of {max_spike['value']} mg/dL at {max_spike['timestamp'].strftime('%H:%M')}"
-                })
-                spike_group = []  # Reset for the next spike
-                in_spike = False
-
-    # Handle last spike group if the data ends with a spike
-    if in_spike and spike_group:
-        max_spike = max(spike_group, key=lambda x: x['value'])
+    for timestamp, value in zip(df['timestamp'].iloc[positions], df['value'].iloc[positions]):
         spikes.append({
-            'time': max_spike['timestamp'].strftime('%H:%M'),
-            'value': int(max_spike['value']),
-            'description': f"Glucose level of {max_spike['value']} mg/dL at {max_spike['timestamp'].strftime('%H:%M')}"
+            'time': timestamp.strftime('%H:%M'),
+            'value': int(value),
+            'description': f"Glucose level of {value} mg/dL at {timestamp.strftime('%H:%M')}"
         })
-
     return spikes
 
 
@@ -217,7 +154,7 @@ def analyze_glucose_spikes_day(mobile_no):
         }
     
     if df is not None:
-        daily_data, weekly_data = calculate_spikes_and_averages(df)
+        daily_data, weekly_data = calculate_spikes_and_averages(df, config)
         output_json = construct_spikes_json(daily_data, weekly_data)
 #       print(output_json)
         print(json.dumps(output_json, indent=4)) 
@@ -226,12 +163,12 @@ def analyze_glucose_spikes_day(mobile_no):
         print(mobile_no)
     return output_json
 '''
-def analyze_glucose_spikes_day(mobile_no, specific_date=None):
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+def analyze_glucose_spikes_day(mobile_no, specific_date=None, window=None):
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
 
-    config = get_glucose_config_by_mobile_number(mobile_no)
-    if "error" in config:
-        return {"error": f"Could not fetch glucose configuration: {config['error']}"}
+    config, config_error = load_chart_config(mobile_no)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
     
     if df is None or df.empty:
         return {
@@ -256,7 +193,7 @@ def analyze_glucose_spikes_day(mobile_no, specific_date=None):
             return {"error": f"No glucose data found in the week containing {specific_date}."}
 
     # Calculate spikes and averages
-    daily_data, weekly_data = calculate_spikes_and_averages(df)
+    daily_data, weekly_data = calculate_spikes_and_averages(df, config)
     output_json = construct_spikes_json(daily_data, weekly_data)
     
     print(json.dumps(output_json, indent=4))
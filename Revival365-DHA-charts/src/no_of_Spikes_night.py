@@ -1,81 +1,35 @@
 import pandas as pd
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, float64_values
+from episodes import find_episodes, label_time_segments
 import json
 from datetime import datetime, timedelta
-from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
-
-# Configuration
-SPIKE_THRESHOLD = ''  # Glucose value increase that counts as a spike
-DAY_START = ''  # Start of day in HH:MM format
-DAY_END = ''  # End of day in HH:MM format
-NIGHT_START = ''  # Start of night in HH:MM format
-NIGHT_END = ''  # End of night in HH:MM format
-
-
-
-def get_glucose_config_by_mobile_number(mobile_no):
-
-    print("here")
-     
-    global SPIKE_THRESHOLD, NIGHT_START, NIGHT_END, DAY_START, DAY_END
-    
-    
-     # Fetch the patient's ID based on mobile number
-    patient_id, error = fetch_patient_details(mobile_no)
-    if error or not patient_id:
-        return {"error": f"Patient not found for mobile: {mobile_no}"}
-    
-    # Fetch glucose configuration
-    config_data, config_error = fetch_glucose_configuration(patient_id)
-    if config_error:
-        return {"error": config_error}
-    
-    if not config_data.empty:
-        config_dict = config_data.to_dict(orient='records')[0]
-        
-        # Update global variables
-        SPIKE_THRESHOLD = config_dict.get("dip_threshold_night")
-        NIGHT_START = config_dict.get("night_start")
-        NIGHT_END = config_dict.get("night_end")
-        DAY_START = config_dict.get("day_start")
-        DAY_END = config_dict.get("day_end")
-        
-        
-        
-        
-         
-        print("Updated Configurations:")
-        print(f"NIGHT_START: {NIGHT_START}")
-        print(f"NIGHT_END: {NIGHT_END}")
-        print(f"DAY_START: {DAY_START}, DAY_END: {DAY_END}")
- 
-    
-    return {
-        "mobile_no": mobile_no,
-        "glucose_configuration": config_data.to_dict(orient='records') if not config_data.empty else None
-    }
+from chart_config import load_chart_config
 
 
-
-def calculate_night_spikes_and_averages(df):
+def calculate_night_spikes_and_averages(df, config):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    df['date'] = pd.to_datetime(df['date'])  # Ensure 'date' is datetime type
+    df = add_day_key(df)
+    # Descriptions print the raw reading; keep float64 so the text is unchanged
+    df['value'] = float64_values(df['value'])
 
     # Filter data within the configured night time segments
     night_df = df.set_index('timestamp')
-    morning_segment = pd.concat([night_df.between_time(NIGHT_START, "23:59"), night_df.between_time("00:00", DAY_START)]).reset_index()
-    evening_segment = night_df.between_time(DAY_END, NIGHT_END).reset_index()
+    morning_segment = pd.concat([night_df.between_time(config.night_start, "23:59"), night_df.between_time("00:00", config.day_start)]).reset_index()
+    evening_segment = night_df.between_time(config.day_end, config.night_end).reset_index()
     night_df = pd.concat([morning_segment, evening_segment]).drop_duplicates()
 
 
     # Calculate daily mean glucose and identify spikes for night time
-    night_df['night_period'] = night_df['timestamp'].apply(lambda x: 'morning_segment' if NIGHT_START <= x.strftime('%H:%M') < DAY_START else 'night_segment')
+    night_df['night_period'] = label_time_segments(night_df['timestamp'], config.night_start, config.day_start,
+                                                   'morning_segment', 'night_segment')
     daily_data = night_df.groupby(['date', 'night_period']).agg(mean_glucose=('value', 'mean')).reset_index()
-    daily_data['spike_details'] = daily_data.apply(lambda row: identify_spikes(night_df[(night_df['date'] == row['date']) & (night_df['night_period'] == row['night_period'])], row['mean_glucose']), axis=1)
+    # The night spike chart has always been driven by the night dip threshold
+    episodes = find_episodes(night_df, ['date', 'night_period'], daily_data['mean_glucose'], config.dip_threshold_night)
+    daily_data['spike_details'] = [describe_spikes(night_df, positions) for positions in episodes]
     # Aggregate weekly spikes and calculate daily average
     weekly_data = daily_data.groupby(daily_data['date'].dt.isocalendar().week).agg(
         weekly_spikes=('spike_details', lambda x: sum(len(d) for d in x)),
@@ -85,36 +39,15 @@ def calculate_night_spikes_and_averages(df):
 
     return daily_data, weekly_data
 
-def identify_spikes(df, mean_glucose):
+def describe_spikes(df, positions):
+    """Build the spike entries for the peak readings at `positions` in `df`."""
     spikes = []
-    in_spike = False
-    spike_group = []
-
-    for _, row in df.iterrows():
-        if row['value'] > mean_glucose + SPIKE_THRESHOLD:
-            in_spike = True
-            spike_group.append(row)
-        else:
-            if in_spike:
-                # When exiting a spike group, record the highest reading in that group
-                max_spike = max(spike_group, key=lambda x: x['value'])
-                spikes.append({
-                    'time': max_spike['timestamp'].strftime('%H:%M'),
-                    'value': int(max_spike['value']),
-                    'description': f"Glucose level of {max_spike['value']} mg/dL at {max_spike['timestamp'].strftime('%H:%M')}"
-                })
-                spike_group = []  # Reset for the next spike
-                in_spike = False
-
-    # Handle last spike group if the data ends with a spike
-    if in_spike and spike_group:
-        max_spike = max(spike_group, key=lambda x: x['value'])
+    for timestamp, value in zip(df['timestamp'].iloc[positions], df['value'].iloc[positions]):
         spikes.append({
-            'time': max_spike['timestamp'].strftime('%H:%M'),
-            'value': int(max_spike['value']),
-            'description': f"Glucose level of {max_spike['value']} mg/dL at {max_spike['timestamp'].strftime('%H:%M')}"
+            'time': timestamp.strftime('%H:%M'),
+            'value': int(value),
+            'description': f"Glucose level of {value} mg/dL at {timestamp.strftime('%H:%M')}"
         })
-
     return spikes
 
 def construct_spikes_json(daily_data, weekly_data):
@@ -214,11 +147,11 @@ def construct_metadata():
     }
     return metadata
 
-def analyze_glucose_spikes_night(mobile_no, date=None):
-    config = get_glucose_config_by_mobile_number(mobile_no)
-    if "error" in config:
-        return {"error": f"Could not fetch glucose configuration: {config['error']}"}
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+def analyze_glucose_spikes_night(mobile_no, date=None, window=None):
+    config, config_error = load_chart_config(mobile_no)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
     if df is None or df.empty:
         return {
             "error": "No glucose data found for the given mobile number.",
@@ -227,12 +160,12 @@ def analyze_glucose_spikes_night(mobile_no, date=None):
 
     # If a date is provided, filter data for that week
     if date:
-        date = pd.to_datetime(date)
+        date = pd.to_datetime(date).normalize()
         start_of_week = date - timedelta(days=date.weekday())  # Get the start of the week (Monday)
-        end_of_week = start_of_week + timedelta(days=6)  # Get the end of the week (Sunday)
-        df = df[(df['timestamp'] >= start_of_week) & (df['timestamp'] <= end_of_week)]
+        end_of_week = start_of_week + timedelta(days=7)  # Following Monday 00:00, so all of Sunday is included
+        df = df[(df['timestamp'] >= start_of_week) & (df['timestamp'] < end_of_week)]
 
-    daily_data, weekly_data = calculate_night_spikes_and_averages(df)
+    daily_data, weekly_data = calculate_night_spikes_and_averages(df, config)
     output_json = construct_spikes_json(daily_data, weekly_data)
 
     print(json.dumps(output_json, indent=4))
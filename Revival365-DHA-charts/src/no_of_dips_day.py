@@ -1,77 +1,27 @@
 import pandas as pd
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, float64_values
+from episodes import find_dips_after_spikes
 import json
-from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
+from chart_config import load_chart_config
 
 
-# Configuration
-DIP_THRESHOLD = ''  # Glucose value decrease below mean that counts as a dip
-SPIKE_THRESHOLD = ''  # Glucose value increase above mean that counts as a spike
-TIME_AFTER_SPIKE = ''  # Time window after a spike to look for a dip
-DAY_START = ''  # Start of day in HH:MM format
-DAY_END = ''  # End of day in HH:MM format
-
-
-def get_glucose_config_by_mobile_number(mobile_no):
-
-    print("here")
-     
-    global DIP_THRESHOLD, SPIKE_THRESHOLD, TIME_AFTER_SPIKE, DAY_START, DAY_END
-    
-    
-     # Fetch the patient's ID based on mobile number
-    patient_id, error = fetch_patient_details(mobile_no)
-    if error or not patient_id:
-        return {"error": f"Patient not found for mobile: {mobile_no}"}
-    
-    # Fetch glucose configuration
-    config_data, config_error = fetch_glucose_configuration(patient_id)
-    if config_error:
-        return {"error": config_error}
-    
-    if not config_data.empty:
-        config_dict = config_data.to_dict(orient='records')[0]
-        
-        # Update global variables
-        DIP_THRESHOLD = config_dict.get("dip_threshold_day")
-        SPIKE_THRESHOLD = config_dict.get("spike_threshold_day")
-        TIME_AFTER_SPIKE = config_dict.get("time_after_spike_day")
-        DAY_START = config_dict.get("day_start")
-        DAY_END = config_dict.get("day_end")
-        
-        
-        
-        
-         
-        print("Updated Configurations:")
-        print(f"DIP_THRESHOLD: {DIP_THRESHOLD}")
-        print(f"SPIKE_THRESHOLD: {SPIKE_THRESHOLD}")
-        print(f"DAY_START: {DAY_START}, DAY_END: {DAY_END}")
-        print("TIME_AFTER_SPIKE:", TIME_AFTER_SPIKE)
-    
-    return {
-        "mobile_no": mobile_no,
-        "glucose_configuration": config_data.to_dict(orient='records') if not config_data.empty else None
-    }
-
-
-
-
-def calculate_dips_and_averages(df):
+def calculate_dips_and_averages(df, config):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    df['date'] = pd.to_datetime(df['date'])
+    df = add_day_key(df)
+    # Descriptions print the raw reading; keep float64 so the text is unchanged
+    df['value'] = float64_values(df['value'])
 
-    df = df.set_index('timestamp').between_time(DAY_START, DAY_END).reset_index()
+    df = df.set_index('timestamp').between_time(config.day_start, config.day_end).reset_index()
 
     # Aggregate daily data
     daily_data = df.groupby('date').agg(mean_glucose=('value', 'mean')).reset_index()
-    daily_data['dip_details'] = daily_data.apply(
-        lambda row: identify_dips(df[df['date'] == row['date']], row['mean_glucose']), axis=1)
-    
+    dips = find_dips_after_spikes(df, ['date'], daily_data['mean_glucose'], config.spike_threshold_day,
+                                  config.dip_threshold_day, config.time_after_spike_day)
+    daily_data['dip_details'] = [describe_dips(df, positions) for positions in dips]
     daily_data['dips'] = daily_data['dip_details'].apply(lambda x: len(x))
 
     # Weekly summary
@@ -84,33 +34,15 @@ def calculate_dips_and_averages(df):
 
     return daily_data, weekly_data
 
-def identify_dips(df, mean_glucose):
+def describe_dips(df, positions):
+    """Build the dip entries for the readings at `positions` in `df`."""
     dips = []
-    spike_time = None  # Track the time when a spike occurs
-    debug_info = []  # Collect debugging information
-
-    for _, row in df.iterrows():
-        current_time = row['timestamp']
-        current_value = row['value']
-        
-        # Check for spike
-        if current_value > mean_glucose + SPIKE_THRESHOLD:
-            spike_time = current_time
-           # debug_info.append(f"Spike detected: {current_value} at {current_time}")
-        
-        # Check for dip within the time window after a spike
-        if spike_time:
-            if (current_time - spike_time <= pd.Timedelta(TIME_AFTER_SPIKE)):
-                if current_value < mean_glucose - DIP_THRESHOLD:
-                    dips.append({
-                        'time': current_time.strftime('%H:%M'),
-                        'glucose_reading': current_value,  # Store the actual glucose reading at the dip
-                        'description': f"Glucose level dipped to {current_value} mg/dL at {current_time.strftime('%H:%M')}"
-                    })
- 
-                    spike_time = None  # Reset spike time after recording a dip
-
-    
+    for timestamp, value in zip(df['timestamp'].iloc[positions], df['value'].iloc[positions]):
+        dips.append({
+            'time': timestamp.strftime('%H:%M'),
+            'glucose_reading': value,  # Store the actual glucose reading at the dip
+            'description': f"Glucose level dipped to {value} mg/dL at {timestamp.strftime('%H:%M')}"
+        })
     return dips
 
 
@@ -200,14 +132,14 @@ def construct_metadata():
     }
     return metadata
 
-def analyze_glucose_dips_day(mobile_no, specific_date=None):
+def analyze_glucose_dips_day(mobile_no, specific_date=None, window=None):
 
 
-    config = get_glucose_config_by_mobile_number(mobile_no)
-    if "error" in config:
-        return {"error": f"Could not fetch glucose configuration: {config['error']}"}
+    config, config_error = load_chart_config(mobile_no)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
 
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
 
     if df is None or df.empty:
         return {
@@ -229,7 +161,7 @@ def analyze_glucose_dips_day(mobile_no, specific_date=None):
         df = df[(df['timestamp'].dt.date >= week_start) & (df['timestamp'].dt.date <= week_end)]
 
     if not df.empty:
-        daily_data, weekly_data = calculate_dips_and_averages(df)  # Calculate dips and averages
+        daily_data, weekly_data = calculate_dips_and_averages(df, config)  # Calculate dips and averages
 
         # Construct the output JSON using the data for the specific week
         output_json = construct_dips_json(daily_data, weekly_data)
@@ -1,81 +1,33 @@
 import pandas as pd
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key
+from episodes import find_episodes, label_time_segments
 import json
-from glucose_configuration import fetch_glucose_configuration, fetch_patient_details
+from chart_config import load_chart_config
 
 
-# Configuration
-DIP_THRESHOLD = ''  # Glucose value decrease that counts as a dip
-DAY_START = ''  # Start of day in HH:MM format
-DAY_END = ''  # End of day in HH:MM format
-NIGHT_START = ''  # Start of night in HH:MM format
-NIGHT_END = ''  # End of night in HH:MM format
-
-
-def get_glucose_config_by_mobile_number(mobile_no):
-
-    print("here")
-     
-    global DIP_THRESHOLD, NIGHT_START, NIGHT_END, DAY_START, DAY_END
-    
-    
-     # Fetch the patient's ID based on mobile number
-    patient_id, error = fetch_patient_details(mobile_no)
-    if error or not patient_id:
-        return {"error": f"Patient not found for mobile: {mobile_no}"}
-    
-    # Fetch glucose configuration
-    config_data, config_error = fetch_glucose_configuration(patient_id)
-    if config_error:
-        return {"error": config_error}
-    
-    if not config_data.empty:
-        config_dict = config_data.to_dict(orient='records')[0]
-        
-        # Update global variables
-        DIP_THRESHOLD = config_dict.get("dip_threshold_night")
-        NIGHT_START = config_dict.get("night_start")
-        NIGHT_END = config_dict.get("night_end")
-        DAY_START = config_dict.get("day_start")
-        DAY_END = config_dict.get("day_end")
-        
-        
-        
-        
-         
-        print("Updated Configurations:")
-        print(f"DIP_THRESHOLD: {DIP_THRESHOLD}")
-        print(f"NIGHT_END: {NIGHT_END}")
-        print(f"DAY_START: {DAY_START}, DAY_END: {DAY_END}")
- 
-    
-    return {
-        "mobile_no": mobile_no,
-        "glucose_configuration": config_data.to_dict(orient='records') if not config_data.empty else None
-    }
-
-
-def calculate_night_dips_and_averages(df):
+def calculate_night_dips_and_averages(df, config):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
     df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-    df['date'] = pd.to_datetime(df['date'])  # Ensure 'date' is datetime type
+    df = add_day_key(df)
 
     df['value'] = df['value'].astype(int)
 
 
     # Filter data within the configured night time segments
     night_df = df.set_index('timestamp')
-    morning_segment = night_df.between_time(NIGHT_START, DAY_START).reset_index()
-    evening_segment = night_df.between_time(DAY_END, NIGHT_END).reset_index()
+    morning_segment = night_df.between_time(config.night_start, config.day_start).reset_index()
+    evening_segment = night_df.between_time(config.day_end, config.night_end).reset_index()
     night_df = pd.concat([morning_segment, evening_segment]).drop_duplicates()
 
     # Calculate daily mean glucose and identify dips for night time
-    night_df['night_period'] = night_df['timestamp'].apply(lambda x: 'morning_segment' if NIGHT_START <= x.strftime('%H:%M') < DAY_START else 'evening_segment')
+    night_df['night_period'] = label_time_segments(night_df['timestamp'], config.night_start, config.day_start,
+                                                   'morning_segment', 'evening_segment')
     daily_data = night_df.groupby(['date', 'night_period']).agg(mean_glucose=('value', 'mean')).reset_index()
-    daily_data['dip_details'] = daily_data.apply(lambda row: identify_dips(night_df[(night_df['date'] == row['date']) & (night_df['night_period'] == row['night_period'])], row['mean_glucose']), axis=1)
+    episodes = find_episodes(night_df, ['date', 'night_period'], daily_data['mean_glucose'], config.dip_threshold_night, kind='dip')
+    daily_data['dip_details'] = [describe_dips(night_df, positions) for positions in episodes]
 
     # Aggregate weekly dips and calculate daily average
     weekly_data = daily_data.groupby(daily_data['date'].dt.isocalendar().week).agg(
@@ -86,36 +38,15 @@ def calculate_night_dips_and_averages(df):
 
     return daily_data, weekly_data
 
-def identify_dips(df, mean_glucose):
+def describe_dips(df, positions):
+    """Build the dip entries for the lowest readings at `positions` in `df`."""
     dips = []
-    in_dip = False
-    dip_group = []
-
-    for _, row in df.iterrows():
-        if row['value'] < mean_glucose - DIP_THRESHOLD:
-            in_dip = True
-            dip_group.append(row)
-        else:
-            if in_dip:
-                # When exiting a dip group, record the lowest reading in that group
-                min_dip = min(dip_group, key=lambda x: x['value'])
-                dips.append({
-                    'time': min_dip['timestamp'].strftime('%H:%M'),
-                    'value': int(min_dip['value']),
-                    'description': f"Glucose level of {min_dip['value']} mg/dL at {min_dip['timestamp'].strftime('%H:%M')}"
-                })
-                dip_group = []  # Reset for the next dip
-                in_dip = False
-
-    # Handle last dip group if the data ends with a dip
-    if in_dip and dip_group:
-        min_dip = min(dip_group, key=lambda x: x['value'])
+    for timestamp, value in zip(df['timestamp'].iloc[positions], df['value'].iloc[positions]):
         dips.append({
-            'time': min_dip['timestamp'].strftime('%H:%M'),
-            'value': int(min_dip['value']),
-            'description': f"Glucose level of {min_dip['value']} mg/dL at {min_dip['timestamp'].strftime('%H:%M')}"
+            'time': timestamp.strftime('%H:%M'),
+            'value': int(value),
+            'description': f"Glucose level of {value} mg/dL at {timestamp.strftime('%H:%M')}"
         })
-
     return dips
 
 
@@ -210,13 +141,13 @@ def construct_metadata():
     return metadata
  
 
-def analyze_glucose_dips_night(mobile_no, specific_date=None):
+def analyze_glucose_dips_night(mobile_no, specific_date=None, window=None):
 
-    config = get_glucose_config_by_mobile_number(mobile_no)
-    if "error" in config:
-        return {"error": f"Could not fetch glucose configuration: {config['error']}"}
+    config, config_error = load_chart_config(mobile_no)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
 
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
     if df is None or df.empty:
         return {
             "error": "No glucose data found for the given mobile number.",
@@ -240,7 +171,7 @@ def analyze_glucose_dips_night(mobile_no, specific_date=None):
             return {"error": f"No glucose data found in the week containing {specific_date}."}
 
     # Calculate night dips and averages if data is available
-    daily_data, weekly_data = calculate_night_dips_and_averages(df)
+    daily_data, weekly_data = calculate_night_dips_and_averages(df, config)
     output_json = construct_dips_json(daily_data, weekly_data)
     
     print(json.dumps(output_json, indent=4))
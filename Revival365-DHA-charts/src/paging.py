@@ -0,0 +1,118 @@
+"""
+paging.py
+-----------
+Week-aligned date windows for the DHA trend routes.
+
+A request either names an explicit range (`start`/`end` dates) or asks for
+a page of `weeks` ISO weeks ending before `cursor`. Windows always run from
+a Monday 00:00 to the Monday after their last week (exclusive), so every
+page holds whole ISO weeks and the readings query only reads those rows.
+The response's `next_cursor` is the start of the page; passing it back
+returns the preceding (older) weeks.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+DEFAULT_WEEKS = 4  # matches the charts' display_weeks
+MAX_WEEKS = 52
+PAGING_PARAMETERS = ('start', 'end', 'weeks', 'cursor')
+
+
+@dataclass(frozen=True)
+class WeekWindow:
+    """A range of whole ISO weeks: [start, end) with both bounds on a Monday."""
+    start: pd.Timestamp
+    end: pd.Timestamp
+
+    @property
+    def weeks(self):
+        return (self.end - self.start).days // 7
+
+    def describe(self, next_cursor=None):
+        """Paging block returned alongside the chart data."""
+        return {
+            "start": self.start.strftime('%Y-%m-%d'),
+            "end": (self.end - pd.Timedelta(days=1)).strftime('%Y-%m-%d'),  # Sunday of the last week
+            "weeks": self.weeks,
+            "next_cursor": next_cursor,
+        }
+
+    def next_cursor(self, first_reading):
+        """
+        Cursor for the page before this one, or None when the patient has no
+        readings before this window.
+
+        :param first_reading: timestamp of the patient's earliest reading, or None
+        """
+        if first_reading is None or pd.Timestamp(first_reading) >= self.start:
+            return None
+        return self.start.strftime('%Y-%m-%d')
+
+
+def week_start(value):
+    """Monday 00:00 of the ISO week containing `value`."""
+    day = pd.Timestamp(value).normalize()
+    return day - pd.Timedelta(days=day.weekday())
+
+
+def _parse_date(name, value):
+    try:
+        return pd.Timestamp(value), None
+    except (TypeError, ValueError):
+        return None, f"Invalid {name} date: {value}"
+
+
+def parse_window(params, today=None):
+    """
+    Build the requested week window from query string parameters.
+
+    :param params: dict of query parameters (start, end, weeks, cursor)
+    :param today: date the default page ends on (defaults to today)
+    :return: (WeekWindow or None when no paging was requested, error message or None)
+    """
+    start, end, weeks, cursor = (params.get(name) or None for name in PAGING_PARAMETERS)
+    if not any((start, end, weeks, cursor)):
+        return None, None
+
+    if (start or end) and (weeks or cursor):
+        return None, "Use either start/end or weeks/cursor, not both"
+
+    today = week_start(today or datetime.today())
+
+    if start or end:
+        last_week = today
+        if end:
+            end, error = _parse_date('end', end)
+            if error:
+                return None, error
+            last_week = week_start(end)
+        first_week = last_week - pd.Timedelta(weeks=DEFAULT_WEEKS - 1)
+        if start:
+            start, error = _parse_date('start', start)
+            if error:
+                return None, error
+            first_week = week_start(start)
+        if first_week > last_week:
+            return None, "start must not be after end"
+        window = WeekWindow(first_week, last_week + pd.Timedelta(weeks=1))
+    else:
+        try:
+            weeks = int(weeks) if weeks else DEFAULT_WEEKS
+        except (TypeError, ValueError):
+            return None, "weeks must be an integer"
+        if weeks < 1:
+            return None, "weeks must be at least 1"
+        page_end = today + pd.Timedelta(weeks=1)
+        if cursor:
+            cursor, error = _parse_date('cursor', cursor)
+            if error:
+                return None, error
+            page_end = week_start(cursor)
+        window = WeekWindow(page_end - pd.Timedelta(weeks=weeks), page_end)
+
+    if window.weeks > MAX_WEEKS:
+        return None, f"A page can span at most {MAX_WEEKS} weeks"
+    return window, None
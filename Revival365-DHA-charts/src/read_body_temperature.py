@@ -1,9 +1,10 @@
 # db/body_temperature_json.py
 from db.temperature_readings import fetch_body_temperature_readings_for_specific_day
 from db.UserDet import fetch_patient_details
+from downsample import downsample_readings
 import json
 
-def get_body_temperature_data_as_json(mobile_number, specific_date=None):
+def get_body_temperature_data_as_json(mobile_number, specific_date=None, max_points=None):
     df, error = fetch_body_temperature_readings_for_specific_day(mobile_number, specific_date)
 
     if df is None or df.empty:
@@ -22,6 +23,10 @@ def get_body_temperature_data_as_json(mobile_number, specific_date=None):
     
     print("Patient details fetched successfully:", patient)
 
+    # The chart series is only included when a max_points budget is requested
+    if max_points is not None:
+        df = downsample_readings(df, max_points, value_columns=('temperature',))
+
     # Format timestamps to ISO 8601
     df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
 
@@ -35,6 +40,9 @@ def get_body_temperature_data_as_json(mobile_number, specific_date=None):
         },
     }
 
+    if max_points is not None:
+        data_json["body_temperature_readings"] = df[['timestamp', 'temperature']].to_dict(orient='records')
+
     return data_json
 
 '''
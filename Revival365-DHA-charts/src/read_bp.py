@@ -1,8 +1,9 @@
 from db.bp_readings import fetch_blood_pressure_readings_for_specific_day
 from db.UserDet import fetch_patient_details
+from downsample import downsample_readings
 import json
 
-def get_blood_pressure_data_as_json(mobile_number, specific_date=None):
+def get_blood_pressure_data_as_json(mobile_number, specific_date=None, max_points=None):
     df, error = fetch_blood_pressure_readings_for_specific_day(mobile_number, specific_date)
 
     if df is None or df.empty:
@@ -15,13 +16,17 @@ def get_blood_pressure_data_as_json(mobile_number, specific_date=None):
     
     print("Patient details fetched successfully:", patient)
 
-    # Format timestamps to ISO 8601
-    df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
-
-    # Calculate daily averages
+    # Calculate daily averages over every reading, before any downsampling
     systolic_avg = df['systolic'].mean()
     diastolic_avg = df['diastolic'].mean()
 
+    # The chart series is only included when a max_points budget is requested
+    if max_points is not None:
+        df = downsample_readings(df, max_points, value_columns=('systolic', 'diastolic'))
+
+    # Format timestamps to ISO 8601
+    df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+
     # Create the JSON with all relevant information
     data_json = {
        # "blood_pressure_readings": df[['timestamp', 'systolic', 'diastolic']].to_dict(orient='records'),
@@ -35,4 +40,7 @@ def get_blood_pressure_data_as_json(mobile_number, specific_date=None):
         }
     }
 
+    if max_points is not None:
+        data_json["blood_pressure_readings"] = df[['timestamp', 'systolic', 'diastolic']].to_dict(orient='records')
+
     return data_json
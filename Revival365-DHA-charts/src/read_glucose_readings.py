@@ -5,6 +5,7 @@ from db.UserDet import fetch_patient_details, fetch_user_details ,fetch_medicati
 from config.config import config
 from datetime import datetime
 from decimal import Decimal  # Import Decimal
+from downsample import downsample_readings
 
 def convert_value(obj):
     if isinstance(obj, Decimal):
@@ -13,7 +14,7 @@ def convert_value(obj):
         return obj.isoformat()  # Convert Timestamp to ISO 8601 format
     raise TypeError(f'Type {type(obj)} not serializable')
 
-def get_data_as_json(mobile_number, selected_date=None):
+def get_data_as_json(mobile_number, selected_date=None, max_points=None):
     # Fetch glucose readings
     df, error = get_glucose_readings_by_mobile_number(mobile_number)
     if df is None or df.empty:
@@ -30,6 +31,8 @@ def get_data_as_json(mobile_number, selected_date=None):
     # Calculate daily average
     #daily_average = df_day['value'].mean().round(0).astype(int)  # Round to 2 decimal places
     daily_average = int(df_day['value'].mean().round(0))
+    # Thin the chart series to max_points (the average above uses every reading)
+    df_day = downsample_readings(df_day, max_points)
     # Round glucose readings in the DataFrame
     df_day['value'] = df_day['value'].astype(int)
     # Get day/night start times from config
@@ -73,6 +76,6 @@ def get_data_as_json(mobile_number, selected_date=None):
     # Ensure all values in the data_json are JSON serializable
     return json.loads(json.dumps(data_json, default=convert_value))
 
-def glucose_readings(mobile_no, selected_date=None):
-    output_json = get_data_as_json(mobile_no, selected_date)
+def glucose_readings(mobile_no, selected_date=None, max_points=None):
+    output_json = get_data_as_json(mobile_no, selected_date, max_points)
     return output_json
@@ -1,8 +1,9 @@
 import json
 from db.heart_rate_readings import fetch_heart_rate_readings_for_specific_day
 from db.UserDet import fetch_patient_details
+from downsample import downsample_readings
 
-def get_heart_rate_data_as_json(mobile_number, specific_date=None):
+def get_heart_rate_data_as_json(mobile_number, specific_date=None, max_points=None):
     # Fetch heart rate readings for the given mobile number and specific date
     df, error = fetch_heart_rate_readings_for_specific_day(mobile_number, specific_date)
 
@@ -22,6 +23,10 @@ def get_heart_rate_data_as_json(mobile_number, specific_date=None):
     
     print("Patient details fetched successfully:", patient)
 
+    # The chart series is only included when a max_points budget is requested
+    if max_points is not None:
+        df = downsample_readings(df, max_points, value_columns=('value',))
+
     # Format timestamps to ISO 8601
     df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
 
@@ -35,6 +40,9 @@ def get_heart_rate_data_as_json(mobile_number, specific_date=None):
         },
     }
 
+    if max_points is not None:
+        data_json["heart_rate_readings"] = df[['timestamp', 'value']].to_dict(orient='records')
+
     return data_json
 
  
\ No newline at end of file
@@ -1,8 +1,9 @@
 import json
 from db.spo2_readings import fetch_spo2_readings_for_specific_day
 from db.UserDet import fetch_patient_details
+from downsample import downsample_readings
 
-def get_spo2_data_as_json(mobile_number, specific_date=None):
+def get_spo2_data_as_json(mobile_number, specific_date=None, max_points=None):
     df, error = fetch_spo2_readings_for_specific_day(mobile_number, specific_date)
 
     if df is None or df.empty:
@@ -21,6 +22,10 @@ def get_spo2_data_as_json(mobile_number, specific_date=None):
     
     print("Patient details fetched successfully:", patient)
 
+    # The chart series is only included when a max_points budget is requested
+    if max_points is not None:
+        df = downsample_readings(df, max_points, value_columns=('value',))
+
     # Format timestamps to ISO 8601
     df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
 
@@ -34,6 +39,9 @@ def get_spo2_data_as_json(mobile_number, specific_date=None):
         },
     }
 
+    if max_points is not None:
+        data_json["spo2_readings"] = df[['timestamp', 'value']].to_dict(orient='records')
+
     return data_json
 '''
 if __name__ == "__main__":
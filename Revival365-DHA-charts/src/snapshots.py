@@ -0,0 +1,272 @@
+"""
+snapshots.py
+-----------
+Pre-computed weekly DHA chart snapshots.
+
+Every trend chart is built from independent ISO weeks, so its output can be
+stored one week entry at a time. The store (a local SQLite file, see the
+[snapshots] section of config.ini) holds the latest computed entry of each
+chart per patient and week, plus the signature of the readings they were
+computed from (count, largest id, sum of values, first and last timestamp;
+see fetch_reading_signature). An append, delete or edit of a reading changes
+the signature, so a snapshot is never served over changed readings.
+
+When the readings up to the stored largest id still match the stored
+signature, only rows were appended and the refresher recomputes just the
+weeks they touch. Any other change (a delete or an edit), the first run, or
+a changed configuration or SNAPSHOT_VERSION rebuilds every week. The trend
+routes serve the stored weeks when the snapshot is current and fall back to
+live computation otherwise.
+
+    python snapshots.py +919900000001 [+91...]
+"""
+
+import hashlib
+import json
+import sqlite3
+import sys
+from contextlib import closing
+from dataclasses import asdict
+from datetime import datetime
+
+import pandas as pd
+
+import fbg
+import meal_spike
+import mean_gluc
+import nAUC
+import no_of_dips_day
+import no_of_dips_night
+import no_of_Spikes_day
+import no_of_Spikes_night
+import tir
+from chart_config import load_patient_chart_config
+from config.config import config
+from db.GlucRead import fetch_reading_signature, fetch_reading_span, fetch_reading_times_since
+from db.UserDet import fetch_patient_details
+from paging import WeekWindow, week_start
+
+SNAPSHOT_VERSION = 1  # bump when a calculator's output changes so stored weeks are rebuilt
+
+# Trend route -> (chart function(mobile_no, specific_date, window), metadata builder)
+CHARTS = {
+    '/tir': (tir.tir_Trends, tir.construct_metadata),
+    '/fbs': (fbg.fbg_trends, fbg.construct_metadata),
+    '/mean_gluc': (mean_gluc.glucose_trends, mean_gluc.construct_metadata),
+    '/meal_spikes': (meal_spike.analyze_glucose_spikes, meal_spike.construct_metadata),
+    '/nauc': (nAUC.nAUC_Trends, nAUC.construct_metadata),
+    '/dips_day': (no_of_dips_day.analyze_glucose_dips_day, no_of_dips_day.construct_metadata),
+    '/dips_night': (no_of_dips_night.analyze_glucose_dips_night, no_of_dips_night.construct_metadata),
+    '/spikes_day': (no_of_Spikes_day.analyze_glucose_spikes_day, no_of_Spikes_day.construct_metadata),
+    '/spikes_night': (no_of_Spikes_night.analyze_glucose_spikes_night, no_of_Spikes_night.construct_metadata),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chart_snapshots (
+    patient_id INTEGER NOT NULL,
+    chart TEXT NOT NULL,
+    week_start TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    computed_at TEXT NOT NULL,
+    PRIMARY KEY (patient_id, chart, week_start)
+);
+CREATE TABLE IF NOT EXISTS snapshot_state (
+    patient_id INTEGER PRIMARY KEY,
+    high_water INTEGER NOT NULL,
+    config_key TEXT NOT NULL,
+    refreshed_at TEXT NOT NULL,
+    signature TEXT NOT NULL DEFAULT ''
+);
+"""
+
+_initialised = set()  # store paths whose schema exists in this process
+
+
+def snapshots_enabled():
+    return config.get_snapshot_config()['enabled']
+
+
+def connect():
+    """Open the snapshot store, creating its tables on first use."""
+    path = config.get_snapshot_config()['path']
+    connection = sqlite3.connect(path, timeout=30)
+    if path not in _initialised:
+        connection.execute("PRAGMA journal_mode=WAL")  # readers are not blocked by a refresh
+        connection.executescript(SCHEMA)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(snapshot_state)")]
+        if 'signature' not in columns:
+            # Stores written before the signature existed; their empty signature forces a rebuild
+            connection.execute("ALTER TABLE snapshot_state ADD COLUMN signature TEXT NOT NULL DEFAULT ''")
+        _initialised.add(path)
+    return connection
+
+
+def config_key(chart_config):
+    """Fingerprint of everything besides the readings that shapes a patient's charts."""
+    blob = json.dumps({'version': SNAPSHOT_VERSION, 'config': asdict(chart_config)}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()[:16]
+
+
+def read_state(connection, patient_id):
+    """(high_water, config_key, signature) of a patient's snapshots, or None if none were built."""
+    row = connection.execute(
+        "SELECT high_water, config_key, signature FROM snapshot_state WHERE patient_id = ?", (patient_id,)
+    ).fetchone()
+    return None if row is None else (row[0], row[1], json.loads(row[2] or 'null'))
+
+
+def touched_weeks(timestamps):
+    """Sorted Mondays of the ISO weeks containing `timestamps`."""
+    if len(timestamps) == 0:
+        return pd.DatetimeIndex([])
+    days = pd.DatetimeIndex(pd.to_datetime(timestamps)).normalize()
+    return (days - pd.to_timedelta(days.weekday, unit='D')).unique().sort_values()
+
+
+def week_windows(weeks):
+    """Group sorted Mondays into WeekWindows of consecutive weeks."""
+    windows = []
+    for monday in weeks:
+        if windows and windows[-1].end == monday:
+            windows[-1] = WeekWindow(windows[-1].start, monday + pd.Timedelta(weeks=1))
+        else:
+            windows.append(WeekWindow(monday, monday + pd.Timedelta(weeks=1)))
+    return windows
+
+
+def refresh_patient(mobile_no):
+    """
+    Bring a patient's snapshots up to date with their stored readings.
+
+    :param mobile_no: str
+    :return: dict summary of the refresh, or {"error": ...}
+    """
+    patient_id, error = fetch_patient_details(mobile_no)
+    if patient_id is None:
+        return {"error": error, "mobile_no": mobile_no}
+
+    chart_config, config_error = load_patient_chart_config(patient_id)
+    if config_error:
+        return {"error": f"Could not fetch glucose configuration: {config_error}"}
+    key = config_key(chart_config)
+
+    signature = fetch_reading_signature(patient_id)
+    if signature is None:
+        return {"error": "Could not fetch the glucose readings signature."}
+    if signature[0] == '0':
+        return {"error": "No glucose data found for the given mobile number.", "mobile_no": mobile_no}
+    high_water = int(signature[1])
+
+    with closing(connect()) as connection:
+        state = read_state(connection, patient_id)
+
+    rebuild = state is None or state[1] != key
+    if not rebuild and state[2] != signature:
+        # Only appends since the last refresh leave the older rows' signature as stored
+        rebuild = fetch_reading_signature(patient_id, up_to_id=state[0]) != state[2]
+    if rebuild:
+        first, last = fetch_reading_span(patient_id)
+        if first is None:
+            return {"error": "No glucose data found for the given mobile number.", "mobile_no": mobile_no}
+        weeks = pd.date_range(week_start(first), week_start(last), freq='7D')
+    elif state[2] == signature:
+        weeks = pd.DatetimeIndex([])
+    else:
+        timestamps = fetch_reading_times_since(patient_id, state[0])
+        if timestamps is None:
+            return {"error": "Could not fetch newly ingested glucose readings."}
+        weeks = touched_weeks(timestamps)
+
+    windows = week_windows(weeks)
+
+    # Compute everything before writing, so a failure leaves the old snapshot in place
+    computed = []
+    for window in windows:
+        for path, (trend, _) in CHARTS.items():
+            output = trend(mobile_no, None, window)
+            entries = output.get('data', []) if isinstance(output, dict) else []
+            computed.append((window, path.lstrip('/'), entries))
+
+    now = datetime.now().isoformat(timespec='seconds')
+    with closing(connect()) as connection, connection:
+        if rebuild:
+            connection.execute("DELETE FROM chart_snapshots WHERE patient_id = ?", (patient_id,))
+        for window, chart, entries in computed:
+            start, end = window.start.strftime('%Y-%m-%d'), window.end.strftime('%Y-%m-%d')
+            # Weeks that no longer produce an entry must not keep a stale one
+            connection.execute(
+                "DELETE FROM chart_snapshots WHERE patient_id = ? AND chart = ? AND week_start >= ? AND week_start < ?",
+                (patient_id, chart, start, end)
+            )
+            connection.executemany(
+                "INSERT INTO chart_snapshots (patient_id, chart, week_start, payload, computed_at) VALUES (?, ?, ?, ?, ?)",
+                [(patient_id, chart, entry['week_start_day'], json.dumps(entry), now)
+                 for entry in entries if start <= entry.get('week_start_day', '') < end]
+            )
+        connection.execute(
+            "INSERT OR REPLACE INTO snapshot_state (patient_id, high_water, config_key, refreshed_at, signature) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (patient_id, high_water, key, now, json.dumps(signature))
+        )
+
+    return {
+        "patient_id": patient_id,
+        "high_water": high_water,
+        "rebuilt": rebuild,
+        "weeks_refreshed": [monday.strftime('%Y-%m-%d') for monday in weeks],
+    }
+
+
+def serve_snapshot(path, mobile_no, specific_date=None, window=None):
+    """
+    A trend route's response assembled from stored weeks.
+
+    Returns None on a miss (no snapshot yet, readings added, deleted or edited
+    since it was built, a changed configuration or no stored week in the
+    requested range) so the caller computes the chart live. Store errors are
+    treated as misses. The patient is looked up once and the configuration
+    by patient id, so a hit costs three database round trips.
+
+    :param path: trend route, e.g. '/tir'
+    :param specific_date: serve only the week containing this date
+    :param window: paging.WeekWindow to serve, or None for the full history
+    :return: dict {'metadata', 'data'} or None
+    """
+    if path not in CHARTS:
+        return None
+    try:
+        patient_id, _ = fetch_patient_details(mobile_no)
+        if patient_id is None:
+            return None
+
+        with closing(connect()) as connection:
+            state = read_state(connection, patient_id)
+            if state is None or fetch_reading_signature(patient_id) != state[2]:
+                return None
+            chart_config, config_error = load_patient_chart_config(patient_id)
+            if config_error or config_key(chart_config) != state[1]:
+                return None
+
+            query = "SELECT payload FROM chart_snapshots WHERE patient_id = ? AND chart = ?"
+            args = [patient_id, path.lstrip('/')]
+            if specific_date:
+                window = WeekWindow(week_start(specific_date), week_start(specific_date) + pd.Timedelta(weeks=1))
+            if window is not None:
+                query += " AND week_start >= ? AND week_start < ?"
+                args += [window.start.strftime('%Y-%m-%d'), window.end.strftime('%Y-%m-%d')]
+            rows = connection.execute(query + " ORDER BY week_start", args).fetchall()
+    except Exception as e:
+        print(f"Snapshot lookup failed for {path}: {e}")
+        return None
+
+    if not rows:
+        return None
+    return {
+        'metadata': CHARTS[path][1](),
+        'data': [json.loads(payload) for (payload,) in rows]
+    }
+
+
+if __name__ == "__main__":
+    for mobile_no in sys.argv[1:] or ["+919901199334"]:
+        print(json.dumps(refresh_patient(mobile_no), indent=4))
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 from db.GlucRead import get_glucose_readings_by_mobile_number
+from db.frames import add_day_key, compact_frame, float64_values
+from weekly import days_by_week
+from columnar import COLUMNAR, build_payload
 
 
 
@@ -9,20 +12,31 @@ def calculate_metrics(df, low_threshold, high_threshold):
     if df.empty:
         return pd.DataFrame(), pd.DataFrame()
 
-    # Convert timestamps to datetime and extract date
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df['date'] = df['timestamp'].dt.date
-
-    # Group by date and calculate daily metrics
-    daily_metrics = df.groupby('date').apply(lambda x: pd.Series({
-        "time_in_range": ((x['value'] >= low_threshold) & (x['value'] <= high_threshold)).mean() * 100,
-        "time_above_range": (x['value'] > high_threshold).mean() * 100,
-        "time_below_range": (x['value'] < low_threshold).mean() * 100,
-        "mean_glucose": x['value'].mean()
-    })).reset_index()
+    # datetime64 timestamps, float32 values and a datetime64 day key
+    df = add_day_key(compact_frame(df))
+
+    # Precompute range flags once, then aggregate them per day with grouped sums
+    value = df['value']
+    df = df.assign(
+        in_range=(value >= low_threshold) & (value <= high_threshold),
+        above_range=value > high_threshold,
+        below_range=value < low_threshold,
+        value64=float64_values(value),
+    )
+    daily_metrics = df.groupby('date').agg(
+        readings=('value', 'size'),
+        in_range=('in_range', 'sum'),
+        above_range=('above_range', 'sum'),
+        below_range=('below_range', 'sum'),
+        mean_glucose=('value64', 'mean'),
+    ).reset_index()
+
+    daily_metrics['time_in_range'] = daily_metrics['in_range'] / daily_metrics['readings'] * 100
+    daily_metrics['time_above_range'] = daily_metrics['above_range'] / daily_metrics['readings'] * 100
+    daily_metrics['time_below_range'] = daily_metrics['below_range'] / daily_metrics['readings'] * 100
+    daily_metrics = daily_metrics[['date', 'time_in_range', 'time_above_range', 'time_below_range', 'mean_glucose']]
 
     # Prepare for weekly aggregation by adding ISO week number
-    daily_metrics['date'] = pd.to_datetime(daily_metrics['date'])
     daily_metrics['week_number'] = daily_metrics['date'].dt.isocalendar().week
     daily_metrics['year'] = daily_metrics['date'].dt.isocalendar().year
 
@@ -86,11 +100,11 @@ def construct_metadata():
 def construct_json(daily_data, weekly_summary):
     metadata = construct_metadata()
     data_list = []
+    days = days_by_week(daily_data)
 
-    for index, week in weekly_summary.iterrows():
+    for week in weekly_summary.to_dict('records'):
         # Correct parsing of the week label
         week_number = int(week['week_label'])
-        week_number = int(week['week_label'])
         year = int(week['year'])  # Ensure year is stored before dropping
         
         # Calculate the start and end of the week correctly
@@ -108,10 +122,8 @@ def construct_json(daily_data, weekly_summary):
             },
             "daily_data": []
         }
-        # Corrected filtering for week dates
-        week_dates = daily_data[daily_data['date'].dt.isocalendar().week == week_number]
 
-        for _, day in week_dates.iterrows():
+        for day in days.get((year, week_number), []):
             day_data = {
                 "day": day['date'].strftime("%A"),
                 "date": day['date'].strftime("%Y-%m-%d"),
@@ -131,6 +143,12 @@ def construct_json(daily_data, weekly_summary):
     return json_output
 
 
+def construct_columnar(daily_data, weekly_summary):
+    """format=columnar variant of construct_json (see columnar.py)."""
+    columns = {name: (name, 1) for name in ('time_in_range', 'time_above_range', 'time_below_range', 'mean_glucose')}
+    return build_payload('tir', construct_metadata(), weekly_summary, daily_data, columns)
+
+
 '''
 def tir_Trends(mobile_no):
     """Main function to orchestrate the fetching and processing of glucose data."""
@@ -151,9 +169,9 @@ def tir_Trends(mobile_no):
 '''
 
 
-def tir_Trends(mobile_no, specific_date):
+def tir_Trends(mobile_no, specific_date, window=None, output_format=None):
     """Main function to orchestrate the fetching and processing of glucose data."""
-    df, error = get_glucose_readings_by_mobile_number(mobile_no)
+    df, error = get_glucose_readings_by_mobile_number(mobile_no, window)
     if df is None or df.empty:
         return {
             "error": "No glucose data found for the given mobile number.",
@@ -171,6 +189,8 @@ def tir_Trends(mobile_no, specific_date):
                 (pd.to_datetime(df['timestamp']).dt.date <= end_of_week)]
 
     daily_data, weekly_summary = calculate_metrics(df, 70, 150)
+    if output_format == COLUMNAR:
+        return construct_columnar(daily_data, weekly_summary)
     output_json = construct_json(daily_data, weekly_summary)
     return output_json
 
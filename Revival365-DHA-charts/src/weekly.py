@@ -0,0 +1,23 @@
+"""
+weekly.py
+-----------
+Split per-day chart rows into ISO weeks in a single pass.
+"""
+
+
+def days_by_week(daily_data, year_column='year', week_column='week_number'):
+    """
+    Group daily rows by ISO (year, week) with one sort and one groupby,
+    instead of filtering the whole frame once per week.
+
+    :param daily_data: pd.DataFrame with a 'date' column and ISO year/week columns
+    :return: dict mapping (year, week_number) -> list of row dicts in date order
+    """
+    if daily_data.empty:
+        return {}
+
+    ordered = daily_data.sort_values('date', kind='stable')
+    return {
+        (int(year), int(week)): rows.to_dict('records')
+        for (year, week), rows in ordered.groupby([year_column, week_column], sort=False)
+    }
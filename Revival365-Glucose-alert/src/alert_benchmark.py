@@ -0,0 +1,343 @@
+"""
+alert_benchmark.py
+-----------
+Replay benchmark for the per-patient CGM alert pipeline.
+
+Synthetic traces shaped like recorded CGM episodes (or traces from a CSV)
+are written reading by reading into a SQLite stand-in for the database.
+After each reading the patient is evaluated through
+process_glucose_readings: extract_relevant_trend, calculate_slopes,
+generate_alert, suppression and the outbox. The evaluation runs at the
+reading's own time, so the day window, forecasts and cool-downs behave as
+they would live. Queued alerts are delivered by the real dispatcher to a
+local fake notification endpoint.
+
+Reported:
+
+- per-evaluation latency percentiles (database read through outbox write);
+- alerts fired per scenario, and alerts fired on sensor artifacts;
+- detection delay: first alert after the excursion starts, relative to the
+  first reading past the threshold (negative means warned before it);
+- delivery latency from outbox write to the fake endpoint;
+- signal-quality outcomes (windows truncated or rejected for gaps and artifacts).
+
+    python alert_benchmark.py                        # synthetic traces, 5 patients each
+    python alert_benchmark.py --patients 20 --json out.json
+    python alert_benchmark.py --trace-csv traces.csv # columns patient_id,timestamp,value
+
+DATABASE_URL, CGM_OUTBOX_DB, CGM_SUPPRESSION_DB and CGM_NOTIFICATION_URL
+are set by the harness before the pipeline is imported, so nothing touches
+the configured database or notification API.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+REPLAY_DAY = datetime(2025, 3, 4)
+READING_MINUTES = 5
+LOW_THRESHOLD, HIGH_THRESHOLD = 70, 180  # ground truth for detection delay (matches process_glucose)
+
+
+# -----------------------------------------------------------------------------
+# Traces. Each is a dict with times, values, onset (start of the excursion),
+# side (-1 low, 1 high, 0 none) and artifact (True for sensor artifacts).
+# -----------------------------------------------------------------------------
+def _trace(start, values, onset_index, side, artifact=False, keep=None):
+    times = [start + timedelta(minutes=READING_MINUTES * i) for i in range(len(values))]
+    values = np.round(np.asarray(values, dtype=np.float64), 1)
+    if keep is not None:
+        times = [t for t, k in zip(times, keep) if k]
+        values = values[keep]
+    return {"times": times, "values": values, "onset": start + timedelta(minutes=READING_MINUTES * onset_index),
+            "side": side, "artifact": artifact}
+
+
+def _noise(rng, n, sd=2.0):
+    return rng.normal(0, sd, n)
+
+
+def steady(rng):
+    """In range all along: any alert is a false alarm."""
+    n = 72
+    base = rng.uniform(100, 140) + 8 * np.sin(np.linspace(0, rng.uniform(2, 5), n))
+    return _trace(REPLAY_DAY.replace(hour=8), base + _noise(rng, n), 0, 0)
+
+
+def rapid_drop(rng):
+    """Steady, then a 2-3 mg/dL/min fall into hypoglycaemia, a short hold and recovery."""
+    level, rate = rng.uniform(120, 150), rng.uniform(2, 3) * READING_MINUTES
+    fall = np.arange(level, 50, -rate)
+    values = np.concatenate([np.full(18, level), fall, np.full(6, 50), np.linspace(55, 110, 12)])
+    return _trace(REPLAY_DAY.replace(hour=9), values + _noise(rng, len(values)), 18, -1)
+
+
+def slow_drop(rng):
+    """A 0.5-1 mg/dL/min decline that settles just below the low threshold."""
+    level, rate = rng.uniform(105, 125), rng.uniform(0.5, 1) * READING_MINUTES
+    fall = np.arange(level, 62, -rate)
+    values = np.concatenate([np.full(12, level), fall, np.full(12, 62)])
+    return _trace(REPLAY_DAY.replace(hour=11), values + _noise(rng, len(values), 1.0), 12, -1)
+
+
+def rapid_rise(rng):
+    """A post-meal rise of 2-3 mg/dL/min past the high threshold."""
+    level, rate = rng.uniform(110, 130), rng.uniform(2, 3) * READING_MINUTES
+    rise = np.arange(level, 250, rate)
+    values = np.concatenate([np.full(12, level), rise, np.full(6, 250), np.linspace(240, 160, 12)])
+    return _trace(REPLAY_DAY.replace(hour=13), values + _noise(rng, len(values)), 12, 1)
+
+
+def compression_low(rng):
+    """Night-time sensor compression: an abrupt false low that snaps back to baseline."""
+    level = rng.uniform(105, 130)
+    depth = level - rng.uniform(50, 65)
+    hold = int(rng.integers(4, 7))
+    values = np.concatenate([np.full(24, level), level - depth * np.array([0.35, 0.8]),
+                             np.full(hold, level - depth), np.full(18, level)])
+    return _trace(REPLAY_DAY.replace(hour=1), values + _noise(rng, len(values), 1.5), 24, -1, artifact=True)
+
+
+def sensor_gap(rng):
+    """A fall into hypoglycaemia with 30-45 minutes of missing readings on the way down."""
+    level, rate = rng.uniform(120, 140), rng.uniform(1, 2) * READING_MINUTES
+    fall = np.arange(level, 55, -rate)
+    values = np.concatenate([np.full(12, level), fall, np.full(8, 55)])
+    keep = np.ones(len(values), dtype=bool)
+    gap_start = 12 + len(fall) // 3
+    keep[gap_start:gap_start + int(rng.integers(6, 10))] = False
+    return _trace(REPLAY_DAY.replace(hour=15), values + _noise(rng, len(values)), 12, -1, keep=keep)
+
+
+SCENARIOS = {
+    "steady": steady,
+    "rapid_drop": rapid_drop,
+    "slow_drop": slow_drop,
+    "rapid_rise": rapid_rise,
+    "compression_low": compression_low,
+    "sensor_gap": sensor_gap,
+}
+
+
+def synthetic_traces(patients, seed):
+    """`patients` traces of every scenario, as (scenario, trace) pairs."""
+    rng = np.random.default_rng(seed)
+    return [(name, make(rng)) for name, make in SCENARIOS.items() for _ in range(patients)]
+
+
+def csv_traces(path):
+    """One trace per patient_id of a CSV with patient_id, timestamp and value columns."""
+    df = pd.read_csv(path, parse_dates=["timestamp"]).sort_values(["patient_id", "timestamp"])
+    traces = []
+    for _, rows in df.groupby("patient_id"):
+        values = rows["value"].to_numpy(dtype=np.float64)
+        crossed = (values <= LOW_THRESHOLD) | (values >= HIGH_THRESHOLD)
+        side = 0 if not crossed.any() else (-1 if values[np.argmax(crossed)] <= LOW_THRESHOLD else 1)
+        times = [t.to_pydatetime() for t in rows["timestamp"]]
+        traces.append(("recorded", {"times": times, "values": values, "onset": times[0],
+                                    "side": side, "artifact": False}))
+    return traces
+
+
+def first_crossing(trace):
+    """Time of the first reading past the threshold on the trace's side, or None."""
+    if trace["side"] == 0:
+        return None
+    past = trace["values"] <= LOW_THRESHOLD if trace["side"] < 0 else trace["values"] >= HIGH_THRESHOLD
+    return trace["times"][int(np.argmax(past))] if past.any() else None
+
+
+# -----------------------------------------------------------------------------
+# Fake notification endpoint: accepts every alert the way the real API does.
+# -----------------------------------------------------------------------------
+class FakeNotificationEndpoint:
+    def __init__(self):
+        self.received = []  # (monotonic time, idempotency key, alert)
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                endpoint.received.append((time.monotonic(), self.headers.get("Idempotency-Key"), json.loads(body)))
+                reply = json.dumps({"status": 201}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(reply)))
+                self.end_headers()
+                self.wfile.write(reply)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/notification/add/alert"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# -----------------------------------------------------------------------------
+# Replay
+# -----------------------------------------------------------------------------
+def percentiles(samples, points=(50, 90, 99)):
+    if not samples:
+        return {}
+    result = {f"p{p}": round(float(np.percentile(samples, p)), 3) for p in points}
+    result["max"] = round(float(np.max(samples)), 3)
+    return result
+
+
+def replay(traces, workdir, database_url=None):
+    """
+    Replay traces through the alert pipeline.
+
+    :param traces: list of (scenario, trace) pairs
+    :param workdir: directory for the SQLite database, outbox and suppression files
+    :param database_url: optional SQLAlchemy URL of a scratch database to use instead
+    :return: dict report
+    """
+    with FakeNotificationEndpoint() as endpoint:
+        # The pipeline reads these when it is imported
+        os.environ["DATABASE_URL"] = database_url or f"sqlite:///{os.path.join(workdir, 'cgm.sqlite')}"
+        os.environ["CGM_OUTBOX_DB"] = os.path.join(workdir, "outbox.sqlite")
+        os.environ["CGM_SUPPRESSION_DB"] = ""
+        os.environ["CGM_NOTIFICATION_URL"] = endpoint.url
+
+        from db.db_connection import Base, GlucoseReadings, User, engine
+        from outbox import flush
+        from process_glucose import process_glucose_readings
+        from signal_quality import metrics
+
+        Base.metadata.create_all(engine, tables=[User.__table__, GlucoseReadings.__table__])
+        patients = []
+        with engine.begin() as connection:
+            first_id = (connection.exec_driver_sql("SELECT COALESCE(MAX(id), 0) FROM users").scalar() or 0) + 1
+            for offset, (scenario, trace) in enumerate(traces):
+                patient_id = first_id + offset
+                mobile = f"+99{patient_id:010d}"
+                connection.execute(User.__table__.insert().values(id=patient_id, mobile_number=mobile))
+                patients.append((patient_id, mobile, scenario, trace))
+
+        arrivals = sorted((time_, value, patient) for patient in patients
+                          for time_, value in zip(patient[3]["times"], patient[3]["values"]))
+
+        latencies, queued = [], defaultdict(list)  # patient_id -> [(trace time, queued monotonic, alert)]
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            for time_, value, (patient_id, mobile, _, _) in arrivals:
+                with engine.begin() as connection:
+                    connection.execute(GlucoseReadings.__table__.insert().values(
+                        patient_id=patient_id, timestamp=time_, value=float(value)))
+                started = time.perf_counter()
+                alerts = process_glucose_readings(mobile, now=time_)
+                latencies.append((time.perf_counter() - started) * 1000)
+                queued[patient_id].extend((time_, time.monotonic(), alert) for alert in alerts)
+            drained = flush(timeout=60)
+
+    return build_report(patients, latencies, queued, endpoint.received, drained, metrics())
+
+
+def build_report(patients, latencies, queued, received, drained, quality):
+    # Match deliveries to queued alerts in order, per (patient, note)
+    deliveries = defaultdict(deque)
+    for received_at, _, alert in received:
+        deliveries[(alert["patientId"], alert["note"])].append(received_at)
+    delivery_ms = []
+    for alerts in queued.values():
+        for _, queued_at, alert in alerts:
+            if deliveries[(alert["patientId"], alert["note"])]:
+                delivery_ms.append((deliveries[(alert["patientId"], alert["note"])].popleft() - queued_at) * 1000)
+
+    scenarios = defaultdict(lambda: {"patients": 0, "readings": 0, "alerts": 0, "delays_min": [], "missed": 0})
+    for patient_id, _, scenario, trace in patients:
+        row = scenarios[scenario]
+        row["patients"] += 1
+        row["readings"] += len(trace["times"])
+        row["alerts"] += len(queued[patient_id])
+        if trace["artifact"]:
+            row.setdefault("patients_alerted_on_artifact", 0)
+            row["patients_alerted_on_artifact"] += any(t >= trace["onset"] for t, _, _ in queued[patient_id])
+            continue
+        crossing = first_crossing(trace)
+        if crossing is None:
+            continue
+        after_onset = [t for t, _, _ in queued[patient_id] if t >= trace["onset"]]
+        if after_onset:
+            row["delays_min"].append((min(after_onset) - crossing).total_seconds() / 60)
+        else:
+            row["missed"] += 1
+
+    for row in scenarios.values():
+        delays = row.pop("delays_min")
+        if delays:
+            row["detection_delay_min"] = {"median": float(np.median(delays)), "min": float(np.min(delays)),
+                                          "max": float(np.max(delays))}
+
+    keys = [key for _, key, _ in received]
+    return {
+        "evaluations": len(latencies),
+        "evaluation_latency_ms": percentiles(latencies),
+        "alerts_queued": sum(len(alerts) for alerts in queued.values()),
+        "alerts_delivered": len(received),
+        "duplicate_deliveries": len(keys) - len(set(keys)),
+        "outbox_drained": drained,
+        "delivery_latency_ms": percentiles(delivery_ms),
+        "signal_quality": quality,
+        "scenarios": dict(scenarios),
+    }
+
+
+def print_report(report):
+    print(f"Evaluations: {report['evaluations']}")
+    print(f"Evaluation latency (ms): {report['evaluation_latency_ms']}")
+    print(f"Alerts queued: {report['alerts_queued']}, delivered: {report['alerts_delivered']}, "
+          f"duplicate deliveries: {report['duplicate_deliveries']}, outbox drained: {report['outbox_drained']}")
+    print(f"Delivery latency (ms): {report['delivery_latency_ms']}")
+    print(f"Signal quality: {report['signal_quality']}")
+    print(f"{'scenario':<16}{'patients':>9}{'readings':>9}{'alerts':>8}{'missed':>8}  detection delay (min)")
+    for name, row in report["scenarios"].items():
+        delay = row.get("detection_delay_min")
+        delay = f"median {delay['median']:+.1f}, range {delay['min']:+.1f} to {delay['max']:+.1f}" if delay else "-"
+        if "patients_alerted_on_artifact" in row:
+            delay = f"artifact: {row['patients_alerted_on_artifact']} of {row['patients']} patients alerted"
+        print(f"{name:<16}{row['patients']:>9}{row['readings']:>9}{row['alerts']:>8}{row['missed']:>8}  {delay}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay CGM traces through the alert pipeline.")
+    parser.add_argument("--patients", type=int, default=5, help="synthetic patients per scenario")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic traces")
+    parser.add_argument("--trace-csv", help="replay recorded traces (patient_id,timestamp,value) instead")
+    parser.add_argument("--database-url", help="scratch database to write the traces to (default: a temporary SQLite file)")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    traces = csv_traces(args.trace_csv) if args.trace_csv else synthetic_traces(args.patients, args.seed)
+    with tempfile.TemporaryDirectory(prefix="alert-benchmark-") as workdir:
+        report = replay(traces, workdir, args.database_url)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
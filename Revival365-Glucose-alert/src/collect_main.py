@@ -1,5 +1,7 @@
 import json
 import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 '''
 from tir import tir_Trends
 from fbg import fbg_trends
@@ -20,12 +22,83 @@ from read_stress import get_stress_data_as_json
 from read_activity import get_activity_data_as_json
 from read_sleep import get_sleep_data_as_json
 from read_hrv import get_hrv_data_as_json
+from config.config import config
  
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+# Response key -> (reader, keyword arguments). Every reader resolves the patient
+# and opens its own Session on the shared engine, so they can run side by side.
+VITAL_SOURCES = {
+    'heart_rate_readings': (get_heart_rate_data_as_json, {'interval': 2}),
+    'spo2_readings': (get_spo2_data_as_json, {'interval': 2}),
+    'body_temperature_readings': (get_body_temperature_data_as_json, {'interval': 2}),
+    'blood_pressure_readings': (get_blood_pressure_data_as_json, {'interval': 2}),
+    'glucose_readings': (glucose_readings, {}),
+    'stress_readings': (get_stress_data_as_json, {'interval': 2}),
+    'hrv_readings': (get_hrv_data_as_json, {'interval': 2}),
+    'sleep_readings': (get_sleep_data_as_json, {'interval': 1}),
+    'activity_readings': (get_activity_data_as_json, {'interval': 3}),
+}
+
+
+def collect_vitals(mobile_number, sources=None, settings=None):
+    """
+    Fetch several vital sources concurrently.
+
+    Sources run on a pool of at most `max_workers` threads, so the wall time is
+    close to the slowest source rather than the sum of all of them. A source
+    that raises, or is still running when its timeout (counted from the start
+    of the collection) passes, is reported as {"error": ...} and the others
+    are returned as usual. A timed-out query is not interrupted; its thread
+    finishes in the background and its result is discarded.
+
+    :param mobile_number: str, patient's mobile number
+    :param sources: dict like VITAL_SOURCES (defaults to all of them)
+    :param settings: dict like config.get_collection_config()
+    :return: dict, response key -> reader output or {"error": ...}
+    """
+    sources = VITAL_SOURCES if sources is None else sources
+    settings = settings or config.get_collection_config()
+    started = time.monotonic()
+    deadlines = {name: started + settings['source_timeouts'].get(name, settings['timeout_seconds'])
+                 for name in sources}
+
+    results = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(settings['max_workers'], len(sources))),
+                                  thread_name_prefix='vital-fetch')
+    try:
+        pending = {executor.submit(reader, mobile_number, **kwargs): name
+                   for name, (reader, kwargs) in sources.items()}
+        while pending:
+            next_deadline = min(deadlines[name] for name in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching {name}: {e}")
+                    results[name] = {'error': str(e)}
+                logger.info(f"Fetched {name} in {time.monotonic() - started:.2f}s.")
+
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                if deadlines[name] <= now:
+                    future.cancel()
+                    del pending[future]
+                    logger.warning(f"Timed out fetching {name}.")
+                    results[name] = {'error': f"Timed out after {deadlines[name] - started:g} seconds"}
+    finally:
+        # Do not wait for timed-out fetches; the response goes out without them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Keep the order of the sources in the response
+    return {name: results[name] for name in sources}
+
 def lambda_handler(event: dict, context) -> dict:
     logger.info("Lambda function started.")
     
@@ -47,22 +120,11 @@ def lambda_handler(event: dict, context) -> dict:
 
     # Proceed with calling all functions
     try:
-        combined_data = {}
-
-        # Call all trend functions and collect the data
-      
-        #combined_data['heart_rate_readings'] = get_heart_rate_data_as_json(mobile_number, interval=2)
-       # combined_data['spo2_readings'] = get_spo2_data_as_json(mobile_number, interval=2)
-        #combined_data['body_temperature_readings'] = get_body_temperature_data_as_json(mobile_number, interval=2)
-        combined_data['blood_pressure_readings'] = get_blood_pressure_data_as_json(mobile_number, interval=2)
-       # combined_data['glucose_readings'] = glucose_readings(mobile_number,interval=1)
-        #combined_data['stress_readings'] = get_stress_data_as_json(mobile_number, interval=2)
-        #combined_data['hrv_readings'] = get_hrv_data_as_json(mobile_number, interval=2)
-       # combined_data['sleep_readings'] = get_sleep_data_as_json(mobile_number, interval=1)
-        #combined_data['activity_readings'] = get_activity_data_as_json(mobile_number, interval=3)
+        # Fetch every vital concurrently; failed sources come back as {"error": ...}
+        combined_data = collect_vitals(mobile_number)
 
         # Check if any data is missing or None
-        if not any(combined_data.values()):
+        if not any(data and 'error' not in data for data in combined_data.values()):
             logger.warning("No data found for the given mobile number.")
             return build_response(404, {'error': 'No data found for the given mobile number'})
 
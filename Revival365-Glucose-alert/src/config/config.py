@@ -57,6 +57,46 @@ class Config:
             }
 
 
+    def get_notification_config(self):
+        """Retrieve alert delivery settings (CGM_NOTIFICATION_URL and CGM_OUTBOX_DB override the URL and outbox path)."""
+        section = 'notifications'
+        return {
+            'api_url': os.getenv('CGM_NOTIFICATION_URL') or self.get(section, 'api_url'),
+            'outbox_path': os.getenv('CGM_OUTBOX_DB') or self.get(section, 'outbox_path'),
+            'max_workers': self.config.getint(section, 'max_workers'),
+            'max_attempts': self.config.getint(section, 'max_attempts'),
+            'backoff_seconds': self.config.getfloat(section, 'backoff_seconds'),
+            'max_backoff_seconds': self.config.getfloat(section, 'max_backoff_seconds'),
+            'timeout_seconds': self.config.getfloat(section, 'timeout_seconds'),
+            'flush_timeout_seconds': self.config.getfloat(section, 'flush_timeout_seconds')
+        }
+
+    def get_suppression_config(self):
+        """Retrieve alert suppression settings (CGM_SUPPRESSION_DB overrides the persistence path)."""
+        section = 'suppression'
+        return {
+            'cooldown_minutes': {
+                'warning': self.config.getfloat(section, 'cooldown_minutes_warning'),
+                'critical': self.config.getfloat(section, 'cooldown_minutes_critical')
+            },
+            'default_cooldown_minutes': self.config.getfloat(section, 'cooldown_minutes_warning'),
+            'escalation_delta': self.config.getfloat(section, 'escalation_delta'),
+            'persist_path': os.getenv('CGM_SUPPRESSION_DB', self.config.get(section, 'persist_path', fallback=''))
+        }
+
+    def get_collection_config(self):
+        """Retrieve multi-vital collection settings (<source>_timeout_seconds overrides one source)."""
+        section = 'collection'
+        suffix = '_timeout_seconds'
+        return {
+            'max_workers': self.config.getint(section, 'max_workers'),
+            'timeout_seconds': self.config.getfloat(section, 'timeout_seconds'),
+            'source_timeouts': {
+                option[:-len(suffix)]: self.config.getfloat(section, option)
+                for option in self.config.options(section) if option.endswith(suffix)
+            }
+        }
+
 
 # Define two colors for higher contrast background effect
 colors = ['#a3c1da', '#cad2d3']  # Light gray and deep navy for higher contrast
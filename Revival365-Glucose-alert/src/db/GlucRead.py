@@ -1,5 +1,7 @@
 from db.db_connection import Session, GlucoseReadings, GlucoseDailySummary  
 from db.UserDet import fetch_patient_details  # Existing function name
+from sqlalchemy import func
+import numpy as np
 import pandas as pd
 import random
 
@@ -38,6 +40,107 @@ def fetch_glucose_readings_by_patient_id(user_id):  # Function name unchanged
             print(f"An error occurred while fetching glucose readings for user_id {user_id}: {e}")
             return pd.DataFrame()  # Return an empty DataFrame on error
 
+def fetch_latest_glucose_readings(user_id, num_readings, start=None, end=None):
+    """
+    Fetch a user's `num_readings` most recent glucose readings in [start, end).
+
+    Uses ORDER BY timestamp DESC LIMIT against the (patient_id, timestamp)
+    index, so the cost stays the same however many readings the day holds.
+
+    Returns (timestamps as datetime64[ns], values as float) arrays, newest
+    first, or (None, None) on error.
+    """
+    with Session() as session:
+        try:
+            query = (
+                session.query(GlucoseReadings.timestamp, GlucoseReadings.value)
+                .filter(GlucoseReadings.patient_id == user_id, GlucoseReadings.value.isnot(None))
+            )
+            if start is not None:
+                query = query.filter(GlucoseReadings.timestamp >= start)
+            if end is not None:
+                query = query.filter(GlucoseReadings.timestamp < end)
+            rows = query.order_by(GlucoseReadings.timestamp.desc()).limit(num_readings).all()
+
+            timestamps = np.array([row[0] for row in rows], dtype='datetime64[ns]')
+            values = np.array([row[1] for row in rows], dtype=np.float64)
+            return timestamps, values
+        except Exception as e:
+            print(f"An error occurred while fetching the latest glucose readings for user_id {user_id}: {e}")
+            return None, None
+
+def fetch_latest_readings_for_all_patients(num_readings, start, end):
+    """
+    Fetch the last `num_readings` readings in [start, end) of every patient
+    with readings in that range, in one windowed query.
+
+    Returns a DataFrame with patient_id, position (0 = newest), timestamp and
+    value, ordered by patient_id and position.
+    """
+    with Session() as session:
+        try:
+            ranked = (
+                session.query(
+                    GlucoseReadings.patient_id,
+                    GlucoseReadings.timestamp,
+                    GlucoseReadings.value,
+                    func.row_number().over(
+                        partition_by=GlucoseReadings.patient_id,
+                        order_by=GlucoseReadings.timestamp.desc()
+                    ).label('position')
+                )
+                .filter(
+                    GlucoseReadings.timestamp >= start,
+                    GlucoseReadings.timestamp < end,
+                    GlucoseReadings.value.isnot(None)
+                )
+                .subquery()
+            )
+            rows = (
+                session.query(ranked.c.patient_id, ranked.c.position, ranked.c.timestamp, ranked.c.value)
+                .filter(ranked.c.position <= num_readings)
+                .order_by(ranked.c.patient_id, ranked.c.position)
+                .all()
+            )
+            df = pd.DataFrame(rows, columns=['patient_id', 'position', 'timestamp', 'value'])
+            df['position'] = df['position'] - 1
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            df['value'] = pd.to_numeric(df['value'], errors='coerce')
+            print(f"Fetched {len(df)} readings for {df['patient_id'].nunique()} patients")
+            return df
+        except Exception as e:
+            print(f"An error occurred while fetching the latest glucose readings: {e}")
+            return None
+
+def fetch_max_reading_id():
+    """Largest glucose_readings.id (0 for an empty table, None on error)."""
+    with Session() as session:
+        try:
+            return session.query(func.max(GlucoseReadings.id)).scalar() or 0
+        except Exception as e:
+            print(f"An error occurred while fetching the latest reading id: {e}")
+            return None
+
+def fetch_readings_after_id(after_id, limit):
+    """
+    Fetch up to `limit` readings with id above `after_id`, in id order (the
+    tail of the table), as a DataFrame with id, patient_id, timestamp and value.
+    """
+    with Session() as session:
+        try:
+            rows = (
+                session.query(GlucoseReadings.id, GlucoseReadings.patient_id,
+                              GlucoseReadings.timestamp, GlucoseReadings.value)
+                .filter(GlucoseReadings.id > after_id)
+                .order_by(GlucoseReadings.id)
+                .limit(limit)
+                .all()
+            )
+            return pd.DataFrame(rows, columns=['id', 'patient_id', 'timestamp', 'value'])
+        except Exception as e:
+            print(f"An error occurred while tailing glucose readings after id {after_id}: {e}")
+            return None
+
 def fetch_glucose_readings(user_id):  # Function name unchanged
     return fetch_glucose_readings_by_patient_id(user_id)
     
@@ -1,25 +1,107 @@
-from db.db_connection import Session, GlucoseReadings, GlucoseDailySummary  
+from db.db_connection import Session, GlucoseReadings
 from db.UserDet import fetch_patient_details  # Existing function name
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
+
+class GlucoseSeries:
+    """
+    Raw glucose samples with an on-demand interpolated view.
+
+    times are int64 ns epochs (naive local time, ascending) and values are
+    floats; NaN values from the database are dropped. Nothing is resampled
+    until grid() is called, so callers that only need the raw samples or
+    daily aggregates never build the 5-minute series. Each grid is computed
+    once per frequency and cached.
+    """
+
+    def __init__(self, times, values):
+        keep = ~np.isnan(values)
+        self.times = times[keep]
+        self.values = values[keep]
+        self._grids = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a series from a DataFrame with timestamp and value columns."""
+        if df is None or df.empty:
+            return cls.empty_series()
+        df = df.sort_values('timestamp')
+        return cls(pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+                   pd.to_numeric(df['value'], errors='coerce').to_numpy(dtype=np.float64))
+
+    @classmethod
+    def empty_series(cls):
+        return cls(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def empty(self):
+        return len(self.times) == 0
+
+    def to_frame(self):
+        """The raw samples as a DataFrame with timestamp and value columns."""
+        return pd.DataFrame({'timestamp': self.times.astype('datetime64[ns]'), 'value': self.values})
+
+    def daily_means(self):
+        """Mean of the raw samples per calendar day, as a Series indexed by date."""
+        if self.empty:
+            return pd.Series(dtype=np.float64)
+        days, rows = np.unique(self.times // 86_400_000_000_000, return_inverse=True)
+        means = np.bincount(rows, weights=self.values) / np.bincount(rows)
+        return pd.Series(means, index=pd.to_datetime(days, unit='D').date)
+
+    def grid(self, freq='5min'):
+        """
+        The samples on a regular `freq` grid, as a DataFrame with timestamp and value.
+
+        Same result as resampling to `freq`, taking the mean of each bin and
+        linearly interpolating the empty bins, but computed with bincount and
+        np.interp on the int64 epochs.
+        """
+        if freq not in self._grids:
+            self._grids[freq] = self._build_grid(freq)
+        return self._grids[freq]
+
+    def _build_grid(self, freq):
+        if self.empty:
+            return pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[ns]'), 'value': pd.Series(dtype=np.float64)})
+        step = pd.Timedelta(freq).value
+        # Bins start at midnight of the first day, as resample's default origin does
+        origin = self.times[0] - self.times[0] % 86_400_000_000_000
+        bins = (self.times - origin) // step
+        first, last = bins[0], bins[-1]
+
+        counts = np.bincount(bins - first, minlength=last - first + 1)
+        sums = np.bincount(bins - first, weights=self.values, minlength=last - first + 1)
+        filled = np.flatnonzero(counts)
+        grid_times = origin + (np.arange(first, last + 1)) * step
+        values = np.interp(grid_times, grid_times[filled], sums[filled] / counts[filled])
+        return pd.DataFrame({'timestamp': grid_times.astype('datetime64[ns]'), 'value': values})
+
+
 def interpolate_data(df, freq='5min'):
     """Interpolate missing glucose readings to ensure regular intervals."""
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.set_index('timestamp').resample(freq).mean().interpolate()  # Resample to given frequency and interpolate
-    return df.reset_index()
+    return GlucoseSeries.from_frame(df).grid(freq)
 
-def fetch_glucose_readings_by_patient_id(user_id,specific_date=None ,interval=None): 
-    """Fetch glucose readings for a given user ID (passed as patient_id in queries) and apply interval or specific date filter."""
+def fetch_glucose_readings_by_patient_id(user_id,specific_date=None ,interval=None):
+    """
+    Fetch glucose readings for a given user ID and apply interval or specific date filter.
+
+    Returns a GlucoseSeries of the raw readings (empty when none are found);
+    call .grid() on it for the interpolated 5-minute series.
+    """
     print(f"Fetching glucose readings for user_id: {user_id}")
-    
+
     with Session() as session:
         try:
-            # Base query to fetch glucose readings
+            # Only the two columns are read; no ORM objects are built
             query = (
-                session.query(GlucoseReadings)
-                .join(GlucoseDailySummary, GlucoseReadings.glucose_daily_summary_id == GlucoseDailySummary.id)
-                .filter(GlucoseDailySummary.patient_id == user_id)  # patient_id actually refers to user_id
+                session.query(GlucoseReadings.timestamp, GlucoseReadings.value)
+                .filter(GlucoseReadings.patient_id == user_id)
                 .order_by(GlucoseReadings.timestamp)
             )
 
@@ -27,7 +109,7 @@ def fetch_glucose_readings_by_patient_id(user_id,specific_date=None ,interval=No
             if interval:
                 end_date = datetime.now().date()  # Today's date
                 start_date = None
-                
+
                 if interval == 1:  # Weekly
                     start_date = end_date - timedelta(days=7)
                 elif interval == 2:  # Biweekly
@@ -46,25 +128,17 @@ def fetch_glucose_readings_by_patient_id(user_id,specific_date=None ,interval=No
                 print(f"Applying filter for specific date: {specific_date}")
                 query = query.filter(GlucoseReadings.timestamp.between(specific_date, specific_date + timedelta(days=1)))
 
-            # Fetch the results and convert them to a DataFrame
-            readings = query.all()
-            if readings:
-                df = pd.DataFrame([
-                    {'timestamp': r.timestamp, 'value': r.value}
-                    for r in readings
-                ])
-
-                # Ensure the 'value' column is numeric
-                df['value'] = pd.to_numeric(df['value'], errors='coerce')
-                
-                df = interpolate_data(df)  # Call to the interpolation function
-                return df
-            
+            rows = query.all()
+            if rows:
+                times = np.array([row[0] for row in rows], dtype='datetime64[ns]').astype(np.int64)
+                values = np.array([np.nan if row[1] is None else row[1] for row in rows], dtype=np.float64)
+                return GlucoseSeries(times, values)
+
             print(f"No readings found for user_id: {user_id}")
-            return pd.DataFrame()  # Return an empty DataFrame if no readings found
+            return GlucoseSeries.empty_series()
         except Exception as e:
             print(f"An error occurred while fetching glucose readings for user_id {user_id}: {e}")
-            return pd.DataFrame()  # Return an empty DataFrame on error error
+            return GlucoseSeries.empty_series()
 
 def fetch_glucose_readings(user_id, specific_date, interval,):  # Added interval and specific_date parameters
     return fetch_glucose_readings_by_patient_id(user_id, specific_date ,interval)
@@ -72,7 +146,7 @@ def fetch_glucose_readings(user_id, specific_date, interval,):  # Added interval
 def get_glucose_readings_by_mobile_number(mobile_number, specific_date ,interval):  # Added interval and specific_date parameters
     user_id, error = fetch_patient_details(mobile_number)  # `fetch_patient_details` now returns user ID
     if user_id is not None:  # Check if a valid user ID is returned
-        df = fetch_glucose_readings(user_id,specific_date, interval)  # Fetch using the retrieved user ID
-        return df, None  # Return the DataFrame and no error
+        series = fetch_glucose_readings(user_id,specific_date, interval)  # Fetch using the retrieved user ID
+        return series, None  # Return the GlucoseSeries and no error
     else:
         return None, error  # Return no data and an error message
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Float, Enum, Date, TIMESTAMP, SmallInteger, Time
+from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Float, Enum, Date, TIMESTAMP, SmallInteger, Time, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config.config import config
@@ -18,8 +18,12 @@ def get_db_engine():
     DB_NAME = os.getenv("DB_NAME", "")
     # URL-encode password if needed
     from urllib.parse import quote_plus
-    engine = create_engine(
+    # DATABASE_URL, when set, replaces the DB_* pieces (e.g. a SQLite file for alert_benchmark.py)
+    database_url = os.getenv("DATABASE_URL") or (
         f"mysql+pymysql://{DB_USER}:{quote_plus(DB_PASSWORD)}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+    # One engine per process; its pool is sized so collect_main's concurrent
+    # fetches each keep a connection instead of reconnecting through overflow
+    engine = create_engine(database_url, pool_size=config.get_collection_config()['max_workers'])
     return engine
 
 
@@ -68,6 +72,11 @@ class GlucoseReadings(Base):
     # Assuming patient_id references the User table
     patient_id = Column(Integer)
 
+    # Latest-N reads (ORDER BY timestamp DESC LIMIT n) scan only n index entries
+    __table_args__ = (
+        Index('idx_glucose_readings_patient_timestamp', 'patient_id', 'timestamp'),
+    )
+
 # GlucoseDailySummary model reflecting the provided schema
 
 
@@ -238,12 +247,19 @@ class SleepReadingsDetails(Base):
 engine = get_db_engine()
 Session = sessionmaker(bind=engine)
 
+
+def ensure_indexes():
+    """Create the indexes declared on the models if the database lacks them (safe to re-run)."""
+    for index in GlucoseReadings.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
 # Main function
 if __name__ == '__main__':
     # Attempt to connect to the database
     try:
         connection = engine.connect()
         print("Currently connected to the database.")
+        ensure_indexes()
     except Exception as e:
         print(f"Failed to connect to the database: {e}")
     finally:
@@ -0,0 +1,132 @@
+"""
+forecast.py
+-----------
+Short-horizon glucose forecasts over stacked readings.
+
+All functions take the (patients x readings) layout of
+process_glucose.stack_readings: ns timestamps and values newest first,
+NaN-padded, with a reading count per row. Every step is a masked array
+expression, so forecasting a whole fleet is a single NumPy pass.
+
+Models (MODEL selects the default):
+
+- 'linear': least-squares trend over the window, projected straight ahead;
+- 'damped': the same trend with its slope decaying by DAMPING_PER_MINUTE,
+  which keeps long horizons from overshooting;
+- 'ar1':    the linear projection plus the last residual from the trend,
+  decaying with the residuals' lag-1 autocorrelation.
+"""
+
+import numpy as np
+
+# Configuration Section
+HORIZONS_MINUTES = (15, 30)  # Projection horizons
+MODEL = "linear"  # 'linear', 'damped' or 'ar1'
+DAMPING_PER_MINUTE = 0.97  # Slope retained per minute by the damped model
+MIN_READINGS = 4  # Fewer readings than this give no forecast
+MIN_SPAN_MINUTES = 10  # Nor does a window shorter than this
+MAX_AGE_MINUTES = 15  # Forecasts need a reading at least this recent
+
+NS_PER_MINUTE = 60 * 10**9
+
+
+def fit_linear_trend(times, values, counts):
+    """
+    Least-squares line through each row's readings.
+
+    :param times: np.ndarray of ns timestamps (patients x readings), newest first
+    :param values: np.ndarray (patients x readings), newest first, NaN-padded
+    :param counts: np.ndarray, number of readings per row
+    :return: tuple, (level: fitted value at the newest reading,
+                     slope in mg/dL per minute,
+                     minutes: offsets of each reading from the newest (<= 0),
+                     valid: reading mask)
+    """
+    valid = np.arange(values.shape[1]) < np.asarray(counts)[:, None]
+    minutes = np.where(valid, (times - times[:, :1]) / NS_PER_MINUTE, 0.0)
+    y = np.where(valid, values, 0.0)
+
+    n = valid.sum(axis=1)
+    sum_x, sum_y = minutes.sum(axis=1), y.sum(axis=1)
+    sum_xx, sum_xy = (minutes * minutes).sum(axis=1), (minutes * y).sum(axis=1)
+
+    denominator = n * sum_xx - sum_x * sum_x
+    slope = np.divide(n * sum_xy - sum_x * sum_y, denominator,
+                      out=np.zeros(len(values)), where=denominator > 0)
+    level = np.divide(sum_y - slope * sum_x, n, out=np.full(len(values), np.nan), where=n > 0)
+    return level, slope, minutes, valid
+
+
+def ar1_coefficients(residuals, valid):
+    """Lag-1 autocorrelation of each row's residuals, clipped to (-1, 1)."""
+    pairs = valid[:, :-1] & valid[:, 1:]
+    newer, older = residuals[:, :-1], residuals[:, 1:]
+    numerator = np.where(pairs, newer * older, 0.0).sum(axis=1)
+    denominator = np.where(pairs, older * older, 0.0).sum(axis=1)
+    rho = np.divide(numerator, denominator, out=np.zeros(len(residuals)), where=denominator > 0)
+    return np.clip(rho, -0.99, 0.99)
+
+
+def forecast(times, values, counts, horizons=HORIZONS_MINUTES, model=MODEL):
+    """
+    Project each row's glucose `horizons` minutes past its newest reading.
+
+    :return: tuple, (projections: np.ndarray (patients x horizons), NaN where no forecast
+                     is possible; slope in mg/dL per minute)
+    """
+    counts = np.asarray(counts)
+    level, slope, minutes, valid = fit_linear_trend(times, values, counts)
+    horizons = np.asarray(horizons, dtype=np.float64)[None, :]
+
+    if model == "linear":
+        projections = level[:, None] + slope[:, None] * horizons
+    elif model == "damped":
+        # Sum of the slope decayed over each minute of the horizon
+        phi = DAMPING_PER_MINUTE
+        projections = level[:, None] + slope[:, None] * (phi * (1 - phi ** horizons) / (1 - phi))
+    elif model == "ar1":
+        residuals = np.where(valid, values - (level[:, None] + slope[:, None] * minutes), 0.0)
+        rho = ar1_coefficients(residuals, valid)
+        rows = np.arange(len(values))
+        span = -minutes[rows, np.maximum(counts - 1, 0)]
+        step = np.divide(span, counts - 1, out=np.ones(len(values)), where=counts > 1)  # mean spacing
+        decay = np.sign(rho)[:, None] ** np.round(horizons / step[:, None]) * np.abs(rho)[:, None] ** (horizons / step[:, None])
+        projections = level[:, None] + slope[:, None] * horizons + residuals[:, :1] * decay
+    else:
+        raise ValueError(f"Unknown forecast model: {model}")
+
+    span = -minutes[np.arange(len(values)), np.maximum(counts - 1, 0)]
+    usable = (counts >= MIN_READINGS) & (span >= MIN_SPAN_MINUTES)
+    projections[~usable] = np.nan
+    return projections, slope
+
+
+def projected_crossings(current, projections, low_threshold, high_threshold, horizons=HORIZONS_MINUTES):
+    """
+    First horizon at which each row is projected to cross a threshold from inside the range.
+
+    :param current: np.ndarray, latest reading per row
+    :param projections: np.ndarray (patients x horizons) from forecast()
+    :return: tuple, (side per row: -1 low, 1 high, 0 none;
+                     index of the horizon of the crossing, or -1)
+    """
+    in_range = (current > low_threshold) & (current < high_threshold)
+    low = (projections <= low_threshold) & in_range[:, None]
+    high = (projections >= high_threshold) & in_range[:, None]
+    crossing = low | high  # NaN projections compare False
+
+    horizon_index = np.where(crossing.any(axis=1), np.argmax(crossing, axis=1), -1)
+    rows = np.arange(len(current))
+    side = np.where(horizon_index < 0, 0,
+                    np.where(low[rows, np.maximum(horizon_index, 0)], -1, 1))
+    return side, horizon_index
+
+
+if __name__ == "__main__":
+    # Two patients, readings every 5 minutes, newest first: one falling 1.5 mg/dL/min, one flat
+    offsets = np.arange(10) * 5 * NS_PER_MINUTE
+    times = np.vstack([10**18 - offsets, 10**18 - offsets])
+    values = np.vstack([100 + 1.5 * np.arange(10) * 5, np.full(10, 120.0)])
+    projections, slopes = forecast(times, values, np.array([10, 10]))
+    print(projections, slopes)
+    print(projected_crossings(values[:, 0], projections, 70, 180))
@@ -6,13 +6,42 @@ load_dotenv()
 import json
 import logging
 from process_glucose import process_glucose_readings  # Assuming the function is in a module named process_glucose
+from process_glucose import sweep_glucose_alerts
+from signal_quality import metrics as signal_quality_metrics
+from outbox import flush
+from config.config import config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
+def deliver_queued_alerts():
+    """
+    Wait (bounded) for due alerts to reach the notification API.
+
+    The container is frozen as soon as the handler returns, which stops the
+    background dispatcher, so every invocation gives each due alert its
+    delivery attempt first. Retries still in backoff are left for a later
+    invocation rather than holding this one open.
+    """
+    timeout = config.get_notification_config()['flush_timeout_seconds']
+    if not flush(timeout=timeout):
+        logger.warning(f"Due alerts not delivered within {timeout}s; the rest is retried on the next invocation.")
+
+
 def lambda_handler(event: dict, context) -> dict:
     logger.info("Lambda function started.")
+
+    # Scheduled fleet-wide sweep; it covers every patient, so no mobile number
+    if event.get('rawPath', '') == '/CGM_alert_sweep':
+        try:
+            alerts = sweep_glucose_alerts((event.get('queryStringParameters') or {}).get('date'))
+            deliver_queued_alerts()
+            return build_response(200, {'message': 'Glucose alert sweep completed', 'alerts': len(alerts),
+                                        'signal_quality': signal_quality_metrics()})
+        except Exception as e:
+            logger.error(f"Error in glucose alert sweep: {e}")
+            return build_response(500, {'error': 'An internal error occurred', 'details': str(e)})
     
     # Extract the mobile number from the query string parameters
     mobile_number = event.get('queryStringParameters', {}).get('mobile_number')
@@ -42,6 +71,7 @@ def lambda_handler(event: dict, context) -> dict:
         if path == '/CGM_alert':
             logger.info(f"Processing glucose readings for mobile number: {mobile_number}")
             process_glucose_readings(mobile_number)
+            deliver_queued_alerts()
             return build_response(200, {'message': 'Glucose readings processed successfully'})
         else:
             logger.error(f"Invalid path requested: {path}")
@@ -0,0 +1,260 @@
+"""
+outbox.py
+-----------
+Queued, non-blocking delivery of CGM alerts to the notification API.
+
+send_alert_to_api() only writes the alert to a local SQLite outbox (see the
+[notifications] section of config.ini) and returns once that write commits.
+A background AlertDispatcher thread delivers queued alerts through one
+pooled requests.Session, with at most `max_workers` requests in flight.
+Failed deliveries are retried with exponential backoff until `max_attempts`
+is reached. Every alert carries a uuid Idempotency-Key header, so a retry of
+an alert the API already accepted is not stored twice.
+
+Rows left in 'sending' by a process that died mid-delivery are put back in
+the queue when the next dispatcher starts. flush() waits for the queue to
+drain of due alerts; short-lived processes call it before exiting. The outbox survives
+process restarts, not the loss of its file: on Lambda it lives in the
+container's /tmp, and the dispatcher stops when the container is frozen,
+so the handler flushes (with a timeout) before every response. flush()
+waits only for alerts already due, not for retries in backoff; those and
+anything still queued go out only if the same container is invoked again.
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import closing
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config.config import config
+
+PENDING, SENDING, DELIVERED, FAILED = 'pending', 'sending', 'delivered', 'failed'
+POLL_SECONDS = 5  # longest the dispatcher sleeps without being woken
+RETRYABLE_STATUS = {408, 429}  # 4xx responses that are still worth retrying
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    delivered_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alert_outbox_due ON alert_outbox (status, next_attempt_at);
+"""
+
+_initialised = set()  # outbox paths whose schema exists in this process
+
+
+def connect():
+    """Open the outbox, creating its table on first use."""
+    path = config.get_notification_config()['outbox_path']
+    connection = sqlite3.connect(path, timeout=30)
+    if path not in _initialised:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _initialised.add(path)
+    return connection
+
+
+def enqueue_alerts(alerts):
+    """
+    Commit alerts to the outbox and wake the dispatcher.
+
+    :param alerts: list of alert dicts
+    :return: list of idempotency keys, one per alert
+    """
+    keys = [str(uuid.uuid4()) for _ in alerts]
+    created_at = datetime.now().isoformat(timespec='seconds')
+    now = time.time()
+    with closing(connect()) as connection, connection:
+        connection.executemany(
+            "INSERT INTO alert_outbox (idempotency_key, payload, status, next_attempt_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(key, json.dumps(alert), PENDING, now, created_at) for key, alert in zip(keys, alerts)]
+        )
+    if alerts:
+        get_dispatcher().wake()
+    return keys
+
+
+def enqueue_alert(alert):
+    """Commit one alert to the outbox; returns its idempotency key."""
+    return enqueue_alerts([alert])[0]
+
+
+def outbox_counts():
+    """Number of outbox rows per status."""
+    with closing(connect()) as connection:
+        return dict(connection.execute("SELECT status, COUNT(*) FROM alert_outbox GROUP BY status").fetchall())
+
+
+def backoff_delay(attempts, settings):
+    """Seconds to wait before retry number `attempts`, with jitter so retries do not align."""
+    delay = min(settings['max_backoff_seconds'], settings['backoff_seconds'] * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class AlertDispatcher:
+    """Background thread delivering due outbox rows with bounded concurrency."""
+
+    def __init__(self, settings=None):
+        self.settings = settings or config.get_notification_config()
+        workers = self.settings['max_workers']
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='alert-delivery')
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='alert-dispatcher', daemon=True)
+
+    def start(self):
+        # Deliveries interrupted by a previous process are safe to resend (idempotency keys)
+        with closing(connect()) as connection, connection:
+            connection.execute("UPDATE alert_outbox SET status = ? WHERE status = ?", (PENDING, SENDING))
+        self._thread.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.pool.shutdown(wait=True)
+        self.session.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                rows = self._claim()
+                if rows:
+                    wait([self.pool.submit(self._deliver, *row) for row in rows])
+                    continue
+                sleep = self._seconds_until_due()
+            except Exception as e:
+                print(f"Alert dispatcher error: {e}")
+                sleep = POLL_SECONDS
+            self._wake.wait(timeout=sleep)
+            self._wake.clear()
+
+    def _claim(self):
+        """Mark up to max_workers due rows as 'sending' and return them."""
+        with closing(connect()) as connection, connection:
+            rows = connection.execute(
+                "SELECT id, idempotency_key, payload, attempts FROM alert_outbox "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                (PENDING, time.time(), self.settings['max_workers'])
+            ).fetchall()
+            connection.executemany("UPDATE alert_outbox SET status = ? WHERE id = ?",
+                                   [(SENDING, row[0]) for row in rows])
+        return rows
+
+    def _seconds_until_due(self):
+        with closing(connect()) as connection:
+            next_due = connection.execute(
+                "SELECT MIN(next_attempt_at) FROM alert_outbox WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        if next_due is None:
+            return POLL_SECONDS
+        return min(POLL_SECONDS, max(0.0, next_due - time.time()))
+
+    def _deliver(self, row_id, key, payload, attempts):
+        attempts += 1
+        error, retry = None, True
+        try:
+            response = self.session.post(
+                self.settings['api_url'],
+                data=payload,
+                headers={"Content-Type": "application/json", "Idempotency-Key": key},
+                timeout=self.settings['timeout_seconds']
+            )
+            if response.status_code == 200 and response.json().get("status") == 201:
+                self._record(row_id, DELIVERED, attempts)
+                print(f"Alert {key} delivered after {attempts} attempt(s).")
+                return
+            error = f"Status: {response.status_code}, Message: {response.text[:200]}"
+            retry = response.status_code >= 500 or response.status_code in RETRYABLE_STATUS
+        except Exception as e:
+            error = str(e)
+
+        if retry and attempts < self.settings['max_attempts']:
+            self._record(row_id, PENDING, attempts, error, time.time() + backoff_delay(attempts, self.settings))
+            print(f"Alert {key} delivery failed (attempt {attempts}), will retry: {error}")
+        else:
+            self._record(row_id, FAILED, attempts, error)
+            print(f"Alert {key} delivery failed permanently after {attempts} attempt(s): {error}")
+
+    def _record(self, row_id, status, attempts, error=None, next_attempt_at=None):
+        with closing(connect()) as connection, connection:
+            connection.execute(
+                "UPDATE alert_outbox SET status = ?, attempts = ?, last_error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), delivered_at = ? WHERE id = ?",
+                (status, attempts, error, next_attempt_at,
+                 datetime.now().isoformat(timespec='seconds') if status == DELIVERED else None, row_id)
+            )
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process-wide dispatcher, started on first use."""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher().start()
+        return _dispatcher
+
+
+def flush(timeout=None):
+    """
+    Wait until every alert due when called has had its delivery attempt.
+
+    Rows already in backoff (next_attempt_at in the future) are not waited
+    for, nor are retries scheduled while flushing: the dispatcher sends them
+    when they fall due. Returns at once when nothing is due.
+
+    :param timeout: seconds to wait at most (None waits indefinitely)
+    :return: bool, True if no due alert is left waiting or being delivered
+    """
+    as_of = time.time()
+    deadline = None if timeout is None else as_of + timeout
+    if not count_due(as_of):
+        return True
+    dispatcher = get_dispatcher()
+    while True:
+        dispatcher.wake()
+        time.sleep(0.05)
+        if not count_due(as_of):
+            return True
+        if deadline is not None and time.time() >= deadline:
+            return False
+
+
+def count_due(as_of):
+    """Number of alerts being delivered or waiting with next_attempt_at <= `as_of`."""
+    with closing(connect()) as connection:
+        return connection.execute(
+            "SELECT COUNT(*) FROM alert_outbox WHERE status = ? OR (status = ? AND next_attempt_at <= ?)",
+            (SENDING, PENDING, as_of)
+        ).fetchone()[0]
+
+if __name__ == "__main__":
+    print(json.dumps(outbox_counts(), indent=4))
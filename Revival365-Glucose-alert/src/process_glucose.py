@@ -1,6 +1,12 @@
-import requests
+import numpy as np
+import pandas as pd
 from datetime import datetime
-from read_glucose_readings import glucose_readings
+from forecast import HORIZONS_MINUTES, MAX_AGE_MINUTES, NS_PER_MINUTE, forecast, projected_crossings
+from outbox import enqueue_alert, enqueue_alerts, flush
+from signal_quality import OUTCOMES, clean_stacked
+from suppression import get_suppressor
+from db.GlucRead import fetch_latest_glucose_readings, fetch_latest_readings_for_all_patients
+from db.UserDet import fetch_patient_details
 
 # Configuration Section
 LOW_THRESHOLD = 70  # Low glucose threshold
@@ -12,9 +18,10 @@ SLOPE_RATES = {  # Configurable thresholds (mg/dL per minute)
     "gradual": 20 / 60,  # 10–20 mg/dL per hour
     "rapid": float('inf')  # > 20 mg/dL per hour
 }
+TREND_TOLERANCE = 0.01  # Deltas smaller than this (mg/dL) do not start or reverse a trend
+TREND_TYPES = {1: "upward", -1: "downward"}
 # Weight to give the last slope when combining with the moving average
 LAST_SLOPE_WEIGHT = 2
-NOTIFICATION_API_URL = "http://10.0.0.15:8000/notification/add/alert"
 MOBILE_NUMBER = ""  # Hardcoded mobile number for testing
 
 
@@ -54,7 +61,7 @@ def extract_relevant_trend(readings):
     deltas = [values[i] - values[i + 1] for i in range(len(values) - 1)]
 
     # Allow small tolerances for detecting trends (treat deltas close to zero as zero)
-    tolerance = 0.01
+    tolerance = TREND_TOLERANCE
     normalized_deltas = [
         0 if abs(delta) < tolerance else delta for delta in deltas]
 
@@ -221,77 +228,42 @@ def build_user_friendly_message(latest_value, threshold_desc, trend_type,
     return message
 
 
-def generate_alert(trend_type, avg_slope, last_slope, readings, patient_id):
+def build_alert(patient_id, latest_value, trend_type, avg_slope, last_slope,
+                avg_classification, last_classification):
     """
-    Generate a single alert based on the trend and slopes.
+    Build the alert for a trend, or None when the value is not near a threshold.
 
+    :param patient_id: int, ID of the patient
+    :param latest_value: glucose value the alert reports
     :param trend_type: str, type of trend (upward or downward)
     :param avg_slope: float, average slope of the trend
     :param last_slope: float, slope of the last two readings
-    :param readings: list of relevant glucose readings
-    :param patient_id: int, ID of the patient
+    :param avg_classification: str, classify_slope(avg_slope)
+    :param last_classification: str, classify_slope(last_slope)
+    :return: dict alert or None
     """
-    log_progress("Generating alert based on trend and slopes...")
-    avg_classification = classify_slope(avg_slope)
-    last_classification = classify_slope(last_slope)
-    latest_value = readings[-1]["value"]
+    # Stable and moving trends share the same thresholds; the note describes the trend
+    if latest_value <= LOW_THRESHOLD or latest_value >= HIGH_THRESHOLD:
+        threshold_desc = ("below the low threshold"
+                          if latest_value <= LOW_THRESHOLD
+                          else "above the high threshold")
+        severity = 3
+        severity_label = "Critical"
+    elif latest_value <= LOW_THRESHOLD * (1 + WARNING_MARGIN):
+        threshold_desc = "approaching the low threshold"
+        severity = 2
+        severity_label = "Warning"
+    elif latest_value >= HIGH_THRESHOLD * (1 - WARNING_MARGIN):
+        threshold_desc = "approaching the high threshold"
+        severity = 2
+        severity_label = "Warning"
+    else:
+        return None
 
-    # NEW: Compare last slope to average slope for a user-friendly mention
+    # Compare last slope to average slope for a user-friendly mention
     slope_comparison = compare_slope_change(
         avg_slope, last_slope, tolerance=0.2)
 
-    log_progress(f"Trend type: {trend_type}, Average Slope: {avg_slope:.5f} mg/dL/min ({avg_classification}), "
-                 f"Last Slope: {last_slope:.5f} mg/dL/min ({last_classification}).")
-
-    # We'll keep the same logic for thresholds, but just build a friendlier note.
-
-    severity = 1
-    severity_label = "Info"  # "Critical", "Warning", or "Info"
-    threshold_desc = "within a normal range"
-
-    # Check critical levels even for stable trends
-    if avg_classification == "stable" and last_classification == "stable":
-        if latest_value <= LOW_THRESHOLD or latest_value >= HIGH_THRESHOLD:
-            threshold_desc = ("below the low threshold"
-                              if latest_value <= LOW_THRESHOLD
-                              else "above the high threshold")
-            severity = 3
-            severity_label = "Critical"
-        elif latest_value <= LOW_THRESHOLD * (1 + WARNING_MARGIN):
-            threshold_desc = "approaching the low threshold"
-            severity = 2
-            severity_label = "Warning"
-        elif latest_value >= HIGH_THRESHOLD * (1 - WARNING_MARGIN):
-            threshold_desc = "approaching the high threshold"
-            severity = 2
-            severity_label = "Warning"
-        else:
-            # No alert scenario
-            log_progress(
-                "No alert generated: Blood sugar levels are stable and within safe ranges.")
-            return
-    else:
-        # Non-stable scenario
-        if latest_value <= LOW_THRESHOLD or latest_value >= HIGH_THRESHOLD:
-            threshold_desc = ("below the low threshold"
-                              if latest_value <= LOW_THRESHOLD
-                              else "above the high threshold")
-            severity = 3
-            severity_label = "Critical"
-        elif latest_value <= LOW_THRESHOLD * (1 + WARNING_MARGIN):
-            threshold_desc = "approaching the low threshold"
-            severity = 2
-            severity_label = "Warning"
-        elif latest_value >= HIGH_THRESHOLD * (1 - WARNING_MARGIN):
-            threshold_desc = "approaching the high threshold"
-            severity = 2
-            severity_label = "Warning"
-        else:
-            log_progress(
-                "No alert generated: latest value does not approach or breach thresholds.")
-            return
-
-    # UPDATED: Build a friendlier text message instead of short "Critical/Warning".
     note = build_user_friendly_message(
         latest_value=latest_value,
         threshold_desc=threshold_desc,
@@ -304,80 +276,406 @@ def generate_alert(trend_type, avg_slope, last_slope, readings, patient_id):
         severity_label=severity_label
     )
 
-    alert = {
+    return {
         "patientId": patient_id,
         "doctorId": 0,
         "note": note,
         "createdby": 0,
         "severity": severity
     }
+
+
+def alert_class(latest_value):
+    """Alert class used for suppression: which threshold the value is at or near."""
+    return "low" if latest_value <= LOW_THRESHOLD * (1 + WARNING_MARGIN) else "high"
+
+
+def admit_alert(alert, latest_value, klass=None, now=None, reserve=True):
+    """
+    Check an alert against the suppression window (see suppression.py).
+
+    An admitted alert's cool-down is reserved in the same step, so a
+    concurrent evaluation for the patient cannot admit it too. Finish with
+    commit_alert once it is queued, or release_alert if queueing fails.
+    Dry runs pass reserve=False and only check.
+
+    :param klass: str, suppression class (defaults to alert_class(latest_value))
+    :param now: datetime the cool-downs are measured at (defaults to the current time)
+    :return: bool, True if the alert should be sent
+    """
+    suppressor = get_suppressor()
+    decide = suppressor.admit if reserve else suppressor.check
+    admitted, reason = decide(
+        alert["patientId"], klass or alert_class(latest_value), alert["severity"], latest_value,
+        now=None if now is None else now.timestamp())
+    if not admitted:
+        log_progress(f"Alert for patient {alert['patientId']} suppressed: {reason}.")
+    return admitted
+
+
+def commit_alert(alert, latest_value, klass=None):
+    """Keep the cool-down admit_alert reserved for an alert that was queued."""
+    get_suppressor().commit(alert["patientId"], klass or alert_class(latest_value), alert["severity"])
+
+
+def release_alert(alert, latest_value, klass=None):
+    """Drop the cool-down admit_alert reserved for an alert that could not be queued."""
+    get_suppressor().release(alert["patientId"], klass or alert_class(latest_value), alert["severity"])
+
+
+def generate_alert(trend_type, avg_slope, last_slope, readings, patient_id, now=None):
+    """
+    Generate a single alert based on the trend and slopes.
+
+    :param trend_type: str, type of trend (upward or downward)
+    :param avg_slope: float, average slope of the trend
+    :param last_slope: float, slope of the last two readings
+    :param readings: list of relevant glucose readings
+    :param patient_id: int, ID of the patient
+    :param now: datetime of the evaluation (defaults to the current time)
+    :return: tuple, (alert dict or None, bool sent)
+    """
+    log_progress("Generating alert based on trend and slopes...")
+    avg_classification = classify_slope(avg_slope)
+    last_classification = classify_slope(last_slope)
+    # The relevant readings are newest first, as extracted
+    latest_value = readings[0]["value"]
+
+    log_progress(f"Trend type: {trend_type}, Average Slope: {avg_slope:.5f} mg/dL/min ({avg_classification}), "
+                 f"Last Slope: {last_slope:.5f} mg/dL/min ({last_classification}).")
+
+    alert = build_alert(patient_id, latest_value, trend_type, avg_slope, last_slope,
+                        avg_classification, last_classification)
+    if alert is None:
+        log_progress(
+            "No alert generated: latest value does not approach or breach thresholds.")
+        return None, False
+
     print(f"Generated Alert: {alert}")
-    send_alert_to_api(alert)
+    if not admit_alert(alert, latest_value, now=now):
+        return alert, False
+    if send_alert_to_api(alert) is None:
+        release_alert(alert, latest_value)
+        return alert, False
+    commit_alert(alert, latest_value)
+    return alert, True
 
 
 def send_alert_to_api(alert):
     """
-    Send alert to the notification API.
+    Queue an alert for the notification API.
+
+    Returns once the alert is committed to the outbox; delivery, retries and
+    idempotency are handled in the background (see outbox.py).
 
     :param alert: dict, alert details
+    :return: str idempotency key, or None if the alert could not be queued
     """
     try:
-
-        headers = {"Content-Type": "application/json"}
-        response = requests.post(NOTIFICATION_API_URL,
-                                 json=alert, headers=headers)
-        if response.status_code == 200 and response.json().get("status") == 201:
-            log_progress(f"Alert sent successfully: {response.json()}")
-        else:
-            log_progress(
-                f"Failed to send alert. Status: {response.status_code}, Message: {response.text}")
+        key = enqueue_alert(alert)
+        log_progress(f"Alert queued for delivery: {key}")
+        return key
     except Exception as e:
-        log_progress(f"Error sending alert: {str(e)}")
+        log_progress(f"Error queueing alert: {str(e)}")
+        return None
 
 
-def process_glucose_readings(mobile_number):
+def process_glucose_readings(mobile_number, now=None):
     """
     Process glucose readings to analyze trends and send alerts.
 
     :param mobile_number: str, patient's mobile number
+    :param now: datetime of the evaluation (defaults to the current time; replays pass
+                the time of the reading being evaluated)
+    :return: list of alerts queued for delivery
     """
-    log_progress("Fetching glucose readings...")
-    glucose_data = glucose_readings(mobile_number)
-
-    # Debugging: Log the fetched data
-    log_progress(f"Fetched glucose_data: {glucose_data}")
-
-    # Check if patient_details is present
-    patient_details = glucose_data.get("patient_details")
-    if not patient_details or "id" not in patient_details:
-        log_progress(
-            "Error: 'patient_details' or 'id' missing in glucose_data.")
-        return
-
-    patient_id = patient_details["id"]
-    readings = glucose_data.get("glucose_readings", [])
-    if not readings:
-        log_progress(
-            "Error: 'glucose_readings' missing or empty in glucose_data.")
-        return
-
-    log_progress(
-        f"Fetched {len(readings)} glucose readings. Extracting the last {EXTRACTION_READINGS} readings...")
-    recent_readings = get_last_x_readings(readings, EXTRACTION_READINGS)
+    now = now or datetime.now()
+    patient_id, error = fetch_patient_details(mobile_number)
+    if patient_id is None:
+        log_progress(f"Error: {error}")
+        return []
+
+    # Only today's readings count, and only the last EXTRACTION_READINGS of them are read
+    log_progress(f"Fetching the last {EXTRACTION_READINGS} glucose readings...")
+    day = pd.Timestamp(now).normalize()
+    timestamps, values = fetch_latest_glucose_readings(
+        patient_id, EXTRACTION_READINGS, day.to_pydatetime(), (day + pd.Timedelta(days=1)).to_pydatetime())
+    if timestamps is None or len(timestamps) == 0:
+        log_progress("Error: no glucose readings found for today.")
+        return []
+
+    # Classify only the readings after the newest sensor gap or artifact (see signal_quality.py)
+    _, (clean_count,), quality = clean_stacked(
+        timestamps.astype(np.int64)[None, :], np.trunc(values)[None, :], np.array([len(values)]))
+    if clean_count == 0:
+        outcome = next(name for name in OUTCOMES if quality[name])
+        log_progress(f"Readings window unreliable ({outcome}); no alert evaluated.")
+        return []
+    if clean_count < len(values):
+        log_progress(f"Using the {clean_count} readings after a sensor gap or artifact.")
+        timestamps, values = timestamps[:clean_count], values[:clean_count]
+
+    # Newest first, whole mg/dL values as the trend helpers expect
+    recent_readings = [{"timestamp": pd.Timestamp(timestamp).isoformat(), "value": int(value)}
+                       for timestamp, value in zip(timestamps, values)]
+    log_progress(f"Fetched {len(recent_readings)} readings for analysis.")
 
     for r in recent_readings:
         print(f"Timestamp: {r['timestamp']}, Value: {r['value']}")
 
+    alert, sent = None, False
     trend_type, relevant_readings = extract_relevant_trend(recent_readings)
     if trend_type:
         avg_slope, last_slope = calculate_slopes(relevant_readings)
-        generate_alert(trend_type, avg_slope, last_slope,
-                       relevant_readings, patient_id)
+        alert, sent = generate_alert(trend_type, avg_slope, last_slope,
+                                     relevant_readings, patient_id, now=now)
     else:
         log_progress("No consistent trend detected. No alert generated.")
+    queued = [alert] if sent else []
+
+    # A reading already at or near a threshold has its alert; otherwise look ahead
+    if alert is None:
+        stacked_values = np.trunc(np.asarray(values, dtype=np.float64))[None, :]
+        predictions = predict_stacked(np.array([patient_id]), timestamps.astype(np.int64)[None, :],
+                                      stacked_values, np.array([len(values)]), now=now)
+        for predicted, projected_value, klass in predictions:
+            print(f"Predicted Alert: {predicted}")
+            if admit_alert(predicted, projected_value, klass, now=now):
+                if send_alert_to_api(predicted) is None:
+                    release_alert(predicted, projected_value, klass)
+                else:
+                    commit_alert(predicted, projected_value, klass)
+                    queued.append(predicted)
+    return queued
+
+
+# -----------------------------------------------------------------------------
+# Fleet-wide sweep: every active patient in one query and one array pass.
+# Rows are patients, columns are their readings newest first (as in
+# get_last_x_readings); rows with fewer readings are padded with NaN.
+# -----------------------------------------------------------------------------
+def stack_readings(df, num_readings):
+    """
+    Stack per-patient readings into (patients x num_readings) arrays.
+
+    :param df: DataFrame from fetch_latest_readings_for_all_patients
+    :return: tuple, (patient_ids, times in ns, values, reading counts)
+    """
+    patient_ids, rows = np.unique(df["patient_id"].to_numpy(), return_inverse=True)
+    positions = df["position"].to_numpy()
+
+    times = np.zeros((len(patient_ids), num_readings), dtype=np.int64)
+    values = np.full((len(patient_ids), num_readings), np.nan)
+    times[rows, positions] = df["timestamp"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    # The per-patient path works on whole mg/dL values
+    values[rows, positions] = np.trunc(df["value"].to_numpy(dtype=np.float64))
+    counts = np.bincount(rows, minlength=len(patient_ids))
+    return patient_ids, times, values, counts
+
+
+def extract_relevant_trends(values, counts):
+    """
+    extract_relevant_trend for every row of stacked readings.
+
+    :param values: np.ndarray (patients x readings), newest first
+    :param counts: np.ndarray, number of readings per row
+    :return: tuple, (trend per row: 1 upward, -1 downward, 0 none;
+                     position of the oldest relevant reading per row)
+    """
+    rows = np.arange(len(values))
+    deltas = values[:, :-1] - values[:, 1:]
+    valid = np.arange(deltas.shape[1]) < (counts - 1)[:, None]
+    signs = np.where(valid & (np.abs(deltas) >= TREND_TOLERANCE), np.sign(deltas), 0).astype(np.int8)
+
+    # The first non-zero delta sets the trend; the run ends at the first reversal
+    trends = signs[rows, np.argmax(signs != 0, axis=1)]
+    reversal = (signs == -trends[:, None]) & (trends != 0)[:, None]
+    oldest = np.where(reversal.any(axis=1), np.argmax(reversal, axis=1), counts - 1)
+    return trends, oldest
+
+
+def calculate_slopes_batch(times, values, oldest):
+    """
+    calculate_slopes for every row of stacked readings.
+
+    :param times: np.ndarray of ns timestamps (patients x readings), newest first
+    :param values: np.ndarray (patients x readings), newest first
+    :param oldest: np.ndarray, position of each row's oldest relevant reading
+    :return: tuple, (average slopes, last slopes) in mg/dL per minute
+    """
+    rows = np.arange(len(values))
+    total_change = values[:, 0] - values[rows, oldest]
+    total_time = (times[:, 0] - times[rows, oldest]) / 1e9 / 60
+    average_slopes = np.divide(total_change, total_time,
+                               out=np.zeros(len(values)), where=total_time > 0)
+
+    if values.shape[1] < 2:
+        return average_slopes, np.zeros(len(values))
+    last_change = values[:, 0] - values[:, 1]
+    last_time = (times[:, 0] - times[:, 1]) / 1e9 / 60
+    last_slopes = np.divide(last_change, last_time,
+                            out=np.zeros(len(values)), where=(oldest > 0) & (last_time > 0))
+    return average_slopes, last_slopes
+
+
+def classify_slopes(slopes):
+    """
+    classify_slope for an array of slopes.
+
+    :param slopes: np.ndarray, slopes in mg/dL per minute
+    :return: np.ndarray of str classifications
+    """
+    abs_slopes = np.abs(slopes)
+    return np.select([abs_slopes < SLOPE_RATES["stable"], abs_slopes < SLOPE_RATES["gradual"]],
+                     ["stable", "gradual"], default="rapid")
+
+
+def evaluate_stacked(patient_ids, times, values, counts):
+    """
+    Alerts for stacked readings, before suppression.
+
+    :param patient_ids: np.ndarray, patient of each row
+    :param times: np.ndarray of ns timestamps (patients x readings), newest first
+    :param values: np.ndarray (patients x readings), newest first
+    :param counts: np.ndarray, number of readings per row
+    :return: list of (alert, latest_value) tuples
+    """
+    trends, oldest = extract_relevant_trends(values, counts)
+    average_slopes, last_slopes = calculate_slopes_batch(times, values, oldest)
+    average_classes, last_classes = classify_slopes(average_slopes), classify_slopes(last_slopes)
+
+    # Column 0 is each row's newest reading
+    latest_values = values[:, 0]
+    near_threshold = ((latest_values <= LOW_THRESHOLD * (1 + WARNING_MARGIN)) |
+                      (latest_values >= HIGH_THRESHOLD * (1 - WARNING_MARGIN)))
+
+    alerts = []
+    for i in np.flatnonzero((trends != 0) & near_threshold):
+        alert = build_alert(int(patient_ids[i]), int(latest_values[i]), TREND_TYPES[int(trends[i])],
+                            float(average_slopes[i]), float(last_slopes[i]),
+                            str(average_classes[i]), str(last_classes[i]))
+        if alert is not None:
+            alerts.append((alert, int(latest_values[i])))
+    return alerts
+
+
+def build_predicted_alert(patient_id, current_value, projected_value, horizon, side):
+    """
+    Build the alert for a projected threshold crossing.
+
+    A projected low within the first horizon is critical; later lows and all
+    projected highs are warnings.
+
+    :param current_value: latest glucose reading, inside the normal range
+    :param projected_value: forecast value at `horizon`
+    :param horizon: int, minutes ahead of the latest reading
+    :param side: int, -1 for a projected low, 1 for a projected high
+    :return: dict alert
+    """
+    if side < 0:
+        threshold_desc = "below the low threshold"
+        severity = 3 if horizon <= HORIZONS_MINUTES[0] else 2
+        advice = "Consider taking fast-acting carbohydrates or following your care plan to prevent a low."
+    else:
+        threshold_desc = "above the high threshold"
+        severity = 2
+        advice = "Please keep a close watch and follow your care plan or healthcare provider's advice."
+
+    note = (
+        f"Your current glucose reading is {current_value} mg/dL. "
+        f"At its current trend it is projected to reach about {projected_value} mg/dL "
+        f"within {horizon} minutes, which is {threshold_desc}. {advice}"
+    )
+    return {
+        "patientId": patient_id,
+        "doctorId": 0,
+        "note": note,
+        "createdby": 0,
+        "severity": severity
+    }
+
+
+def predict_stacked(patient_ids, times, values, counts, exclude=(), now=None):
+    """
+    Predicted alerts for stacked readings, before suppression (see forecast.py).
+
+    Only rows whose latest reading is inside the normal range and projected to
+    cross a threshold within HORIZONS_MINUTES raise one.
+
+    :param exclude: patient ids to skip (e.g. those with a reactive alert this cycle)
+    :param now: datetime; rows whose latest reading is older than MAX_AGE_MINUTES are
+                skipped (None skips no row, e.g. when sweeping a past day)
+    :return: list of (alert, projected_value, alert class) tuples
+    """
+    projections, _ = forecast(times, values, counts)
+    sides, horizon_index = projected_crossings(values[:, 0], projections, LOW_THRESHOLD, HIGH_THRESHOLD)
+
+    candidates = sides != 0
+    if now is not None:
+        candidates &= times[:, 0] >= pd.Timestamp(now).value - MAX_AGE_MINUTES * NS_PER_MINUTE
+    if len(exclude):
+        candidates &= ~np.isin(patient_ids, list(exclude))
+
+    predictions = []
+    for i in np.flatnonzero(candidates):
+        side, horizon = int(sides[i]), HORIZONS_MINUTES[horizon_index[i]]
+        projected_value = int(round(projections[i, horizon_index[i]]))
+        alert = build_predicted_alert(int(patient_ids[i]), int(values[i, 0]), projected_value, horizon, side)
+        predictions.append((alert, projected_value, "predicted_low" if side < 0 else "predicted_high"))
+    return predictions
+
+
+def sweep_glucose_alerts(day=None, num_readings=EXTRACTION_READINGS, send=True):
+    """
+    Evaluate every patient with readings on `day` and send their alerts.
+
+    Produces the same alerts as calling process_glucose_readings for each of
+    those patients, from a single query instead of one per patient.
+
+    :param day: date to sweep (defaults to today)
+    :param num_readings: int, readings per patient to analyse
+    :param send: bool, queue the alerts for delivery to the notification API
+    :return: list of alerts generated this cycle and not suppressed
+    """
+    day = pd.Timestamp(day or datetime.today()).normalize()
+    log_progress(f"Sweeping the last {num_readings} readings of all patients for {day.date()}...")
+    df = fetch_latest_readings_for_all_patients(
+        num_readings, day.to_pydatetime(), (day + pd.Timedelta(days=1)).to_pydatetime())
+    if df is None or df.empty:
+        log_progress("No glucose readings found for the sweep.")
+        return []
+
+    patient_ids, times, values, counts = stack_readings(df, num_readings)
+    values, counts, quality = clean_stacked(times, values, counts)
+    log_progress(f"Signal quality: {quality}")
+    reactive = evaluate_stacked(patient_ids, times, values, counts)
+    # Staleness only applies to a live sweep; a past day is evaluated as it stood
+    now = datetime.now() if day == pd.Timestamp(datetime.today()).normalize() else None
+    predicted = predict_stacked(patient_ids, times, values, counts,
+                                exclude={alert["patientId"] for alert, _ in reactive}, now=now)
+
+    admitted = [(alert, latest_value, None) for alert, latest_value in reactive
+                if admit_alert(alert, latest_value, reserve=send)]
+    admitted += [(alert, projected_value, klass) for alert, projected_value, klass in predicted
+                 if admit_alert(alert, projected_value, klass, reserve=send)]
+    alerts = [alert for alert, _, _ in admitted]
+
+    log_progress(f"Swept {len(patient_ids)} patients: {len(alerts)} alerts to send "
+                 f"({len(predicted)} predicted before suppression).")
+    if send and alerts:
+        try:
+            enqueue_alerts(alerts)  # one outbox transaction for the whole cycle
+        except Exception:
+            for alert, value, klass in admitted:
+                release_alert(alert, value, klass)
+            raise
+        for alert, value, klass in admitted:
+            commit_alert(alert, value, klass)
+    return alerts
 
 
 if __name__ == "__main__":
     log_progress("Starting glucose monitoring process...")
     process_glucose_readings(MOBILE_NUMBER)
+    flush(timeout=30)  # deliver queued alerts before the process exits
     log_progress("Glucose monitoring process completed.")
@@ -0,0 +1,121 @@
+"""
+signal_quality.py
+-----------
+Sensor-gap and artifact screening ahead of trend extraction.
+
+The trend and slope helpers take the last readings at face value, so a
+sensor gap or a compression low (pressure on the sensor reads as a sudden,
+false drop) turns into a steep slope and a false urgent alert. This stage
+looks at every consecutive pair of readings in the stacked (patients x
+readings, newest first) arrays at once:
+
+- a gap:      more than MAX_GAP_MINUTES between two readings;
+- an artifact: a change faster than MAX_RATE (mg/dL per minute), beyond
+  what blood glucose does physiologically.
+
+Only the readings newer than a row's most recent defect are kept (the clean
+segment). The whole window is rejected as unreliable when that segment has
+fewer than MIN_CLEAN_READINGS readings, or when the artifact is less than
+ARTIFACT_HOLD_MINUTES old: the readings after a compression drop sit at the
+false low until the pressure is released.
+
+Counts of clean, truncated and rejected windows are kept per process and
+returned by metrics().
+"""
+
+import threading
+
+import numpy as np
+
+# Configuration Section
+MAX_GAP_MINUTES = 15  # Longer silences split the window
+MAX_RATE = 4.0  # mg/dL per minute; faster changes are treated as sensor artifacts
+MIN_CLEAN_READINGS = 3  # Fewer clean readings than this and the window is not classified
+ARTIFACT_HOLD_MINUTES = 30  # Readings this soon after an artifact are not trusted
+
+NS_PER_MINUTE = 60 * 10**9
+
+CLEAN, TRUNCATED_GAP, TRUNCATED_ARTIFACT, REJECTED_GAP, REJECTED_ARTIFACT = range(5)
+OUTCOMES = ('clean', 'truncated_gap', 'truncated_artifact', 'rejected_gap', 'rejected_artifact')
+
+_metrics = dict.fromkeys(OUTCOMES + ('windows', 'readings_dropped'), 0)
+_metrics_lock = threading.Lock()
+
+
+def assess(times, values, counts):
+    """
+    Find each row's clean segment.
+
+    :param times: np.ndarray of ns timestamps (patients x readings), newest first
+    :param values: np.ndarray (patients x readings), newest first, NaN-padded
+    :param counts: np.ndarray, number of readings per row
+    :return: tuple, (clean counts per row, 0 when rejected; outcome code per row)
+    """
+    counts = np.asarray(counts)
+    if values.shape[1] < 2:
+        return counts.copy(), np.full(len(counts), CLEAN)
+
+    # Pair i joins reading i with the older reading i + 1
+    pairs = np.arange(values.shape[1] - 1) < (counts - 1)[:, None]
+    minutes = (times[:, :-1] - times[:, 1:]) / NS_PER_MINUTE
+    rates = np.divide(np.abs(values[:, :-1] - values[:, 1:]), minutes,
+                      out=np.zeros(minutes.shape), where=minutes > 0)
+    gap = pairs & (minutes > MAX_GAP_MINUTES)
+    artifact = pairs & ~gap & (rates > MAX_RATE)
+
+    defect = gap | artifact
+    has_defect = defect.any(axis=1)
+    newest = np.argmax(defect, axis=1)  # readings 0..newest precede the newest defect
+    rows = np.arange(len(counts))
+    clean_counts = np.where(has_defect, newest + 1, counts)
+    is_artifact = has_defect & artifact[rows, newest]
+
+    # Age of the artifact at the newest reading: time from the reading after it
+    artifact_age = (times[:, 0] - times[rows, newest]) / NS_PER_MINUTE
+    rejected = has_defect & ((clean_counts < MIN_CLEAN_READINGS) |
+                             (is_artifact & (artifact_age < ARTIFACT_HOLD_MINUTES)))
+
+    outcomes = np.select(
+        [~has_defect, rejected & is_artifact, rejected, is_artifact],
+        [CLEAN, REJECTED_ARTIFACT, REJECTED_GAP, TRUNCATED_ARTIFACT],
+        default=TRUNCATED_GAP)
+    return np.where(rejected, 0, clean_counts), outcomes
+
+
+def clean_stacked(times, values, counts):
+    """
+    Keep only each row's clean segment and record the outcomes in metrics().
+
+    :return: tuple, (values with rejected readings set to NaN, clean counts per row,
+                     dict of outcome counts for these rows)
+    """
+    counts = np.asarray(counts)
+    clean_counts, outcomes = assess(times, values, counts)
+    if (clean_counts != counts).any():
+        values = np.where(np.arange(values.shape[1]) < clean_counts[:, None], values, np.nan)
+
+    summary = dict(zip(OUTCOMES, np.bincount(outcomes, minlength=len(OUTCOMES)).tolist()))
+    summary['windows'] = len(counts)
+    summary['readings_dropped'] = int((counts - clean_counts).sum())
+    with _metrics_lock:
+        for key, count in summary.items():
+            _metrics[key] += count
+    return values, clean_counts, summary
+
+
+def metrics():
+    """Window outcomes counted by this process so far."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+if __name__ == "__main__":
+    # Newest first: a clean descent, a compression drop 10 minutes ago, and a 40-minute gap
+    step = 5 * NS_PER_MINUTE
+    times = np.vstack([10**18 - np.arange(6) * step] * 2 +
+                      [10**18 - np.array([0, 1, 2, 10, 11, 12]) * step])
+    values = np.array([[80, 84, 88, 92, 96, 100],
+                       [60, 62, 110, 112, 111, 113],
+                       [80, 82, 84, 130, 131, 133]], dtype=float)
+    print(clean_stacked(times, values, np.array([6, 6, 6])))
+    print(metrics())
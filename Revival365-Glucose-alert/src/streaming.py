@@ -0,0 +1,235 @@
+"""
+streaming.py
+-----------
+Long-running, event-driven CGM alert evaluator.
+
+Instead of re-querying a patient's readings on every evaluation, the
+evaluator keeps each patient's last EXTRACTION_READINGS readings of the day
+in a fixed-size NumPy ring buffer. Every arriving reading updates its
+patient's buffer and re-runs trend extraction, slope calculation and slope
+classification on that patient alone, a constant amount of work with no
+database read. Readings before a sensor gap or artifact are dropped first
+(see signal_quality.py). When that raises no alert, the patient's forecast is checked
+for a projected threshold crossing (see forecast.py). Alerts go through the same suppression and outbox as the
+/CGM_alert and sweep paths, and match what those paths report for the same
+readings.
+
+Readings arrive from a local queue (consume) or by tailing glucose_readings
+by id (tail), the stand-in for a change stream. On start, prime() fills the
+buffers with one windowed query so the first arrivals have history.
+
+    python streaming.py            # prime, then tail the readings table
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from db.GlucRead import fetch_latest_readings_for_all_patients, fetch_max_reading_id, fetch_readings_after_id
+from process_glucose import (EXTRACTION_READINGS, admit_alert, commit_alert, evaluate_stacked, log_progress,
+                             predict_stacked, release_alert, send_alert_to_api, stack_readings)
+from signal_quality import clean_stacked
+
+DAY_NS = 86_400 * 10**9
+TAIL_BATCH = 1000  # readings read per table-tail poll
+
+
+class ReadingRing:
+    """
+    The latest `capacity` readings of one patient's current day.
+
+    Readings are written at `head` and overwrite the oldest once the buffer is
+    full. A reading for a new day clears the buffer (the alert path only looks
+    at today's readings); readings from an earlier day are ignored. A repeated
+    timestamp replaces the stored value, so replays are harmless.
+    """
+    __slots__ = ('times', 'values', 'head', 'count', 'day')
+
+    def __init__(self, capacity):
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.values = np.zeros(capacity, dtype=np.float64)
+        self.head = -1
+        self.count = 0
+        self.day = None
+
+    def push(self, timestamp_ns, value):
+        """
+        Add a reading.
+
+        :param timestamp_ns: int, reading time in ns since the epoch (naive local time)
+        :param value: float, whole mg/dL
+        :return: bool, True if the buffer changed
+        """
+        day = timestamp_ns // DAY_NS
+        if self.day is None or day > self.day:
+            self.day, self.head, self.count = day, -1, 0
+        elif day < self.day:
+            return False
+
+        if self.count and timestamp_ns <= self.times[self.head]:
+            return self._insert_late(timestamp_ns, value)
+
+        self.head = (self.head + 1) % len(self.times)
+        self.times[self.head] = timestamp_ns
+        self.values[self.head] = value
+        self.count = min(self.count + 1, len(self.times))
+        return True
+
+    def _insert_late(self, timestamp_ns, value):
+        """A reading at or before the newest one: rare, so the buffer is simply rebuilt."""
+        times, values = self.newest_first()
+        match = np.flatnonzero(times == timestamp_ns)
+        if match.size:
+            self.values[(self.head - match[0]) % len(self.times)] = value
+            return True
+        if self.count == len(self.times) and timestamp_ns < times[-1]:
+            return False  # older than everything kept
+
+        times = np.append(times, timestamp_ns)
+        values = np.append(values, value)
+        order = np.argsort(times, kind='stable')[-len(self.times):]  # oldest to newest
+        self.count = len(order)
+        self.times[:self.count] = times[order]
+        self.values[:self.count] = values[order]
+        self.head = self.count - 1
+        return True
+
+    def newest_first(self):
+        """(times, values) of the buffered readings, newest first."""
+        positions = (self.head - np.arange(self.count)) % len(self.times)
+        return self.times[positions], self.values[positions]
+
+
+class StreamingEvaluator:
+    """Per-patient ring buffers plus the alert evaluation run on every arrival."""
+
+    def __init__(self, capacity=EXTRACTION_READINGS, send=True):
+        self.capacity = capacity
+        self.send = send
+        self.rings = {}
+        # Reused one-row stack for evaluate_stacked
+        self._times = np.zeros((1, capacity), dtype=np.int64)
+        self._values = np.full((1, capacity), np.nan)
+        self._clean_values, self._clean_counts = self._values, np.zeros(1, dtype=np.int64)
+
+    def _ring(self, patient_id):
+        ring = self.rings.get(patient_id)
+        if ring is None:
+            ring = self.rings[patient_id] = ReadingRing(self.capacity)
+        return ring
+
+    def prime(self, day=None):
+        """Load every patient's latest readings of `day` (default today) without alerting."""
+        day = pd.Timestamp(day or pd.Timestamp.today()).normalize()
+        df = fetch_latest_readings_for_all_patients(
+            self.capacity, day.to_pydatetime(), (day + pd.Timedelta(days=1)).to_pydatetime())
+        if df is None or df.empty:
+            return 0
+        patient_ids, times, values, counts = stack_readings(df, self.capacity)
+        for patient_id, row_times, row_values, count in zip(patient_ids, times, values, counts):
+            ring = self._ring(int(patient_id))
+            for position in range(count - 1, -1, -1):  # oldest first
+                ring.push(int(row_times[position]), float(row_values[position]))
+        log_progress(f"Primed ring buffers for {len(patient_ids)} patients.")
+        return len(patient_ids)
+
+    def evaluate(self, patient_id):
+        """
+        Alert for a patient's buffered readings, before suppression.
+
+        :return: tuple, (alert dict, latest_value) or (None, None)
+        """
+        ring = self.rings.get(patient_id)
+        if ring is None or ring.count == 0:
+            return None, None
+        times, values = ring.newest_first()
+        self._times[0, :ring.count] = times
+        self._values[0, :] = np.nan
+        self._values[0, :ring.count] = values
+        self._clean_values, self._clean_counts, _ = clean_stacked(self._times, self._values, np.array([ring.count]))
+        alerts = evaluate_stacked(np.array([patient_id]), self._times, self._clean_values, self._clean_counts)
+        return alerts[0] if alerts else (None, None)
+
+    def predict(self, patient_id):
+        """
+        Predicted alert for a patient's buffered readings, before suppression.
+
+        Uses the cleaned stack of the preceding evaluate(). Arrivals are live, so
+        no staleness cut-off applies.
+
+        :return: tuple, (alert dict, projected_value, alert class) or (None, None, None)
+        """
+        predictions = predict_stacked(np.array([patient_id]), self._times, self._clean_values, self._clean_counts)
+        return predictions[0] if predictions else (None, None, None)
+
+    def ingest(self, patient_id, timestamp, value):
+        """
+        Take one new reading and alert on it if needed.
+
+        :param patient_id: int
+        :param timestamp: datetime-like reading time
+        :param value: glucose value in mg/dL (None is ignored)
+        :return: the alert sent for this reading, or None
+        """
+        if value is None or pd.isna(value):
+            return None
+        timestamp_ns = pd.Timestamp(timestamp).value
+        # Whole mg/dL, as on the per-patient path
+        if not self._ring(patient_id).push(timestamp_ns, float(np.trunc(float(value)))):
+            return None
+
+        alert, value = self.evaluate(patient_id)
+        klass = None
+        if alert is None:
+            alert, value, klass = self.predict(patient_id)
+        if alert is None or not admit_alert(alert, value, klass, reserve=self.send):
+            return None
+        if self.send:
+            if send_alert_to_api(alert) is None:
+                release_alert(alert, value, klass)
+                return None
+            commit_alert(alert, value, klass)
+        return alert
+
+    def consume(self, readings):
+        """
+        Ingest (patient_id, timestamp, value) tuples from a queue.Queue until a None arrives.
+
+        :return: int, number of alerts sent
+        """
+        alerts = 0
+        while True:
+            item = readings.get()
+            if item is None:
+                return alerts
+            alerts += self.ingest(*item) is not None
+
+    def tail(self, poll_seconds=1.0, after_id=None, stop=None):
+        """
+        Follow new rows of glucose_readings by id and ingest them as they arrive.
+
+        :param poll_seconds: float, wait between polls when no rows are new
+        :param after_id: int, last id already seen (defaults to the current maximum)
+        :param stop: optional threading.Event ending the loop
+        :return: int, the last id ingested
+        """
+        if after_id is None:
+            after_id = fetch_max_reading_id() or 0
+        while stop is None or not stop.is_set():
+            rows = fetch_readings_after_id(after_id, TAIL_BATCH)
+            if rows is None or rows.empty:
+                time.sleep(poll_seconds)
+                continue
+            for patient_id, timestamp, value in zip(rows['patient_id'], rows['timestamp'], rows['value']):
+                self.ingest(int(patient_id), timestamp, value)
+            after_id = int(rows['id'].iloc[-1])
+        return after_id
+
+
+if __name__ == "__main__":
+    evaluator = StreamingEvaluator()
+    start_id = fetch_max_reading_id()  # taken before priming so nothing falls in between
+    evaluator.prime()
+    log_progress("Streaming alert evaluator started.")
+    evaluator.tail(after_id=start_id)
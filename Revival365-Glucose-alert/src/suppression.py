@@ -0,0 +1,200 @@
+"""
+suppression.py
+-----------
+Deduplication of CGM alerts per patient, alert class and severity.
+
+A patient sitting in the same condition would otherwise get the same alert
+every cycle. Once an alert is queued for delivery, repeats with the same
+(patient, alert class, severity) key are suppressed for that severity's
+cool-down (see the [suppression] section of config.ini), with two escalation
+rules:
+
+- an alert of higher severity than one still cooling down always goes out,
+  and silences lower severities of the same class until it expires;
+- a repeat inside the cool-down still goes out when glucose has moved at
+  least `escalation_delta` mg/dL further into the alert zone since the last
+  alert that was sent.
+
+Callers admit() an alert, which checks it and reserves its cool-down under
+one lock, then commit() the reservation once the outbox write has
+succeeded or release() it when the write fails. Concurrent evaluations
+for the same patient therefore never both queue an alert, and an alert
+that failed to queue does not silence its retries.
+
+State lives in an in-process TTL map. When `persist_path` is set every
+decision is also written to SQLite, and unexpired entries are loaded back
+on start, so a restarted process keeps its cool-downs.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+from config.config import config
+
+SEVERITY_NAMES = {2: 'warning', 3: 'critical'}
+PRUNE_SECONDS = 60  # how often expired entries are dropped from the map
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_suppression (
+    patient_id INTEGER NOT NULL,
+    alert_class TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (patient_id, alert_class, severity)
+);
+"""
+
+
+class AlertSuppressor:
+    """Decides whether an alert is new enough to send, and remembers the ones that were."""
+
+    def __init__(self, settings=None):
+        self.settings = settings or config.get_suppression_config()
+        self._entries = {}  # (patient_id, alert_class) -> {severity: (expires_at, value)}
+        self._pending = {}  # (patient_id, alert_class, severity) -> entry it replaced, until commit/release
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+        self._schema_ready = False
+        if self.settings['persist_path']:
+            self._load()
+
+    def cooldown_seconds(self, severity):
+        minutes = self.settings['cooldown_minutes'].get(SEVERITY_NAMES.get(severity), self.settings['default_cooldown_minutes'])
+        return minutes * 60
+
+    def check(self, patient_id, alert_class, severity, value, now=None):
+        """
+        Check an alert against the active cool-downs without reserving it
+        (dry runs); see admit().
+
+        :param patient_id: int
+        :param alert_class: str, e.g. 'low', 'high' or 'predicted_low'
+        :param severity: int, alert severity (higher is worse)
+        :param value: float, the glucose value the alert reports
+        :return: tuple, (bool send, str reason)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._prune(now)
+            return self._check(patient_id, alert_class, severity, value, now)
+
+    def admit(self, patient_id, alert_class, severity, value, now=None):
+        """
+        Check an alert and, if it may go out, reserve its cool-down in the
+        same critical section, so two concurrent evaluations for the same
+        patient cannot both pass. The reservation silences repeats at once
+        but is only persisted by commit(), once the alert is queued;
+        release() undoes it when queueing fails.
+
+        :return: tuple, (bool send, str reason)
+        """
+        now = time.time() if now is None else now
+        key = (patient_id, alert_class, severity)
+        with self._lock:
+            self._prune(now)
+            if key in self._pending:
+                return False, "pending delivery"
+            admitted, reason = self._check(patient_id, alert_class, severity, value, now)
+            if admitted:
+                severities = self._entries.setdefault((patient_id, alert_class), {})
+                self._pending[key] = severities.get(severity)
+                severities[severity] = (now + self.cooldown_seconds(severity), float(value))
+            return admitted, reason
+
+    def commit(self, patient_id, alert_class, severity):
+        """Keep the cool-down reserved by admit() for an alert that was queued."""
+        key = (patient_id, alert_class, severity)
+        with self._lock:
+            if key not in self._pending:
+                return
+            del self._pending[key]
+            entry = self._entries.get((patient_id, alert_class), {}).get(severity)
+            if entry is not None and self.settings['persist_path']:
+                self._store(key, entry)
+
+    def release(self, patient_id, alert_class, severity):
+        """Undo the reservation of an alert that could not be queued."""
+        key = (patient_id, alert_class, severity)
+        with self._lock:
+            if key not in self._pending:
+                return
+            previous = self._pending.pop(key)
+            severities = self._entries.get((patient_id, alert_class), {})
+            if previous is None:
+                severities.pop(severity, None)
+            else:
+                severities[severity] = previous
+
+    def _check(self, patient_id, alert_class, severity, value, now):
+        active = {other: entry for other, entry in self._entries.get((patient_id, alert_class), {}).items()
+                  if entry[0] > now}
+        higher = [other for other in active if other > severity]
+        if higher:
+            return False, f"covered by an active severity {max(higher)} alert"
+
+        previous = active.get(severity)
+        if previous is None:
+            return True, "new alert"
+        worsened = previous[1] - value if alert_class.endswith('low') else value - previous[1]
+        if worsened < self.settings['escalation_delta']:
+            return False, "duplicate within cool-down"
+        return True, f"escalated by {worsened:g} mg/dL"
+
+    def _prune(self, now):
+        if now < self._next_prune:
+            return
+        pruned = {}
+        for key, severities in self._entries.items():
+            active = {severity: entry for severity, entry in severities.items()
+                      if entry[0] > now or (*key, severity) in self._pending}
+            if active:
+                pruned[key] = active
+        self._entries = pruned
+        self._next_prune = now + PRUNE_SECONDS
+
+    def _connect(self):
+        connection = sqlite3.connect(self.settings['persist_path'], timeout=30)
+        if not self._schema_ready:
+            connection.executescript(SCHEMA)
+            self._schema_ready = True
+        return connection
+
+    def _load(self):
+        try:
+            with closing(self._connect()) as connection:
+                rows = connection.execute(
+                    "SELECT patient_id, alert_class, severity, expires_at, value FROM alert_suppression "
+                    "WHERE expires_at > ?", (time.time(),)
+                ).fetchall()
+            for patient, klass, severity, expires_at, value in rows:
+                self._entries.setdefault((patient, klass), {})[severity] = (expires_at, value)
+        except Exception as e:
+            print(f"Could not load alert suppression state: {e}")
+
+    def _store(self, key, entry):
+        try:
+            with closing(self._connect()) as connection, connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO alert_suppression (patient_id, alert_class, severity, expires_at, value) "
+                    "VALUES (?, ?, ?, ?, ?)", (*key, *entry)
+                )
+                connection.execute("DELETE FROM alert_suppression WHERE expires_at <= ?", (time.time(),))
+        except Exception as e:
+            # The in-process map still applies; only restarts lose this entry
+            print(f"Could not persist alert suppression state: {e}")
+
+
+_suppressor = None
+_suppressor_lock = threading.Lock()
+
+
+def get_suppressor():
+    """The process-wide suppressor, created on first use."""
+    global _suppressor
+    with _suppressor_lock:
+        if _suppressor is None:
+            _suppressor = AlertSuppressor()
+        return _suppressor
@@ -12,11 +12,11 @@ from typing import Any, Dict
 from fastapi import APIRouter, HTTPException
 
 # Pydantic schema used to validate and parse incoming request payloads
-from app.schemas.agp import AgpRequest
+from app.schemas.agp import AgpBatchRequest, AgpCompareRequest, AgpRequest
 
 # Service-layer function that encapsulates the AGP business logic
 # (currently aligned with Lambda behavior)
-from app.services.agp import fetch_agp_profile
+from app.services.agp import fetch_agp_comparison, fetch_agp_profile, fetch_agp_profile_batch
 
 # Initialize a FastAPI router
 # - prefix="" means the route is exposed at the root level
@@ -60,3 +60,67 @@ async def get_agp(payload: AgpRequest) -> Dict[str, Any]:
             detail={"error": "An internal error occurred",
                     "details": str(exc)},
         ) from exc
+
+
+@router.post("/agp_profile_batch")
+def get_agp_batch(payload: AgpBatchRequest) -> Dict[str, Any]:
+    """
+    Mirror the `/agp_profile_batch` Lambda route – AGP reports for every
+    patient in `mobile_numbers`. Declared sync so the CPU-heavy batch runs
+    in the threadpool instead of blocking the event loop.
+    """
+    if not payload.mobile_numbers:
+        raise HTTPException(
+            status_code=400, detail="mobile_numbers must be a non-empty list")
+
+    try:
+        result = fetch_agp_profile_batch(
+            mobile_numbers=payload.mobile_numbers,
+            window=payload.window,
+        )
+        status = result["status"]
+        body = result["body"]
+
+        if status >= 400:
+            raise HTTPException(status_code=status, detail=body)
+        return body
+    except HTTPException:
+        raise
+    except Exception as exc:  # pragma: no cover
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "An internal error occurred",
+                    "details": str(exc)},
+        ) from exc
+
+
+@router.post("/agp_compare")
+def compare_agp(payload: AgpCompareRequest) -> Dict[str, Any]:
+    """
+    Mirror the `/agp_compare` Lambda route – AGP profile of the last
+    `period_days` days vs the `period_days` days before, with deltas.
+    """
+    if payload.mobile_number is None:
+        raise HTTPException(
+            status_code=400, detail="mobile_number is required")
+
+    try:
+        result = fetch_agp_comparison(
+            mobile_number=payload.mobile_number,
+            period_days=payload.period_days,
+            end_date=payload.end_date,
+        )
+        status = result["status"]
+        body = result["body"]
+
+        if status >= 400:
+            raise HTTPException(status_code=status, detail=body)
+        return body
+    except HTTPException:
+        raise
+    except Exception as exc:  # pragma: no cover
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "An internal error occurred",
+                    "details": str(exc)},
+        ) from exc
@@ -8,23 +8,34 @@ layer during migration from AWS Lambda to FastAPI.
 from __future__ import annotations
 from typing import Any, Dict, Optional
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 
 # Service-layer function that encapsulates the AGP business logic
 # (currently aligned with Lambda behavior)
-from app.services.dha_charts import get_tir_trends, get_fbg_trends, get_mean_gluc_trends, get_meal_spikes_trends, get_nauc_trends, get_dips_day, get_dips_night, get_spikes_day, get_bp_readings, get_bt_readings, get_glucose_readings, get_hr_readings, get_spo2_readings, get_master_glucose_config, get_spikes_night
+from app.services.dha_charts import get_tir_trends, get_fbg_trends, get_mean_gluc_trends, get_meal_spikes_trends, get_nauc_trends, get_dips_day, get_dips_night, get_spikes_day, get_bp_readings, get_bt_readings, get_glucose_readings, get_hr_readings, get_spo2_readings, get_master_glucose_config, get_spikes_night, get_chart_metadata, refresh_snapshots
 
 # Schemas user for request validation
-from app.schemas.dha import DhaChartRequest
+from app.schemas.dha import DhaChartRequest, DhaReadingsRequest, DhaTrendRequest
 
 # Initialize a FastAPI router
 # - prefix="" means the route is exposed at the root level
 # - tags=["AGP"] enables logical grouping in Swagger/OpenAPI docs
+# Routes are plain `def` so FastAPI runs them in its worker thread pool.
+# The chart calculators receive each patient's configuration per request
+# (chart_config.ChartConfig) and share no mutable module state, so
+# concurrent requests are safe.
 router = APIRouter(prefix="", tags=["DHA Charts"])
 
 
+def _paging(payload: DhaTrendRequest) -> Dict[str, Any]:
+    """Paging query parameters (start/end/weeks/cursor) that were supplied."""
+    return payload.model_dump(include={"start", "end", "weeks", "cursor"}, exclude_none=True)
+
+
 @router.get("/tir")
-async def get_tir(mobile_number: str, date: Optional[str] = None) -> Dict[str, Any]:
+def get_tir(mobile_number: str, date: Optional[str] = None, start: Optional[str] = None,
+            end: Optional[str] = None, weeks: Optional[int] = Query(None, ge=1), cursor: Optional[str] = None,
+            format: Optional[str] = None) -> Dict[str, Any]:
     """
     This endpoint wraps the existing tri_trends Lambda logic to ensure
     functional parity. It accepts a validated tri_trends Request payload
@@ -37,7 +48,10 @@ async def get_tir(mobile_number: str, date: Optional[str] = None) -> Dict[str, A
             status_code=400, detail="Mobile number is required."
         )
     try:
-        result = get_tir_trends(mobile_number=mobile_number, date=date)
+        paging = {"start": start, "end": end, "weeks": weeks, "cursor": cursor}
+        result = get_tir_trends(mobile_number=mobile_number, date=date,
+                                paging={key: value for key, value in paging.items() if value is not None},
+                                output_format=format)
         status = result["status"]
         body = result["body"]
 
@@ -58,11 +72,13 @@ async def get_tir(mobile_number: str, date: Optional[str] = None) -> Dict[str, A
 
 
 @router.get("/fbg")
-async def get_fbg_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_fbg_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /fbg Lambda route - Get Fasting Blood Glucose details"""
     result = get_fbg_trends(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -72,11 +88,13 @@ async def get_fbg_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any
 
 
 @router.get("/mean_gluc")
-async def get_mean_gluc_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_mean_gluc_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /mean_gluc Lambda route - Get Mean Glucose details"""
     result = get_mean_gluc_trends(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -86,11 +104,13 @@ async def get_mean_gluc_details(payload: DhaChartRequest = Depends()) -> Dict[st
 
 
 @router.get("/meal_spikes")
-async def get_fbg_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_fbg_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /meal_spikes Lambda route - Get Meal spikes details"""
     result = get_meal_spikes_trends(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -100,11 +120,13 @@ async def get_fbg_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any
 
 
 @router.get("/nauc")
-async def get_nauc_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_nauc_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /nauc Lambda route - Get NAUC details"""
     result = get_nauc_trends(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -114,11 +136,13 @@ async def get_nauc_details(payload: DhaChartRequest = Depends()) -> Dict[str, An
 
 
 @router.get("/dips_day")
-async def get_dips_day_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_dips_day_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /dips_day Lambda route - Get Dips_day details"""
     result = get_dips_day(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -128,11 +152,13 @@ async def get_dips_day_details(payload: DhaChartRequest = Depends()) -> Dict[str
 
 
 @router.get("/dips_night")
-async def get_dips_night_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_dips_night_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /dips_night Lambda route - Get Dips_night details"""
     result = get_dips_night(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -142,11 +168,13 @@ async def get_dips_night_details(payload: DhaChartRequest = Depends()) -> Dict[s
 
 
 @router.get("/spikes_day")
-async def get_spikes_day_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_spikes_day_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /spikes_day Lambda route - Get Spikes_day details"""
     result = get_spikes_day(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -156,11 +184,13 @@ async def get_spikes_day_details(payload: DhaChartRequest = Depends()) -> Dict[s
 
 
 @router.get("/spikes_night")
-async def get_spikes_night_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_spikes_night_details(payload: DhaTrendRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /spikes_night Lambda route - Get Spikes_night details"""
     result = get_spikes_night(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        paging=_paging(payload),
+        output_format=payload.format
     )
     status = result["status"]
     body = result["body"]
@@ -170,11 +200,72 @@ async def get_spikes_night_details(payload: DhaChartRequest = Depends()) -> Dict
 
 
 @router.get("/glucose-readings")
-async def get_glucose_readings_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_glucose_readings_details(payload: DhaReadingsRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /glucose-readings Lambda route - Get Glucose reading details"""
     result = get_glucose_readings(
         mobile_number=payload.mobile_number,
-        date=payload.date
+        date=payload.date,
+        max_points=payload.max_points
+    )
+    status = result["status"]
+    body = result["body"]
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body)
+    return body
+
+
+@router.get("/hr_readings")
+def get_hr_readings_details(payload: DhaReadingsRequest = Depends()) -> Dict[str, Any]:
+    """Mirror the /hr_readings Lambda route - Get Heart rate reading details"""
+    result = get_hr_readings(
+        mobile_number=payload.mobile_number,
+        date=payload.date,
+        max_points=payload.max_points
+    )
+    status = result["status"]
+    body = result["body"]
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body)
+    return body
+
+
+@router.get("/spo2_readings")
+def get_spo2_readings_details(payload: DhaReadingsRequest = Depends()) -> Dict[str, Any]:
+    """Mirror the /spo2_readings Lambda route - Get SpO2 reading details"""
+    result = get_spo2_readings(
+        mobile_number=payload.mobile_number,
+        date=payload.date,
+        max_points=payload.max_points
+    )
+    status = result["status"]
+    body = result["body"]
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body)
+    return body
+
+
+@router.get("/bt_readings")
+def get_bt_readings_details(payload: DhaReadingsRequest = Depends()) -> Dict[str, Any]:
+    """Mirror the /bt_readings Lambda route - Get Body temperature reading details"""
+    result = get_bt_readings(
+        mobile_number=payload.mobile_number,
+        date=payload.date,
+        max_points=payload.max_points
+    )
+    status = result["status"]
+    body = result["body"]
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body)
+    return body
+
+
+@router.get("/bp_readings")
+def get_bp_readings_details(payload: DhaReadingsRequest = Depends()) -> Dict[str, Any]:
+    """Mirror the /bp_readings Lambda route - Get Blood pressure reading details"""
+    result = get_bp_readings(
+        mobile_number=payload.mobile_number,
+        date=payload.date,
+        max_points=payload.max_points
     )
     status = result["status"]
     body = result["body"]
@@ -184,7 +275,7 @@ async def get_glucose_readings_details(payload: DhaChartRequest = Depends()) ->
 
 
 @router.get("/master_glucose_config")
-async def get_master_glucose_config_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
+def get_master_glucose_config_details(payload: DhaChartRequest = Depends()) -> Dict[str, Any]:
     """Mirror the /master_glucose_config Lambda route - Get Master glucose config details"""
     result = get_master_glucose_config(
         mobile_number=payload.mobile_number,
@@ -195,3 +286,28 @@ async def get_master_glucose_config_details(payload: DhaChartRequest = Depends()
     if status >= 400:
         raise HTTPException(status_code=status, detail=body)
     return body
+
+
+@router.get("/chart_metadata")
+def get_chart_metadata_details(response: Response, id: Optional[str] = None, chart: Optional[str] = None) -> Dict[str, Any]:
+    """Mirror the /chart_metadata Lambda route - Get the metadata block of a columnar chart"""
+    result = get_chart_metadata(metadata_id=id, chart=chart)
+    status = result["status"]
+    body = result["body"]
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body)
+    # Metadata ids are content hashes, so a specific id never changes
+    if id:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return body
+
+
+@router.post("/refresh_snapshots")
+def refresh_snapshots_details(mobile_number: str) -> Dict[str, Any]:
+    """Mirror the /refresh_snapshots Lambda route - Refresh a patient's pre-computed chart snapshots"""
+    result = refresh_snapshots(mobile_number=mobile_number)
+    status = result["status"]
+    body = result["body"]
+    if status >= 400:
+        raise HTTPException(status_code=status, detail=body)
+    return body
@@ -6,13 +6,13 @@ to the existing glucose-alert Lambda function. It acts as a compatibility
 layer during migration from AWS Lambda to FastAPI.
 """
 from __future__ import annotations
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, HTTPException
 
 # Service-layer function that encapsulates the AGP business logic
 # (currently aligned with Lambda behavior)
-from app.services.glucose_alert import get_glucose_alert
+from app.services.glucose_alert import get_glucose_alert, run_glucose_alert_sweep
 
 # Initialize a FastAPI router
 # - prefix="" means the route is exposed at the root level
@@ -51,3 +51,28 @@ async def get_CGM_alert(mobile_number: str) -> Dict[str, Any]:
             detail={"error": "An internal error occurred",
                     "details": str(exc)},
         ) from exc
+
+
+@router.post("/CGM_alert_sweep")
+async def run_CGM_alert_sweep(date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run the fleet-wide CGM alert sweep: the latest readings of every patient
+    with readings on `date` (default today) are evaluated in one pass.
+    """
+    try:
+        result = run_glucose_alert_sweep(date)
+        status = result["status"]
+        body = result["body"]
+
+        # Translate Lambda error responses into HTTP exceptions
+        if status >= 400:
+            raise HTTPException(status_code=status, detail=body)
+        return body
+    except HTTPException:
+        raise
+    except Exception as exc:  # pragma: no cover
+        raise HTTPException(
+            status_code=500,
+            detail={"error": "An internal error occurred",
+                    "details": str(exc)},
+        ) from exc
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 
 
@@ -8,3 +8,14 @@ class AgpRequest(BaseModel):
     mobile_number: Optional[str] = None
     # start_date: Optional[str] = None
     # end_date: Optional[str] = None
+
+
+class AgpBatchRequest(BaseModel):
+    mobile_numbers: List[str]
+    window: Optional[int] = 90
+
+
+class AgpCompareRequest(BaseModel):
+    mobile_number: Optional[str] = None
+    period_days: Optional[int] = 14
+    end_date: Optional[str] = None
@@ -2,8 +2,23 @@ from __future__ import annotations
 
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 class DhaChartRequest(BaseModel):
     mobile_number: str
-    date: Optional[str] = None
\ No newline at end of file
+    date: Optional[str] = None
+
+
+class DhaTrendRequest(DhaChartRequest):
+    # Optional paging: a start/end date range, or `weeks` ISO weeks ending before `cursor`
+    start: Optional[str] = None
+    end: Optional[str] = None
+    weeks: Optional[int] = Field(None, ge=1)
+    cursor: Optional[str] = None
+    # "columnar" for the compact parallel-array payload (tir, fbg, mean_gluc and nauc only)
+    format: Optional[str] = None
+
+
+class DhaReadingsRequest(DhaChartRequest):
+    # Optional point budget; the reading series is downsampled to fit it
+    max_points: Optional[int] = None
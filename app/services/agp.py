@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 import sys
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 # Utility responsible for dynamically loading a Lambda handler
 from app.utils.lambda_loader import load_lambda_handler
@@ -82,3 +82,65 @@ def fetch_agp_profile(
 
     # Standardized service-layer response
     return {"status": status, "body": body}
+
+
+def fetch_agp_profile_batch(
+    mobile_numbers: List[str],
+    window: Optional[int] = 90,
+) -> Dict[str, Any]:
+    """
+    Mirror the `/agp_profile_batch` Lambda route: AGP reports for a whole
+    panel of patients from one bulk fetch.
+    """
+    event = {
+        "rawPath": "/agp_profile_batch",
+        "queryStringParameters": {},
+        "body": json.dumps(
+            {
+                "mobile_numbers": mobile_numbers,
+                "window": window,
+            }
+        ),
+    }
+
+    result = agp_lambda_handler(event, context=None)
+    status = result.get("statusCode", 200)
+    body = result.get("body")
+
+    if isinstance(body, str):
+        body = json.loads(body)
+
+    return {"status": status, "body": body}
+
+
+def fetch_agp_comparison(
+    mobile_number: str,
+    period_days: Optional[int] = 14,
+    end_date: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Mirror the `/agp_compare` Lambda route: current vs previous period AGP
+    profiles and their deltas.
+    """
+    event = {
+        "rawPath": "/agp_compare",
+        "queryStringParameters": {
+            "mobile_number": mobile_number,
+        },
+        "body": json.dumps(
+            {
+                "mobile_number": mobile_number,
+                "period_days": period_days,
+                "end_date": end_date,
+            }
+        ),
+    }
+
+    result = agp_lambda_handler(event, context=None)
+    status = result.get("statusCode", 200)
+    body = result.get("body")
+
+    if isinstance(body, str):
+        body = json.loads(body)
+
+    return {"status": status, "body": body}
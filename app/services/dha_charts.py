@@ -96,102 +96,120 @@ def _call_lambda(path: str, query: Dict[str, Any], body: Optional[Dict[str, Any]
 # ------------------------------------------------------------------
 
 
-def get_tir_trends(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def _trend_query(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]],
+                 output_format: Optional[str] = None) -> Dict[str, Any]:
+    """Query string for the weekly trend routes; `paging` holds start/end/weeks/cursor."""
+    query: Dict[str, Any] = {"mobile_number": mobile_number, "date": date, "format": output_format}
+    query.update(paging or {})
+    return query
+
+
+
+def get_tir_trends(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                   output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/tir` – Fetching and processing of glucose data."""
     return _call_lambda(
         path="/tir",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_fbg_trends(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_fbg_trends(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                   output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/fbs` – Fetching and processing of fbs data."""
     return _call_lambda(
         path="/fbs",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_mean_gluc_trends(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_mean_gluc_trends(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                         output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/mean_gluc` – Fetching and processing of mean_gluc data."""
     return _call_lambda(
         path="/mean_gluc",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_meal_spikes_trends(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_meal_spikes_trends(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                           output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/meal_spikes` – Fetching and processing of meal_spikes data."""
     return _call_lambda(
         path="/meal_spikes",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_nauc_trends(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_nauc_trends(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                    output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/nauc` – Fetching and processing of nauc data."""
     return _call_lambda(
         path="/nauc",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_dips_day(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_dips_day(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                 output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/dips_day` – Fetching and processing of dips_day data."""
     return _call_lambda(
         path="/dips_day",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_dips_night(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_dips_night(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                   output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/dips_night` – Fetching and processing of dips_night data."""
     return _call_lambda(
         path="/dips_night",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_spikes_day(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_spikes_day(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                   output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/spikes_day` – Fetching and processing of spikes_day data."""
     return _call_lambda(
         path="/spikes_day",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_spikes_night(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_spikes_night(mobile_number: str, date: Optional[str], paging: Optional[Dict[str, Any]] = None,
+                     output_format: Optional[str] = None) -> Dict[str, Any]:
     """Mirror `/spikes_night` – Fetching and processing of spikes_night data."""
     return _call_lambda(
         path="/spikes_night",
-        query={"mobile_number": mobile_number, "date": date}
+        query=_trend_query(mobile_number, date, paging, output_format)
     )
 
-def get_hr_readings(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_hr_readings(mobile_number: str, date: Optional[str], max_points: Optional[int] = None) -> Dict[str, Any]:
     """Mirror `/hr_readings` – Fetching and processing of hr_readings data."""
     return _call_lambda(
         path="/hr_readings",
-        query={"mobile_number": mobile_number, "date": date}
+        query={"mobile_number": mobile_number, "date": date, "max_points": max_points}
     )
 
-def get_spo2_readings(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_spo2_readings(mobile_number: str, date: Optional[str], max_points: Optional[int] = None) -> Dict[str, Any]:
     """Mirror `/spo2_readings` – Fetching and processing of spo2_readings data."""
     return _call_lambda(
         path="/spo2_readings",
-        query={"mobile_number": mobile_number, "date": date}
+        query={"mobile_number": mobile_number, "date": date, "max_points": max_points}
     )
 
-def get_bt_readings(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_bt_readings(mobile_number: str, date: Optional[str], max_points: Optional[int] = None) -> Dict[str, Any]:
     """Mirror `/bt_readings` – Fetching and processing of bt_readings data."""
     return _call_lambda(
         path="/bt_readings",
-        query={"mobile_number": mobile_number, "date": date}
+        query={"mobile_number": mobile_number, "date": date, "max_points": max_points}
     )
 
-def get_bp_readings(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_bp_readings(mobile_number: str, date: Optional[str], max_points: Optional[int] = None) -> Dict[str, Any]:
     """Mirror `/bp_readings` – Fetching and processing of bp_readings data."""
     return _call_lambda(
         path="/bp_readings",
-        query={"mobile_number": mobile_number, "date": date}
+        query={"mobile_number": mobile_number, "date": date, "max_points": max_points}
     )
 
-def get_glucose_readings(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
+def get_glucose_readings(mobile_number: str, date: Optional[str], max_points: Optional[int] = None) -> Dict[str, Any]:
     """Mirror `/glucose-readings` – Fetching and processing of glucose-readings data."""
     return _call_lambda(
         path="/glucose-readings",
-        query={"mobile_number": mobile_number, "date": date}
+        query={"mobile_number": mobile_number, "date": date, "max_points": max_points}
     )
 
 def get_master_glucose_config(mobile_number: str, date: Optional[str]) -> Dict[str, Any]:
@@ -200,3 +218,17 @@ def get_master_glucose_config(mobile_number: str, date: Optional[str]) -> Dict[s
         path="/master_glucose_config",
         query={"mobile_number": mobile_number, "date": date}
     )
+
+def get_chart_metadata(metadata_id: Optional[str], chart: Optional[str]) -> Dict[str, Any]:
+    """Mirror `/chart_metadata` – Metadata block referenced by columnar chart responses."""
+    return _call_lambda(
+        path="/chart_metadata",
+        query={"id": metadata_id, "chart": chart}
+    )
+
+def refresh_snapshots(mobile_number: str) -> Dict[str, Any]:
+    """Mirror `/refresh_snapshots` – Recompute a patient's chart snapshots for newly ingested weeks."""
+    return _call_lambda(
+        path="/refresh_snapshots",
+        query={"mobile_number": mobile_number}
+    )
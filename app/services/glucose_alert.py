@@ -102,3 +102,11 @@ def get_glucose_alert(mobile_number: str) -> Dict[str, Any]:
         path="/CGM_alert",
         query={"mobile_number": mobile_number}
     )
+
+
+def run_glucose_alert_sweep(date: Optional[str] = None) -> Dict[str, Any]:
+    """Mirror `/CGM_alert_sweep` – Evaluates every active patient and sends their alerts."""
+    return _call_lambda(
+        path="/CGM_alert_sweep",
+        query={"date": date}
+    )
@@ -7,6 +7,24 @@ from types import ModuleType
 from typing import Callable
 
 
+def _tree_module_names(src_dir: Path) -> set[str]:
+    """Top-level module and package names a Lambda source tree provides."""
+    return {
+        path.stem
+        for path in src_dir.iterdir()
+        if (path.suffix == ".py" and path.is_file()) or (path / "__init__.py").exists()
+    }
+
+
+def _is_tree_module(name: str, tree_names: set[str]) -> bool:
+    return name.split(".", 1)[0] in tree_names
+
+
+def _lives_in(module: ModuleType, src_dir: Path) -> bool:
+    file = getattr(module, "__file__", None)
+    return bool(file) and Path(file).resolve().is_relative_to(src_dir)
+
+
 def load_lambda_handler(
     lambda_file_path: Path,
     module_name: str,
@@ -14,11 +32,30 @@ def load_lambda_handler(
     """
     Dynamically loads a lambda_function.py in isolation and returns lambda_handler.
     Ensures no cross-module pollution via sys.modules.
+
+    Several Lambda trees ship modules with the same names (`db`, `config`,
+    `read_glucose_readings`, ...). While this Lambda is imported, modules of
+    those names loaded from other trees are taken out of sys.modules and its
+    own source directory is first on sys.path, so every import resolves to
+    this tree's files. Afterwards the other trees' modules are put back; this
+    tree's modules stay referenced by the code that imported them.
     """
 
     if not lambda_file_path.exists():
         raise FileNotFoundError(f"Lambda file not found: {lambda_file_path}")
 
+    src_dir = lambda_file_path.parent.resolve()
+    tree_names = _tree_module_names(src_dir)
+    evicted = {
+        name: module
+        for name, module in list(sys.modules.items())
+        if _is_tree_module(name, tree_names) and not _lives_in(module, src_dir)
+    }
+    for name in evicted:
+        del sys.modules[name]
+    saved_path = list(sys.path)
+    sys.path.insert(0, str(src_dir))
+
     # Ensure clean module namespace
     sys.modules.pop(module_name, None)
 
@@ -31,7 +68,15 @@ def load_lambda_handler(
 
     module: ModuleType = importlib.util.module_from_spec(spec)
     sys.modules[module_name] = module
-    spec.loader.exec_module(module)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path[:] = saved_path
+        # Swap this tree's copies of the shared names back out for the originals
+        shared = {name.split(".", 1)[0] for name in evicted}
+        for name in [name for name in sys.modules if _is_tree_module(name, shared)]:
+            del sys.modules[name]
+        sys.modules.update(evicted)
 
     if not hasattr(module, "lambda_handler"):
         raise AttributeError("lambda_handler not found in module")